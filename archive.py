@@ -0,0 +1,343 @@
+"""歷史報告歸檔索引：每日報告的摘要、各標的最新指標讀數與殖利率存於本地 SQLite
+
+查詢過去的讀數不需再解析每份約 2 MB 的報告 HTML；readings 以 (標的, 欄位, 日期) 為主鍵，
+「2330.TW 最近 60 份報告的 BIAS_20」只需一次索引查詢。另可將舊報告壓縮 (內嵌圖檔改存為
+共用資產檔，相同圖檔只存一份；可再以 gzip 移至 report/archive/)。
+
+執行方式 (於專案根目錄)：
+    python archive.py ingest                       # 由 report/ 中既有的報告補建索引
+    python archive.py series 2330.TW BIAS_20 --last 60
+    python archive.py snapshot --date 2026-03-14 --fields Close K D
+    python archive.py compact --keep-days 30 [--gzip]
+"""
+import os
+import re
+import sys
+import gzip
+import html
+import json
+import sqlite3
+import argparse
+import datetime
+
+from config_loader import get_loader, ConfigError
+from report_assets import write_chart_asset, relocate_asset_urls, ASSET_DIR_NAME
+
+DEFAULT_ARCHIVE_PATH = os.path.join("cache", "archive.sqlite")
+DEFAULT_REPORT_DIR = "report"
+ARCHIVE_DIR_NAME = "archive"
+REPORT_PATTERN = re.compile(r"^invest_analysis_(\d{8})\.html(\.gz)?$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (date TEXT PRIMARY KEY, path TEXT, size INTEGER, compacted TEXT);
+CREATE TABLE IF NOT EXISTS readings (symbol TEXT NOT NULL, field TEXT NOT NULL, date TEXT NOT NULL, value REAL,
+                                     PRIMARY KEY (symbol, field, date)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS readings_date ON readings (date);
+CREATE TABLE IF NOT EXISTS summary (date TEXT NOT NULL, position INTEGER NOT NULL, symbol TEXT, name TEXT, close REAL, change REAL,
+                                    PRIMARY KEY (date, position));
+CREATE TABLE IF NOT EXISTS yields (tenor TEXT NOT NULL, date TEXT NOT NULL, value REAL, PRIMARY KEY (tenor, date)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# 舊報告表格欄位標題 -> 指標欄位 (補建索引用)
+HEADER_FIELDS = {"價格": "Close", "漲跌%": "Change %", "量比%": "Volume Change %", "ADX": "ADX", "+DI": "+DI", "-DI": "-DI"}
+INLINE_IMAGE = re.compile(r'src="data:image/png;base64,([A-Za-z0-9+/=]+)"')
+
+
+def configured_path(loader=None):
+    """設定檔 parameters.archive_path (設定檔無法讀取時使用預設路徑)"""
+    try:
+        return (loader or get_loader()).params().get("archive_path", DEFAULT_ARCHIVE_PATH)
+    except ConfigError:
+        return DEFAULT_ARCHIVE_PATH
+
+
+def report_date(filename):
+    """由報告檔名取得日期 (YYYY-MM-DD)；不是每日報告時回傳 None"""
+    m = REPORT_PATTERN.match(os.path.basename(filename))
+    return f"{m.group(1)[:4]}-{m.group(1)[4:6]}-{m.group(1)[6:]}" if m else None
+
+
+def readings_from_columns(symbols, latest):
+    """{欄位: 各標的最新值陣列} 轉為 {標的: {欄位: 數值}}，NaN 不列入"""
+    fields = list(latest)
+    columns = [[float(v) for v in latest[f]] for f in fields]
+    return {s: {f: v for f, v in zip(fields, row) if v == v} for s, row in zip(symbols, zip(*columns))}
+
+
+def _number(text):
+    text = re.sub(r"<[^>]+>|[,%▲▼\s]", "", html.unescape(text))
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _header_field(text):
+    if text in HEADER_FIELDS:
+        return HEADER_FIELDS[text]
+    m = re.fullmatch(r"([KD])\d+|(\d+)日乖離", text)
+    if not m:
+        return None
+    return m.group(1) or f"BIAS_{m.group(2)}"
+
+
+def parse_report_html(content):
+    """由報告 HTML 取出 (readings, summary_items, yields)，供既有報告補建索引"""
+    readings, names = {}, {}
+    for table in re.findall(r"<table>(.*?)</table>", content, re.DOTALL):
+        headers = [re.sub(r"<[^>]+>", "", h).strip() for h in re.findall(r"<th>(.*?)</th>", table, re.DOTALL)]
+        if headers[:2] != ["名稱", "價格"]:
+            continue  # 只取群組表格 (技術篩選等其他表格欄位不同)
+        fields = [_header_field(h) for h in headers[1:]]
+        for row in re.findall(r"<tr>\s*(<td class=\"symbol-cell\">.*?)</tr>", table, re.DOTALL):
+            cells = re.findall(r"<td[^>]*>(.*?)</td>", row, re.DOTALL)
+            name, symbol = (html.unescape(x).strip() for x in re.findall(r"<div[^>]*>(.*?)</div>", cells[0])[:2])
+            names[name] = symbol
+            values = {f: _number(c) for f, c in zip(fields, cells[1:]) if f}
+            readings[symbol] = {f: v for f, v in values.items() if v is not None}
+    summary_items = []
+    for name, price, change in re.findall(r'<div class="summary-title">(.*?)</div><div class="summary-price">(.*?)</div>'
+                                          r'<div class="summary-change[^"]*">(.*?)</div>', content):
+        name = html.unescape(name)
+        summary_items.append({"symbol": name, "orig_symbol": names.get(name, name), "close": _number(price), "change": _number(change)})
+    m = re.search(r'<script id="yield-data" type="application/json">(.*?)</script>', content, re.DOTALL)
+    try:
+        yields = json.loads(m.group(1)) if m else {}
+    except ValueError:
+        yields = {}
+    return readings, summary_items, yields
+
+
+def read_report(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_text(path, text, compress=False):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with (gzip.open(tmp, "wt", encoding="utf-8") if compress else open(tmp, "w", encoding="utf-8")) as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ReportArchive:
+    """歸檔索引 (SQLite)；以 with 使用時結束時提交並關閉"""
+
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    # --- 寫入 ---
+    def record_report(self, date, path, readings, summary_items=None, yields=None):
+        """記錄一份報告 (同一日期重複執行時整份取代)"""
+        rows = [(symbol, field, date, value) for symbol, values in readings.items() for field, value in values.items()]
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO reports (date, path, size, compacted) VALUES (?, ?, ?, NULL)",
+                              (date, path, os.path.getsize(path) if path and os.path.exists(path) else None))
+            for table in ("readings", "summary", "yields"):
+                self.conn.execute(f"DELETE FROM {table} WHERE date = ?", (date,))
+            self.conn.executemany("INSERT INTO readings VALUES (?, ?, ?, ?)", rows)
+            self.conn.executemany("INSERT INTO summary VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(date, i, item.get("orig_symbol"), item.get("symbol"), item.get("close"), item.get("change"))
+                                   for i, item in enumerate(summary_items or [])])
+            self.conn.executemany("INSERT INTO yields VALUES (?, ?, ?)", [(t, date, v) for t, v in (yields or {}).items()])
+            # 新報告寫入已掃描過的報告目錄時一併更新目錄戳記，latest_report 不需因此重新掃描
+            report_dir = os.path.dirname(path) if path and os.path.exists(path) else None
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'report_dir'").fetchone()
+            if report_dir is not None and row and row[0].rsplit(":", 1)[0] == os.path.abspath(report_dir):
+                self.conn.execute("UPDATE meta SET value = ? WHERE key = 'report_dir'", (self._dir_stamp(report_dir),))
+        return len(rows)
+
+    def ingest_html(self, path):
+        """解析既有報告並記錄 (readings 以表格顯示的位數為準)"""
+        date = report_date(path)
+        if date is None:
+            raise ValueError(f"{path} 不是每日報告檔，無法判斷報告日期")
+        readings, summary_items, yields = parse_report_html(read_report(path))
+        return self.record_report(date, path, readings, summary_items, yields)
+
+    def sync_reports(self, report_dir=DEFAULT_REPORT_DIR):
+        """掃描報告目錄並更新 reports 表，回傳最新一份未壓縮報告的路徑"""
+        found = {}
+        for root in (report_dir, os.path.join(report_dir, ARCHIVE_DIR_NAME)):
+            if os.path.isdir(root):
+                for name in os.listdir(root):
+                    date = report_date(name)
+                    # 同一日期同時存在時以未壓縮的報告為準
+                    if date and (date not in found or not name.endswith(".gz")):
+                        found[date] = os.path.join(root, name)
+        with self.conn:
+            self.conn.executemany("INSERT INTO reports (date, path, size) VALUES (?, ?, ?) "
+                                  "ON CONFLICT (date) DO UPDATE SET path = excluded.path, size = excluded.size",
+                                  [(d, p, os.path.getsize(p)) for d, p in found.items()])
+            self.conn.execute("DELETE FROM reports WHERE date NOT IN (%s)" % ",".join("?" * len(found)), list(found))
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('report_dir', ?)", (self._dir_stamp(report_dir),))
+        latest = [p for d, p in sorted(found.items()) if not p.endswith(".gz")]
+        return latest[-1] if latest else None
+
+    # --- 查詢 ---
+    @staticmethod
+    def _dir_stamp(report_dir):
+        return f"{os.path.abspath(report_dir)}:{os.stat(report_dir).st_mtime_ns}"
+
+    def latest_report(self, report_dir=DEFAULT_REPORT_DIR):
+        """最新一份未壓縮報告的路徑；報告目錄自上次 sync_reports 後有變動 (或從未掃描) 時回傳 None"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'report_dir'").fetchone()
+        if not row or row[0] != self._dir_stamp(report_dir):
+            return None
+        row = self.conn.execute("SELECT path FROM reports WHERE path NOT LIKE '%.gz' ORDER BY date DESC LIMIT 1").fetchone()
+        return row[0] if row and os.path.exists(row[0]) else None
+
+    def dates(self):
+        """已記錄讀數的報告日期 (由舊到新)"""
+        return [r[0] for r in self.conn.execute("SELECT DISTINCT date FROM readings ORDER BY date")]
+
+    def series(self, symbol, field, last=None, start=None, end=None):
+        """單一標的、單一欄位的歷史讀數 [(日期, 數值)]，由舊到新；last 為只取最近幾份報告"""
+        sql, args = "SELECT date, value FROM readings WHERE symbol = ? AND field = ?", [symbol, field]
+        if start:
+            sql += " AND date >= ?"; args.append(start)
+        if end:
+            sql += " AND date <= ?"; args.append(end)
+        sql += " ORDER BY date DESC"
+        if last:
+            sql += " LIMIT ?"; args.append(int(last))
+        return self.conn.execute(sql, args).fetchall()[::-1]
+
+    def snapshot(self, date=None, symbols=None, fields=None):
+        """單一報告日 (預設最新) 的讀數 {標的: {欄位: 數值}}"""
+        date = date or self.conn.execute("SELECT MAX(date) FROM readings").fetchone()[0]
+        sql, args = "SELECT symbol, field, value FROM readings WHERE date = ?", [date]
+        for column, values in (("symbol", symbols), ("field", fields)):
+            if values:
+                sql += f" AND {column} IN ({','.join('?' * len(values))})"; args.extend(values)
+        out = {}
+        for symbol, field, value in self.conn.execute(sql, args):
+            out.setdefault(symbol, {})[field] = value
+        return out
+
+    def yield_history(self, tenor=None, start=None, end=None):
+        """殖利率歷史 [(日期, 天期, 數值)]，由舊到新"""
+        sql, args = "SELECT date, tenor, value FROM yields WHERE 1", []
+        for clause, value in (("tenor = ?", tenor), ("date >= ?", start), ("date <= ?", end)):
+            if value:
+                sql += f" AND {clause}"; args.append(value)
+        return self.conn.execute(sql + " ORDER BY date, tenor", args).fetchall()
+
+    def summary(self, date):
+        return [dict(zip(("orig_symbol", "symbol", "close", "change"), r)) for r in
+                self.conn.execute("SELECT symbol, name, close, change FROM summary WHERE date = ? ORDER BY position", (date,))]
+
+    # --- 壓縮 ---
+    def compact(self, report_dir=DEFAULT_REPORT_DIR, keep_days=30, compress=False):
+        """壓縮較最新報告早 keep_days 天以上的報告，回傳 {"reports", "images", "before", "after"}
+
+        內嵌的 Base64 圖檔改存為 report/assets/ 下以內容雜湊命名的檔案 (跨日相同的圖只存一份)；
+        compress 時再以 gzip 移至 report/archive/ (路徑已改為相對於該目錄)。最新一份報告一律保留原狀，
+        壓縮前尚未記錄讀數的報告先補建索引。
+        """
+        self.sync_reports(report_dir)
+        reports = self.conn.execute("SELECT date, path FROM reports ORDER BY date").fetchall()
+        if not reports:
+            return {"reports": 0, "images": 0, "before": 0, "after": 0}
+        cutoff = (datetime.date.fromisoformat(reports[-1][0]) - datetime.timedelta(days=keep_days)).isoformat()
+        known, assets_dir = set(self.dates()), os.path.join(report_dir, ASSET_DIR_NAME)
+        stats = {"reports": 0, "images": 0, "before": 0, "after": 0}
+        for date, path in reports[:-1]:
+            if date >= cutoff or path.endswith(".gz"):
+                continue
+            if date not in known:
+                self.ingest_html(path)
+            content = read_report(path)
+            images = [0]
+            def to_asset(m):
+                images[0] += 1
+                return f'src="{write_chart_asset(m.group(1), assets_dir)}"'
+            content = INLINE_IMAGE.sub(to_asset, content)
+            if not images[0] and not compress:
+                continue
+            target = os.path.join(report_dir, ARCHIVE_DIR_NAME, os.path.basename(path) + ".gz") if compress else path
+            before = os.path.getsize(path)
+            _write_text(target, relocate_asset_urls(content, "../") if compress else content, compress)
+            if target != path:
+                os.remove(path)
+            after = os.path.getsize(target)
+            with self.conn:
+                self.conn.execute("UPDATE reports SET path = ?, size = ?, compacted = ? WHERE date = ?",
+                                  (target, after, "gzip" if compress else "assets", date))
+            stats["reports"] += 1; stats["images"] += images[0]
+            stats["before"] += before; stats["after"] += after
+        # 壓縮會改變報告目錄，重新記錄目錄狀態以免下次查詢最新報告時重新掃描
+        self.sync_reports(report_dir)
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="歷史報告歸檔索引：查詢過去的讀數與壓縮舊報告")
+    parser.add_argument("--db", default=None, help=f"索引檔路徑 (預設為設定檔的 archive_path 或 {DEFAULT_ARCHIVE_PATH})")
+    parser.add_argument("--report-dir", default=DEFAULT_REPORT_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="解析既有報告並記錄 (未指定時為報告目錄中尚未記錄的所有報告)")
+    ingest.add_argument("paths", nargs="*")
+    series = sub.add_parser("series", help="單一標的、單一欄位的歷史讀數")
+    series.add_argument("symbol")
+    series.add_argument("field")
+    series.add_argument("--last", type=int, help="只取最近幾份報告")
+    series.add_argument("--start", help="起始日期 (YYYY-MM-DD)")
+    series.add_argument("--end", help="結束日期 (YYYY-MM-DD)")
+    snapshot = sub.add_parser("snapshot", help="單一報告日的讀數 (預設最新一份)")
+    snapshot.add_argument("--date")
+    snapshot.add_argument("--symbols", nargs="+")
+    snapshot.add_argument("--fields", nargs="+")
+    compact = sub.add_parser("compact", help="壓縮舊報告")
+    compact.add_argument("--keep-days", type=int, default=30, help="保留最近幾天的報告原狀 (預設 30)")
+    compact.add_argument("--gzip", action="store_true", help="再以 gzip 壓縮並移至報告目錄下的 archive/")
+    args = parser.parse_args(argv)
+
+    with ReportArchive(args.db or configured_path()) as archive:
+        if args.command == "ingest":
+            paths = args.paths
+            if not paths:
+                archive.sync_reports(args.report_dir)
+                known = set(archive.dates())
+                paths = [p for d, p in archive.conn.execute("SELECT date, path FROM reports ORDER BY date") if d not in known]
+            bad = [p for p in paths if report_date(p) is None]
+            for p in bad:
+                print(f"[Error] {p} 不是每日報告檔 (invest_analysis_YYYYMMDD.html)，略過")
+            paths = [p for p in paths if p not in bad]
+            total = sum(archive.ingest_html(p) for p in paths)
+            print(f"[Success] 已記錄 {len(paths)} 份報告、{total} 筆讀數")
+            if bad:
+                return 1
+        elif args.command == "series":
+            rows = archive.series(args.symbol, args.field, args.last, args.start, args.end)
+            if not rows:
+                print(f"[Warning] 沒有 {args.symbol} 的 {args.field} 紀錄"); return 1
+            for date, value in rows:
+                print(f"{date}  {value}")
+        elif args.command == "snapshot":
+            print(json.dumps(archive.snapshot(args.date, args.symbols, args.fields), ensure_ascii=False, indent=2))
+        else:
+            s = archive.compact(args.report_dir, args.keep_days, args.gzip)
+            print(f"[Success] 已壓縮 {s['reports']} 份報告 (內嵌圖檔 {s['images']} 張)，"
+                  f"{s['before'] / 1e6:.1f} MB -> {s['after'] / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""趨勢訊號歷史回測：以本地價格資料庫的全部歷史，統計 determine_trend 各狀態之後的報酬與回撤
+
+每檔標的每根K棒都以與報告相同的 K/D/乖離率邏輯 (含 trend_thresholds 設定) 分類，
+再計算之後 N 根K棒的報酬與期間最大回撤，依狀態與群組彙整平均/中位數報酬、命中率與回撤。
+全部以 (K棒數 x 標的數) 陣列運算完成，不需連網。
+
+執行方式 (於專案根目錄)：
+    python backtest.py                          # 設定檔中的所有群組，預設觀察 5/20/60 根K棒
+    python backtest.py --horizons 10 40 --output backtest_results.json
+"""
+import sys
+import json
+import argparse
+
+import numpy as np
+
+import metrics
+import investment_analysis as ia
+from indicators import rolling_min, classify_trend, TREND_STATES
+from price_store import PriceStore
+
+# 各狀態預期的方向 (代碼 0~4，見 indicators.TREND_STATES)：多方狀態之後上漲、空方狀態之後下跌視為命中
+STATE_DIRECTION = np.array([0, 1, 1, -1, -1])
+DEFAULT_HORIZONS = (5, 20, 60)
+ALL_GROUPS = "全部標的"
+
+
+def forward_returns(close, horizon):
+    """之後第 horizon 根K棒相對本根收盤的報酬 (%)；尾端資料不足者為 NaN"""
+    future = np.full_like(close, np.nan)
+    future[:-horizon] = close[horizon:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (future / close - 1) * 100
+
+
+def forward_drawdown(close, horizon):
+    """之後 horizon 根K棒內相對本根收盤的最大跌幅 (%，不高於 0)；尾端資料不足者為 NaN"""
+    lowest = np.full_like(close, np.nan)
+    lowest[:-horizon] = rolling_min(close, horizon)[horizon:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.minimum(lowest / close - 1, 0) * 100
+
+
+def summarize(states, returns, drawdowns):
+    """彙整單一群組、單一觀察期：回傳 {狀態名稱: 統計}，只計入狀態已知且之後資料完整的K棒"""
+    ok = (states > 0) & ~np.isnan(returns) & ~np.isnan(drawdowns)
+    codes, ret, dd = states[ok].astype(np.intp), returns[ok], drawdowns[ok]
+    counts = np.bincount(codes, minlength=5)
+    sums = np.bincount(codes, weights=ret, minlength=5)
+    hits = np.bincount(codes, weights=(ret * STATE_DIRECTION[codes] > 0), minlength=5)
+    dd_sums = np.bincount(codes, weights=dd, minlength=5)
+    result = {}
+    for code, name in enumerate(TREND_STATES, start=1):
+        n = int(counts[code])
+        if not n:
+            result[name] = {"count": 0}
+            continue
+        selected = codes == code
+        result[name] = {
+            "count": n,
+            "mean_return": round(float(sums[code]) / n, 4),
+            "median_return": round(float(np.median(ret[selected])), 4),
+            "hit_rate": round(float(hits[code]) / n, 4),
+            "mean_drawdown": round(float(dd_sums[code]) / n, 4),
+            "worst_drawdown": round(float(dd[selected].min()), 4),
+        }
+    return result
+
+
+def run_backtest(panel, groups, horizons=DEFAULT_HORIZONS, threshold=0, bias_period=20):
+    """對面板中所有標的回測，回傳 {"bars", "symbols", "horizons", "groups": {群組: {觀察期: {狀態: 統計}}}}
+
+    groups 為 [{"title", "symbols"}]；另加上涵蓋面板所有標的的 ALL_GROUPS。
+    """
+    f = panel.fields
+    states = classify_trend(f["K"], f["D"], f[f"BIAS_{bias_period}"], threshold)
+    columns = {s: j for j, s in enumerate(panel.symbols)}
+    selections = [(g["title"], [columns[s] for s in dict.fromkeys(g["symbols"]) if s in columns]) for g in groups]
+    selections.append((ALL_GROUPS, list(range(len(panel.symbols)))))
+    result = {"bars": int(panel.valid_mask().sum()), "symbols": len(panel.symbols), "horizons": list(horizons),
+              "groups": {title: {} for title, _ in selections}}
+    for horizon in horizons:
+        returns, drawdowns = forward_returns(f["Close"], horizon), forward_drawdown(f["Close"], horizon)
+        for title, cols in selections:
+            result["groups"][title][str(horizon)] = summarize(states[:, cols], returns[:, cols], drawdowns[:, cols])
+    return result
+
+
+def load_panel(symbols, store):
+    """自本地價格資料庫讀取全部歷史並計算指標面板；沒有本地資料的標的略過"""
+    frames = {}
+    for symbol in symbols:
+        df, _ = store.read(symbol)
+        if df is not None and len(df) > 1:
+            frames[symbol] = df
+    missing = [s for s in symbols if s not in frames]
+    if missing:
+        print(f"[Warning] 本地價格資料庫中沒有 {len(missing)} 檔標的的資料，將略過：{', '.join(missing[:10])}{' ...' if len(missing) > 10 else ''}")
+    return ia.calculate_indicators_batch(frames)
+
+
+def print_results(result):
+    print(f"[Info] 回測 {result['symbols']} 檔標的、共 {result['bars']} 根K棒")
+    for title, by_horizon in result["groups"].items():
+        print(f"\n--- {title} ---")
+        for horizon, by_state in by_horizon.items():
+            print(f"  之後 {horizon} 根K棒：")
+            for name, s in by_state.items():
+                if not s["count"]:
+                    print(f"    {name}: 無樣本"); continue
+                print(f"    {name}: {s['count']:>7} 次，平均 {s['mean_return']:+.2f}%，中位數 {s['median_return']:+.2f}%，"
+                      f"命中率 {s['hit_rate']:.0%}，平均回撤 {s['mean_drawdown']:.2f}%，最大回撤 {s['worst_drawdown']:.2f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="趨勢訊號歷史回測 (僅使用本地價格資料)")
+    parser.add_argument("--horizons", type=int, nargs="+", default=list(DEFAULT_HORIZONS), help="觀察之後幾根K棒 (預設 5 20 60)")
+    parser.add_argument("--output", help="另存結果為 JSON")
+    args = parser.parse_args(argv)
+    ia.require_config()
+
+    run = metrics.start_run("backtest")
+    symbols = list(dict.fromkeys(s for g in ia.STOCK_GROUPS for s in g["symbols"]))
+    with metrics.stage("load"):
+        panel = load_panel(symbols, PriceStore(ia.PRICE_STORE_DIR))
+    if not panel.symbols:
+        print("[Error] 本地價格資料庫中沒有可回測的資料，請先執行 investment_analysis.py。")
+        return 1
+    with metrics.stage("backtest"):
+        result = run_backtest(panel, ia.STOCK_GROUPS, args.horizons, ia.TREND_PARAMS.get("bias_threshold", 0),
+                              ia.TREND_PARAMS.get("bias_signal_period", 20))
+    print_results(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"[Success] 回測結果已儲存至 {args.output}")
+    run.report()
+    print(f"[Info] 執行統計已儲存至 {run.write(ia.METRICS_DIR)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""離線效能基準測試：啟動時間、指標計算、表格列、技術篩選、訊號回測、K線圖、technical_data.json 讀寫與報告注入
+
+所有資料皆由 benchmarks.synthetic 產生，不需連網。結果以秒為單位；memory.* 項目為 tracemalloc 記憶體峰值 (MB)，
+同樣納入基準比較 (數值變大即為退步)。
+
+執行方式 (於專案根目錄)：
+    python -m benchmarks.run_benchmarks                      # 完整規模，結果存於 benchmarks/results/
+    python -m benchmarks.run_benchmarks --quick              # 小規模快速檢查
+    python -m benchmarks.run_benchmarks --only indicators render
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json [--threshold 0.25]
+比較模式下任一項目較基準慢超過 threshold (比例) 時列出並以結束碼 1 結束。
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import shutil
+import tempfile
+import contextlib
+import tracemalloc
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+import investment_analysis as ia
+import update_report
+import backtest
+from report_injector import inject_file
+from technical_data import write_technical_data, read_technical_data
+from screener import run_screener
+from market_panel import MarketPanel
+from yield_curve import YieldCurve, TENORS
+from providers import RecordingProvider
+from watch import Watcher, StandInFeed, last_bar
+from benchmarks.synthetic import make_ohlcv, make_universe, SyntheticProvider
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各項目的規模軸 (完整 / 快速)
+AXES = {
+    "startup.import": ("module", ["investment_analysis", "update_report", "backtest"], ["investment_analysis"]),
+    "startup.first_output": ("script", ["investment_analysis", "update_report", "backtest"], ["investment_analysis"]),
+    "indicators.calculate_all_indicators": ("bars", [250, 1000, 5000, 20000], [250, 1000]),
+    "indicators.per_symbol_loop": ("symbols", [10, 100, 1000], [10, 50]),
+    "indicators.panel": ("symbols", [10, 100, 1000, 5000], [10, 100]),
+    "indicators.panel_ragged": ("symbols", [25, 500, 5000], [25]),
+    "table.format_data_row": ("symbols", [10, 100, 1000, 5000], [10, 100]),
+    "table.format_table_rows": ("symbols", [10, 100, 1000, 5000], [10, 100]),
+    "screener.run_screener": ("symbols", [100, 1000, 5000], [100]),
+    "backtest.run_backtest": ("symbols", [50, 200, 500], [20]),
+    "render.create_ma_plot_base64": ("bars", [120, 250, 1000], [120]),
+    "yield_curve.analysis": ("bars", [1250, 5000, 15000], [1250]),
+    "market.from_panel": ("symbols", [10, 100, 1000, 5000], [10, 100]),
+    "market.per_symbol_dataframes": ("symbols", [100, 1000, 5000], [100]),
+    "memory.market_panel_write": ("symbols", [100, 1000, 5000], [100]),
+    "memory.per_symbol_market_write": ("symbols", [100, 1000, 5000], [100]),
+    "json.save_to_json": ("symbols", [10, 100, 1000, 5000], [10, 100]),
+    "json.load_from_json": ("symbols", [10, 100, 1000, 5000], [10, 100]),
+    "json.load_from_json_lazy": ("symbols", [10, 100, 1000, 5000], [10, 100]),
+    "json.load_gzip": ("symbols", [40, 500], [40]),
+    "json.load_legacy_rows": ("symbols", [40, 500], [40]),
+    "watch.run_cycle": ("symbols", [20, 100, 1000], [20]),
+    "e2e.replay_main": ("symbols", [20, 100, 500], [20]),
+    "inject.news_and_ai": ("report_kb", [500, 2000, 8000, 32000], [500, 2000]),
+}
+
+
+def best_of(fn, repeat):
+    """執行 repeat 次取最短時間 (秒)，降低其他行程干擾"""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def _quiet(fn):
+    """略過被測函式的 [Info]/[Success] 輸出"""
+    def wrapper():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return wrapper
+
+
+def _replay_workdir(workdir, symbols):
+    """建立只含一個合成群組的執行目錄，並以 SyntheticProvider 錄製所需資料，回傳 (目錄, 錄製目錄)"""
+    case_dir = os.path.join(workdir, f"replay_{symbols}")
+    shutil.copytree(os.path.join(ROOT, "templates"), os.path.join(case_dir, "templates"))
+    shutil.copy(os.path.join(ROOT, "macro_cache.json"), case_dir)
+    with open(os.path.join(ROOT, "config.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    names = [f"SYM{i:05d}" for i in range(symbols)]
+    config["stock_groups"] = [{"title": "合成標的", "symbols": names}]
+    with open(os.path.join(case_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False)
+    recording = os.path.join(case_dir, "recording")
+    recorder = RecordingProvider(recording, SyntheticProvider(datetime.datetime(2026, 1, 15, 22, 30)))
+    recorder.now()
+    for symbol in names + ia.YIELD_SYMBOLS:
+        recorder.prices(symbol, "2000-01-01")
+    for symbol in names:
+        recorder.info(symbol)
+    return case_dir, recording
+
+
+def _first_output_seconds(cmd):
+    """新行程自啟動到輸出第一行所需秒數"""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    proc.stdout.readline()
+    elapsed = time.perf_counter() - t0
+    proc.communicate()
+    return elapsed
+
+
+def _panel(symbols, bars):
+    return ia.calculate_indicators_batch(make_universe(symbols, bars))
+
+
+def _market_data(panel):
+    """與 process_stock_group 相同欄位與天數的欄式行情面板"""
+    return MarketPanel.from_panel(panel, panel.symbols, panel.symbols, ia.AI_ANALYSIS_DAYS, ia.MARKET_FIELDS)
+
+
+def _per_symbol_market(panel):
+    """舊版 process_stock_group 的做法：逐檔建立 DataFrame、tail/copy/reset_index、strftime 後轉為 dict"""
+    cols = ['Date'] + ia.MARKET_FIELDS
+    market = {}
+    for symbol in panel.symbols:
+        recent_df = panel.frame(symbol).tail(ia.AI_ANALYSIS_DAYS).copy().reset_index()
+        recent_df['Date'] = recent_df['Date'].dt.strftime('%Y-%m-%d')
+        market[symbol] = recent_df[[c for c in cols if c in recent_df.columns]].to_dict(orient='list')
+    return market
+
+
+def _peak_mb(fn):
+    """執行 fn 期間的 tracemalloc 記憶體峰值 (MB)"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def _report_html(size_kb):
+    """含新聞與 AI 錨點的合成報告，其餘以 Base64 圖檔大小的區塊填滿"""
+    rng = np.random.default_rng(0)
+    chunk = '<img src="data:image/png;base64,' + "".join(rng.choice(list("ABCDEFGHabcdefgh0123456789+/"), 60_000)) + '">\n'
+    blocks = max(1, size_kb * 1024 // len(chunk))
+    head, tail = chunk * (blocks // 2), chunk * (blocks - blocks // 2)
+    return (f'<html><body>{head}<div id="weekly-news-focus"></div><!-- news-anchor -->\n'
+            f'<div id="ai-analysis-report"></div><!-- ai-anchor -->\n{tail}</body></html>')
+
+
+def bench_case(name, size, repeat, workdir):
+    """回傳單一項目在指定規模下的秒數"""
+    if name == "startup.import":
+        # 新的直譯器只載入模組 (含讀取設定檔)，不執行任何階段
+        cmd = [sys.executable, "-c", f"import {size}"]
+        return best_of(lambda: subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL), repeat)
+    if name == "startup.first_output":
+        # 以 --help 量測載入模組並解析參數後第一行輸出的時間
+        return min(_first_output_seconds([sys.executable, f"{size}.py", "--help"]) for _ in range(repeat))
+    if name == "indicators.calculate_all_indicators":
+        df = make_ohlcv(size)
+        return best_of(lambda: ia.calculate_all_indicators(df), repeat)
+    if name == "indicators.per_symbol_loop":
+        frames = make_universe(size, ia.HISTORY_DAYS)
+        return best_of(lambda: [ia.calculate_all_indicators(df) for df in frames.values()], repeat)
+    if name == "indicators.panel":
+        frames = make_universe(size, ia.HISTORY_DAYS)
+        return best_of(lambda: ia.calculate_indicators_batch(frames), repeat)
+    if name == "indicators.panel_ragged":
+        # 各標的K棒數不同 (上市日期不一)，面板需靠右對齊
+        frames = make_universe(size, ia.HISTORY_DAYS, ragged=True)
+        return best_of(lambda: ia.calculate_indicators_batch(frames), repeat)
+    if name == "table.format_data_row":
+        frames = [df.iloc[-2:] for df in _panel(size, 80).frames().values()]
+        return best_of(lambda: [ia.format_data_row("SYM", df.iloc[-1]) for df in frames], repeat)
+    if name == "table.format_table_rows":
+        panel = _panel(size, 80)
+        return best_of(lambda: ia.format_table_rows(panel, panel.symbols), repeat)
+    if name == "screener.run_screener":
+        panel = _panel(size, ia.HISTORY_DAYS)
+        return best_of(lambda: run_screener(panel, ia.SCREENER_RULES, ia.SCREENER_LOOKBACK), repeat)
+    if name == "backtest.run_backtest":
+        # 約 10 年日K，含指標計算
+        frames = make_universe(size, 2500, ragged=True)
+        return best_of(lambda: backtest.run_backtest(ia.calculate_indicators_batch(frames), []), repeat)
+    if name == "render.create_ma_plot_base64":
+        df = ia.calculate_all_indicators(make_ohlcv(size + max(ia.MA_PERIODS))).tail(size)
+        return best_of(lambda: ia.create_ma_plot_base64(df, "SYM"), repeat)
+    if name == "yield_curve.analysis":
+        # 4 個天期的日線歷史 (1250 根約 5 年)
+        frames = {s: make_ohlcv(size, seed=i) for i, s in enumerate(TENORS)}
+        return best_of(lambda: YieldCurve.from_frames(frames).analysis(), repeat)
+    if name == "market.from_panel":
+        panel = _panel(size, ia.HISTORY_DAYS)
+        return best_of(lambda: _market_data(panel), repeat)
+    if name == "market.per_symbol_dataframes":
+        panel = _panel(size, ia.HISTORY_DAYS)
+        return best_of(lambda: _per_symbol_market(panel), repeat)
+    if name.startswith("memory."):
+        # 由指標面板取出近期行情並寫出 market 區塊期間的記憶體峰值
+        panel = _panel(size, ia.HISTORY_DAYS)
+        build = _market_data if name == "memory.market_panel_write" else _per_symbol_market
+        path = os.path.join(workdir, "technical_data_memory.json")
+        return min(_peak_mb(lambda: write_technical_data(path, [], {}, build(panel), [], "x")) for _ in range(repeat))
+    if name in ("json.load_gzip", "json.load_legacy_rows"):
+        market = _market_data(_panel(size, ia.HISTORY_DAYS))
+        path = os.path.join(workdir, f"{name}_{size}.json")
+        if name == "json.load_gzip":
+            path = write_technical_data(path, [], {"3M": 4.0}, market, [], "x", encoding="gzip")
+            return best_of(lambda: read_technical_data(path, columnar=True), repeat)
+        # 舊版 indent=2 列式檔案
+        rows = {name: [dict(zip(cols, row)) for row in zip(*cols.values())]
+                for name, cols in read_technical_data(write_technical_data(path, [], {}, market, [], "x"), columnar=True)["market"].items()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"fundamental": [], "yield": {"3M": 4.0}, "market": rows, "summary": [], "last_updated": "x"},
+                      f, ensure_ascii=False, indent=2)
+        return best_of(lambda: update_report.load_from_json(path), repeat)
+    if name.startswith("json."):
+        market = _market_data(_panel(size, max(ia.AI_ANALYSIS_DAYS, max(ia.MA_PERIODS)) + 10))
+        path = os.path.join(workdir, f"technical_data_{size}.json")
+        save = _quiet(lambda: ia.save_to_json([], {"3M": 4.0}, market, [], filename=path, encoding="json"))
+        if name == "json.save_to_json":
+            return best_of(save, repeat)
+        save()
+        if name == "json.load_from_json":
+            return best_of(lambda: update_report.load_from_json(path), repeat)
+        first = market.names[0]
+        return best_of(lambda: update_report.load_from_json(path, sections=["yield", "market"], symbols=[first], columnar=True), repeat)
+    if name == "watch.run_cycle":
+        # 本地替代報價，約半數標的每輪有變動
+        frames = make_universe(size, ia.HISTORY_DAYS)
+        watcher = Watcher(frames, StandInFeed({s: last_bar(df) for s, df in frames.items()}), ia.WATCH_WORKERS, list(frames)[:10])
+        return best_of(lambda: watcher.run_cycle(os.path.join(workdir, "live")), repeat)
+    if name == "e2e.replay_main":
+        # 完整執行 main (含啟動)，資料由錄製目錄回放，不連網
+        case_dir, recording = _replay_workdir(workdir, size)
+        cmd = [sys.executable, os.path.join(ROOT, "investment_analysis.py"), "--replay", recording, "--chart-output", "client", "--force"]
+        return best_of(lambda: subprocess.run(cmd, cwd=case_dir, check=True, stdout=subprocess.DEVNULL), repeat)
+    if name == "inject.news_and_ai":
+        path, index = os.path.join(workdir, "report.html"), os.path.join(workdir, "index.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_report_html(size))
+        news, ai = "<p>" + "財經焦點 " * 2000 + "</p>", "<h3>分析</h3>" + "<p>觀點</p>" * 500
+        placeholders, regions = update_report.build_injections({}, news, ai)
+        # 首次執行注入空標籤，之後的每次執行皆為取代既有內容
+        return best_of(lambda: inject_file(path, placeholders, regions, index_path=index), repeat)
+    raise KeyError(name)
+
+
+def run(names, quick=False, repeat=3):
+    """依規模軸執行各項目，回傳 {"項目[軸=規模]": 秒數}"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            axis, full, small = AXES[name]
+            for size in (small if quick else full):
+                key = f"{name}[{axis}={size}]"
+                seconds = bench_case(name, size, repeat, workdir)
+                results[key] = round(seconds, 6)
+                print(f"  {key:<55} {format_value(key, seconds):>13}")
+    return results
+
+
+def format_value(key, value):
+    """秒數以毫秒顯示，memory.* 項目以 MB 顯示"""
+    return f"{value:.1f} MB" if key.startswith("memory.") else f"{value * 1000:.1f} ms"
+
+
+def environment():
+    return {
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpu_count": os.cpu_count(), "numpy": np.__version__, "pandas": pd.__version__,
+    }
+
+
+def compare_results(current, baseline, threshold=0.25, min_seconds=0.001):
+    """與基準比較，回傳 [(項目, 基準秒數, 本次秒數, 變化比例)] 中變慢超過 threshold 者
+
+    低於 min_seconds 的項目量測誤差大，兩者皆低於此值時不列入。
+    """
+    regressions = []
+    for key, seconds in current.items():
+        base = baseline.get(key)
+        if base is None or max(base, seconds) < min_seconds:
+            continue
+        change = seconds / base - 1 if base > 0 else float("inf")
+        if change > threshold:
+            regressions.append((key, base, seconds, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="離線效能基準測試")
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="只執行名稱以指定字串開頭的項目 (例如 indicators json)")
+    parser.add_argument("--quick", action="store_true", help="使用小規模參數快速執行")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="結果 JSON 路徑 (預設 benchmarks/results/<時間>.json)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="另存本次結果為基準")
+    parser.add_argument("--compare", metavar="PATH", help="與基準結果比較並標示變慢的項目")
+    parser.add_argument("--threshold", type=float, default=0.25, help="變慢超過此比例視為退步 (預設 0.25)")
+    args = parser.parse_args(argv)
+
+    names = [n for n in AXES if not args.only or any(n.startswith(p) for p in args.only)]
+    print(f"[Info] 執行 {len(names)} 個基準項目{' (快速模式)' if args.quick else ''}...")
+    data = {"environment": environment(), "quick": args.quick, "results": run(names, args.quick, args.repeat)}
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    for path in filter(None, (output, args.save_baseline)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"[Success] 結果已儲存至 {path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_results(data["results"], baseline, args.threshold)
+        if regressions:
+            print(f"[Warning] 共 {len(regressions)} 個項目較基準慢超過 {args.threshold:.0%}：")
+            for key, base, seconds, change in regressions:
+                print(f"  - {key}: {format_value(key, base)} -> {format_value(key, seconds)} (+{change:.0%})")
+            return 1
+        print("[Success] 與基準相比沒有明顯退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+def make_ohlcv(bars=250, seed=0, start="2020-01-01", flat_every=0):
+    """產生隨機漫步的合成 OHLCV 資料 (不需連網)，flat_every > 0 時每隔數根插入價格不變的K棒"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    if flat_every:
+        for i in range(flat_every, bars, flat_every):
+            close[i] = close[i - 1]
+    spread = np.abs(rng.normal(0, 0.005, bars)) * close
+    open_ = close * (1 + rng.normal(0, 0.003, bars))
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.integers(1_000, 1_000_000, bars).astype(float)
+    index = pd.bdate_range(start=start, periods=bars, name="Date")
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+
+def make_universe(symbols=10, bars=250, seed=0, ragged=False):
+    """產生多檔標的的合成資料；ragged 時各標的K棒數不同，模擬上市時間與交易日曆的差異"""
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for i in range(symbols):
+        n = int(rng.integers(max(2, bars // 2), bars + 1)) if ragged else bars
+        frames[f"SYM{i:05d}"] = make_ohlcv(n, seed=seed + i + 1)
+    return frames
+
+
+class SyntheticProvider:
+    """不連網的合成行情來源 (介面同 providers.YahooProvider)：每檔標的的資料由代號決定，重複取得結果相同
+
+    可包在 providers.RecordingProvider 中產生錄製資料，供測試與基準量測以 --replay 執行完整流程。
+    """
+    name = "synthetic"
+    remote = False
+    use_cache = False
+
+    def __init__(self, utc_now, bars=1500):
+        self.utc_now = utc_now
+        self.bars = bars
+
+    def prices(self, symbol, start, end=None, timeout=20):
+        df = make_ohlcv(self.bars, seed=zlib.crc32(symbol.encode("utf-8")))
+        df.index = pd.bdate_range(end=pd.Timestamp(self.utc_now).normalize(), periods=self.bars, name="Date")
+        return df[df.index >= pd.Timestamp(start).normalize()]
+
+    def info(self, symbol):
+        rng = np.random.default_rng(zlib.crc32(symbol.encode("utf-8")))
+        return {"trailingPE": round(float(rng.uniform(8, 40)), 2), "priceToBook": round(float(rng.uniform(1, 8)), 2),
+                "returnOnEquity": round(float(rng.uniform(0.05, 0.4)), 4), "sector": "Technology"}
+
+    def now(self):
+        return self.utc_now
@@ -0,0 +1,75 @@
+import os
+import json
+import hashlib
+
+DEFAULT_BUILD_DIR = os.path.join("cache", "build")
+
+
+def file_digest(paths):
+    """計算多個檔案內容的雜湊值 (目錄則包含其下所有檔案)，不存在的路徑亦納入計算"""
+    h = hashlib.sha256()
+    for path in paths:
+        files = sorted(os.path.join(d, f) for d, _, fs in os.walk(path) for f in fs) if os.path.isdir(path) else [path]
+        for name in files:
+            h.update(name.replace(os.sep, "/").encode("utf-8") + b"\0")
+            try:
+                with open(name, "rb") as f:
+                    h.update(f.read())
+            except OSError:
+                h.update(b"<missing>")
+    return h.hexdigest()
+
+
+def params_digest(params):
+    """以可序列化為 JSON 的參數計算雜湊值"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class BuildCache:
+    """增量建置紀錄：各區塊 (群組、殖利率) 依輸入雜湊保存產出，manifest 記錄上次完整報告的輸入與輸出檔"""
+
+    def __init__(self, root=DEFAULT_BUILD_DIR):
+        self.root = root
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    def section_path(self, key):
+        return os.path.join(self.root, "sections", key + ".json")
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def get_section(self, key):
+        """讀取輸入雜湊為 key 的區塊產出；不存在時回傳 None"""
+        return self._read(self.section_path(key))
+
+    def put_section(self, key, data):
+        self._write(self.section_path(key), data)
+
+    def is_up_to_date(self, report_key):
+        """上次建置的輸入雜湊相同且輸出檔皆存在時回傳 True"""
+        manifest = self._read(self.manifest_path) or {}
+        return manifest.get("report") == report_key and bool(manifest.get("outputs")) and \
+            all(os.path.exists(p) for p in manifest["outputs"])
+
+    def save_manifest(self, report_key, sections, outputs):
+        """記錄本次建置，並移除不再被引用的區塊產出"""
+        self._write(self.manifest_path, {"report": report_key, "sections": list(sections), "outputs": list(outputs)})
+        keep = {key + ".json" for key in sections}
+        section_dir = os.path.dirname(self.section_path("x"))
+        for name in os.listdir(section_dir) if os.path.isdir(section_dir) else []:
+            if name not in keep:
+                os.remove(os.path.join(section_dir, name))
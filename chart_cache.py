@@ -0,0 +1,80 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "charts")
+
+
+def fingerprint(frames, params):
+    """以繪圖資料內容與繪圖參數計算雜湊值
+
+    frames 為 DataFrame 或其列表 (僅取數值與日期)，params 為可序列化為 JSON 的繪圖參數。
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    for df in frames if isinstance(frames, (list, tuple)) else [frames]:
+        h.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+        h.update(np.ascontiguousarray(df.index.values.astype("datetime64[ns]").astype("int64")).tobytes())
+        h.update(np.ascontiguousarray(df.to_numpy(dtype="float64")).tobytes())
+    return h.hexdigest()
+
+
+class ChartCache:
+    """以內容雜湊為鍵的磁碟圖檔快取，依最近使用時間 (LRU) 與總容量淘汰舊檔"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=200 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.root, key + ".png")
+
+    def get(self, key):
+        """讀取快取圖檔；命中時更新存取時間以維持 LRU 順序"""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            self.hits += 1
+            return data
+        except OSError:
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """寫入圖檔 (先寫暫存檔再置換)"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path(key))
+
+    def evict(self):
+        """總容量超過上限時，由最久未使用的圖檔開始刪除"""
+        if not os.path.isdir(self.root):
+            return 0
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".png"):
+                st = os.stat(os.path.join(self.root, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.root, name))
+            total -= size
+            removed += 1
+        return removed
+
+    def report(self):
+        """輸出本次執行的快取命中統計"""
+        total = self.hits + self.misses
+        if total:
+            print(f"[Info] 圖表快取：命中 {self.hits} 張，未命中 {self.misses} 張 (命中率 {self.hits / total:.0%})")
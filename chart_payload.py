@@ -0,0 +1,58 @@
+import json
+import gzip
+import base64
+
+import numpy as np
+import pandas as pd
+
+YIELD_PAYLOAD_KEY = "__yield__"
+
+
+def _round_sig(values, digits=6):
+    """依整體量級四捨五入至約 digits 位有效數字 (約等於 float32 精度)，NaN 轉為 None"""
+    arr = np.asarray(values, dtype="float64")
+    finite = np.abs(arr[np.isfinite(arr)])
+    top = finite.max() if finite.size else 0
+    decimals = max(0, digits - 1 - int(np.floor(np.log10(top)))) if top > 0 else 0
+    arr = np.round(arr, decimals)
+    return [None if v != v else (int(v) if decimals == 0 else v) for v in arr.tolist()]
+
+
+def _day_offsets(index):
+    """日期以相對首日的天數表示，避免重複輸出日期字串"""
+    days = (index.normalize() - index[0].normalize()).days
+    return index[0].strftime('%Y-%m-%d'), days.tolist()
+
+
+def build_chart_payload(frames, ma_periods):
+    """將各標的繪圖區間轉為欄式精簡資料：{名稱: {b: 首日, t: 天數位移, o/h/l/c/v: 數列, ma: {週期: 數列}}}"""
+    payload = {}
+    for name, df in frames.items():
+        if df is None or df.empty:
+            continue
+        base, offsets = _day_offsets(df.index)
+        entry = {"b": base, "t": offsets}
+        for key, col in (("o", "Open"), ("h", "High"), ("l", "Low"), ("c", "Close")):
+            entry[key] = _round_sig(df[col])
+        entry["v"] = [None if v != v else int(round(v)) for v in df["Volume"].tolist()]
+        entry["ma"] = {str(p): _round_sig(df[f"{p}MA"]) for p in ma_periods if f"{p}MA" in df.columns}
+        payload[name] = entry
+    return payload
+
+
+def build_yield_payload(yield_frames, labels):
+    """殖利率走勢：各天期對齊同一日期軸後輸出 {b, t, series: {標籤: 數列}}"""
+    closes = pd.DataFrame({labels[s]: df['Close'] for s, df in yield_frames.items() if s in labels and not df.empty})
+    if closes.empty:
+        return None
+    closes = closes.sort_index()
+    base, offsets = _day_offsets(closes.index)
+    return {"b": base, "t": offsets, "series": {c: _round_sig(closes[c], digits=4) for c in closes.columns}}
+
+
+def encode_payload(payload, encoding="json"):
+    """輸出可直接放入 <script> 標籤的字串；gzip 編碼時為 Base64 後的壓縮資料 (瀏覽器以 DecompressionStream 解壓)"""
+    text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    if encoding == "gzip":
+        return base64.b64encode(gzip.compress(text.encode("utf-8"), mtime=0)).decode("ascii")
+    return text.replace("</", "<\\/")
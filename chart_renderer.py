@@ -0,0 +1,122 @@
+import os
+import time
+import base64
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+
+from chart_cache import fingerprint
+
+PLOT_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# 樣式與繪圖函式庫版本皆納入快取鍵，任一變動時圖表會重新繪製
+STYLE_PARAMS = {
+    "marketcolors": dict(up='#e53935', down='#43a047', edge='inherit', wick='inherit', volume='in', inherit=True),
+    "style": dict(base_mpf_style='yahoo', gridstyle=':', gridcolor='#e0e0e0', facecolor='white'),
+}
+# 版本取自套件資訊，不需為了計算快取鍵而載入繪圖函式庫 (mplfinance 於第一次繪圖時才載入)
+RENDERER_VERSION = f"mplfinance {version('mplfinance')} / matplotlib {version('matplotlib')}"
+
+# 每個行程只建立一次 mplfinance 樣式
+_STYLE = None
+
+
+def get_style():
+    """取得K線圖樣式 (台股慣例：紅漲綠跌)"""
+    global _STYLE
+    if _STYLE is None:
+        import mplfinance as mpf
+        mc = mpf.make_marketcolors(**STYLE_PARAMS["marketcolors"])
+        _STYLE = mpf.make_mpf_style(marketcolors=mc, **STYLE_PARAMS["style"])
+    return _STYLE
+
+
+def render_candlestick_png(df, ma_periods):
+    """繪製K線圖 (含MA與成交量) 並返回 PNG 位元組"""
+    import mplfinance as mpf
+    buf = BytesIO()
+    mpf.plot(df[[c for c in PLOT_COLUMNS if c in df.columns]], type='candle', mav=tuple(ma_periods), volume=True,
+             style=get_style(), figsize=(10, 6),
+             savefig=dict(fname=buf, format='png', bbox_inches='tight', pad_inches=0.1, dpi=100),
+             ylabel='', ylabel_lower='', xrotation=0, datetime_format='%m-%d', tight_layout=True, panel_ratios=(4,1))
+    return buf.getvalue()
+
+
+def chart_key(df, ma_periods, **params):
+    """計算K線圖快取鍵：繪圖資料 (OHLCV) + MA 週期、繪圖天數等參數 + 樣式與函式庫版本"""
+    return fingerprint(df[[c for c in PLOT_COLUMNS if c in df.columns]],
+                       dict(params, kind="candle", ma_periods=list(ma_periods), style=STYLE_PARAMS, renderer=RENDERER_VERSION))
+
+
+def _init_worker():
+    """子行程初始化：使用非互動式後端並預先建立樣式"""
+    import matplotlib
+    matplotlib.use("Agg")
+    get_style()
+
+
+def _render_job(symbol, df, ma_periods):
+    t0 = time.perf_counter()
+    try:
+        return symbol, render_candlestick_png(df, ma_periods), time.perf_counter() - t0, None
+    except Exception as e:
+        return symbol, None, time.perf_counter() - t0, str(e)
+
+
+def make_render_pool(max_workers=None):
+    """建立可跨批次重複使用的繪圖行程池；只有一個 CPU 時回傳 None (直接於本行程繪製)"""
+    workers = max_workers or os.cpu_count() or 1
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+
+
+def render_charts(jobs, ma_periods, max_workers=None, cache=None, key_params=None, pool=None):
+    """以行程池並行繪製多張K線圖
+
+    jobs 為 [(symbol, DataFrame)]，回傳 ({symbol: Base64 字串}, {symbol: 秒數})。
+    同一份資料無論在哪個行程繪製，輸出的 PNG 位元組皆相同。
+    提供 cache (ChartCache) 時，資料與參數未變的圖表直接取用快取，只繪製其餘部分。
+    提供 pool (make_render_pool) 時沿用該行程池，省去每批重新啟動子行程的成本。
+    """
+    jobs = [(s, df[[c for c in PLOT_COLUMNS if c in df.columns]]) for s, df in jobs]
+    pngs, keys, pending = {}, {}, []
+    for symbol, df in jobs:
+        if cache is not None:
+            keys[symbol] = chart_key(df, ma_periods, **(key_params or {}))
+            png = cache.get(keys[symbol])
+            if png is not None:
+                pngs[symbol] = png
+                continue
+        pending.append((symbol, df))
+
+    workers = min(max_workers or os.cpu_count() or 1, len(pending))
+    if pool is not None and pending:
+        futures = [pool.submit(_render_job, s, df, ma_periods) for s, df in pending]
+        results = [f.result() for f in futures]
+    elif workers <= 1:
+        results = [_render_job(s, df, ma_periods) for s, df in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_render_job, s, df, ma_periods) for s, df in pending]
+            results = [f.result() for f in futures]
+
+    timings = {}
+    for symbol, png, elapsed, error in results:
+        timings[symbol] = elapsed
+        if error:
+            print(f"[Error] 繪製 {symbol} K線圖時發生錯誤: {error}")
+            continue
+        pngs[symbol] = png
+        if cache is not None:
+            cache.put(keys[symbol], png)
+    plots = {s: (base64.b64encode(pngs[s]).decode('utf-8') if s in pngs else None) for s, _ in jobs}
+    return plots, timings
+
+
+def report_render_timing(timings, wall_time, top=3):
+    """列出繪圖總耗時與最慢的圖表"""
+    if not timings:
+        return
+    ranked = sorted(timings.items(), key=lambda x: x[1], reverse=True)
+    print(f"[Info] 共繪製 {len(timings)} 張K線圖，實際耗時 {wall_time:.2f} 秒 (單張累計 {sum(timings.values()):.2f} 秒)")
+    for symbol, elapsed in ranked[:top]:
+        print(f"  - {symbol}: {elapsed:.2f} 秒")
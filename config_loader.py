@@ -0,0 +1,48 @@
+import os
+import json
+
+DEFAULT_CONFIG_FILE = "config.json"
+
+
+class ConfigError(Exception):
+    """設定檔不存在或格式錯誤"""
+
+
+class ConfigLoader:
+    """讀取並快取設定檔：檔案的修改時間與大小未變時直接回傳上次解析的結果"""
+
+    def __init__(self, path=DEFAULT_CONFIG_FILE):
+        self.path = path
+        self._stamp = None
+        self._config = None
+
+    def load(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            raise ConfigError(f"找不到設定檔 {self.path}。")
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+            except json.JSONDecodeError:
+                raise ConfigError(f"設定檔 {self.path} 格式不正確。")
+            if not isinstance(config, dict):
+                raise ConfigError(f"設定檔 {self.path} 格式不正確。")
+            self._config, self._stamp = config, stamp
+        return self._config
+
+    def params(self):
+        return self.load().get("parameters", {})
+
+
+_LOADERS = {}
+
+
+def get_loader(path=DEFAULT_CONFIG_FILE):
+    """同一路徑共用一個 ConfigLoader，多個模組讀取設定時只解析一次"""
+    key = os.path.abspath(path)
+    if key not in _LOADERS:
+        _LOADERS[key] = ConfigLoader(path)
+    return _LOADERS[key]
@@ -0,0 +1,145 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from price_store import merge_frames
+from yield_curve import TENORS
+
+# 殖利率曲線使用的美國公債殖利率代號
+YIELD_SYMBOLS = list(TENORS)
+# 重疊K棒的收盤價相對差異超過此值時，視為歷史價格已因除權息或分割重新調整
+ADJUST_TOLERANCE = 1e-4
+
+
+def yf_fetcher(symbol, start, end=None, timeout=20):
+    """以 yfinance 抓取單一標的日線資料 (欄位與 yf.download(auto_adjust=True) 一致)
+
+    yf.download 內部使用全域暫存，多執行緒同時呼叫並不安全，
+    因此改用 Ticker.history，其結果與 download 單檔結果相同。
+    yfinance 載入耗時，只在實際連網下載時才載入。
+    """
+    import yfinance as yf
+    df = yf.Ticker(symbol).history(start=start, end=end, actions=False, auto_adjust=True,
+                                   timeout=timeout, raise_errors=True)
+    if df.empty:
+        raise ValueError("回傳資料為空")
+    return df
+
+
+def normalize_frame(df):
+    """統一欄位與索引格式：移除多層欄位、時區與重複日期"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.droplevel(1)
+    if getattr(df.index, "tz", None) is not None:
+        df.index = df.index.tz_localize(None)
+    df.index.name = "Date"
+    return df[~df.index.duplicated(keep='first')]
+
+
+def _fetch_one(fetcher, symbol, start, end, retries, backoff, timeout):
+    """抓取單一標的，失敗時依指數退避重試，回傳 (DataFrame 或 None, 耗時, 錯誤)"""
+    t0 = time.perf_counter()
+    error = None
+    for attempt in range(retries + 1):
+        try:
+            df = fetcher(symbol, start, end, timeout=timeout)
+            if df is not None and not df.empty:
+                return normalize_frame(df), time.perf_counter() - t0, None
+            error = "回傳資料為空"
+        except Exception as e:
+            error = e
+        if attempt < retries:
+            time.sleep(backoff * (2 ** attempt))
+    return None, time.perf_counter() - t0, error
+
+
+def _fetch_all(fetcher, starts, end, max_workers, retries, backoff, timeout):
+    """以有上限的執行緒池抓取 {symbol: 起始日期}，回傳 {symbol: (DataFrame 或 None, 耗時, 錯誤)}"""
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(starts)))) as pool:
+        futures = {s: pool.submit(_fetch_one, fetcher, s, start, end, retries, backoff, timeout) for s, start in starts.items()}
+        return {s: f.result() for s, f in futures.items()}
+
+
+def readjusted(old, new, date, tolerance=ADJUST_TOLERANCE):
+    """新下載資料在 date 的收盤價與本地資料不同 (auto_adjust 的歷史價格已重新調整)"""
+    if date not in new.index:
+        return False
+    stored, fetched = old.at[date, 'Close'], new.at[date, 'Close']
+    return abs(fetched - stored) > tolerance * abs(stored)
+
+
+def fetch_price_data(symbols, start_date, end_date=None, fetcher=None,
+                     max_workers=8, retries=2, backoff=1.0, timeout=20, store=None, offline=False):
+    """以有上限的執行緒池並行抓取多支標的，回傳 (資料字典, 各標的耗時秒數)
+
+    start_date 可為單一日期，或 {symbol: 起始日期} 以便不同標的使用不同的抓取區間。
+    fetcher 介面為 fetcher(symbol, start, end, timeout=...) -> DataFrame，測試時可替換為本地假資料。
+    提供 store (PriceStore) 時先讀取本地資料，僅下載倒數第二根K棒之後的增量；offline 則完全不連網。
+    auto_adjust 的價格在除權息或分割後會整段重新調整，因此增量下載時比對重疊的已收盤K棒 (倒數第二根，
+    最後一根可能是盤中數值)，收盤價不同時改為重新下載完整區間並取代本地資料，避免新舊資料接縫處的指標失真。
+    """
+    fetcher = fetcher or yf_fetcher
+    symbols = list(dict.fromkeys(symbols))
+    starts = start_date if isinstance(start_date, dict) else {s: start_date for s in symbols}
+    starts = {s: pd.Timestamp(starts[s]).normalize() for s in symbols}
+    data, latencies = {}, {}
+    if not symbols:
+        return data, latencies
+
+    # 本地資料已涵蓋所需區間者，只從倒數第二根K棒 (含) 開始補抓，該根用於比對歷史價格是否重新調整
+    cached, fetch_starts, overlap = {}, {}, {}
+    for symbol in symbols:
+        old, since = store.read(symbol) if store else (None, None)
+        if old is not None and not old.empty:
+            cached[symbol] = (old, since)
+            if since <= starts[symbol]:
+                fetch_starts[symbol] = overlap[symbol] = old.index[max(0, len(old) - 2)]
+                continue
+        fetch_starts[symbol] = starts[symbol]
+
+    results, replaced = {}, set()
+    if not offline:
+        results = _fetch_all(fetcher, fetch_starts, end_date, max_workers, retries, backoff, timeout)
+        replaced = {s for s in overlap if results[s][0] is not None and readjusted(cached[s][0], results[s][0], overlap[s])}
+    if replaced:
+        print(f"[Warning] {', '.join(sorted(replaced))} 的歷史價格已重新調整 (除權息或分割)，重新下載完整區間")
+        full = _fetch_all(fetcher, {s: min(cached[s][1], starts[s]) for s in replaced}, end_date, max_workers, retries, backoff, timeout)
+        for symbol, (df, elapsed, error) in full.items():
+            # 重新下載失敗時不合併增量，以免接上未調整的本地資料
+            results[symbol] = (df, results[symbol][1] + elapsed, error)
+
+    fetched_bars = cached_bars = 0
+    for symbol in symbols:
+        old, since = cached.get(symbol, (None, None))
+        df, elapsed, error = results.get(symbol, (None, 0.0, None))
+        if symbol in results:
+            latencies[symbol] = elapsed
+        if df is None:
+            if old is None:
+                print(f"[Error] 抓取 {symbol} 資料時發生錯誤: {error or '離線模式且無本地資料'}")
+                continue
+            if not offline:
+                print(f"[Warning] 抓取 {symbol} 失敗，改用本地資料 (最後日期 {old.index[-1]:%Y-%m-%d}): {error}")
+            merged = old
+        else:
+            merged = df if symbol in replaced else merge_frames(old, df)
+            fetched_bars += len(df)
+            if store:
+                store.write(symbol, merged, min(since, starts[symbol]) if since is not None else starts[symbol])
+        cached_bars += len(merged) - (0 if df is None else len(df))
+        data[symbol] = merged[merged.index >= starts[symbol]]
+    if store:
+        print(f"[Info] 本次下載 {fetched_bars} 筆K棒，{cached_bars} 筆取自本地資料")
+    return data, latencies
+
+
+def report_fetch_latency(latencies, top=5):
+    """列出耗時最長的標的，協助找出拖慢整體下載時間的代號"""
+    if not latencies:
+        return
+    ranked = sorted(latencies.items(), key=lambda x: x[1], reverse=True)
+    total = sum(latencies.values())
+    print(f"[Info] 共下載 {len(latencies)} 檔標的，累計耗時 {total:.2f} 秒，單檔最長 {ranked[0][1]:.2f} 秒")
+    for symbol, elapsed in ranked[:top]:
+        print(f"  - {symbol}: {elapsed:.2f} 秒")
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import queue
+import threading
+import urllib.parse
+from concurrent.futures import Future, wait
+
+DEFAULT_CACHE_DIR = os.path.join("cache", "fundamentals")
+DAY_SECONDS = 86400
+
+# 報告欄位 -> yfinance Ticker.info 鍵值
+FIELD_MAP = {
+    "pe_trailing": "trailingPE",
+    "pe_forward": "forwardPE",
+    "pb_ratio": "priceToBook",
+    "peg_ratio": "pegRatio",
+    "roe": "returnOnEquity",
+    "gross_margin": "grossMargins",
+    "operating_margin": "operatingMargins",
+    "dividend_yield": "dividendYield",
+    "payout_ratio": "payoutRatio",
+    "free_cashflow": "freeCashflow",
+    "debt_to_equity": "debtToEquity",
+    "sector": "sector",
+    "industry": "industry",
+}
+
+# 各欄位的快取天數：與股價連動的比率每日更新，財報數字每季、產業分類極少變動
+DEFAULT_TTL_DAYS = {
+    "default": 7,
+    "pe_trailing": 1, "pe_forward": 1, "pb_ratio": 1, "peg_ratio": 1, "dividend_yield": 1,
+    "roe": 30, "gross_margin": 30, "operating_margin": 30, "payout_ratio": 30,
+    "free_cashflow": 30, "debt_to_equity": 30,
+    "sector": 180, "industry": 180,
+}
+
+
+def yf_info_fetcher(symbol):
+    """以 yfinance 取得單一標的的 Ticker.info (yfinance 於第一次呼叫時才載入)"""
+    import yfinance as yf
+    return yf.Ticker(symbol).info
+
+
+def extract_fields(info):
+    """由 Ticker.info 取出報告使用的基本面欄位"""
+    return {field: info.get(key) for field, key in FIELD_MAP.items()}
+
+
+class FundamentalCache:
+    """以標的為鍵的基本面磁碟快取，每個欄位記錄最後一次成功取得的值與時間"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+
+    def path(self, symbol):
+        return os.path.join(self.root, urllib.parse.quote(symbol, safe='') + ".json")
+
+    def read(self, symbol):
+        """回傳 {欄位: {"value": 值, "fetched": 時間戳}}；無快取或檔案損毀時回傳空字典"""
+        try:
+            with open(self.path(symbol), "r", encoding="utf-8") as f:
+                return json.load(f).get("fields", {})
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, symbol, fields):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(symbol)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"symbol": symbol, "fields": fields}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def stale_fields(entry, ttl_days, now):
+    """列出已超過快取天數 (或從未取得) 的欄位"""
+    default = ttl_days.get("default", DEFAULT_TTL_DAYS["default"])
+    return [field for field in FIELD_MAP
+            if field not in entry or now - entry[field].get("fetched", 0) > ttl_days.get(field, default) * DAY_SECONDS]
+
+
+def _fetch_one(fetcher, symbol):
+    t0 = time.perf_counter()
+    try:
+        info = fetcher(symbol) or {}
+        fields = extract_fields(info)
+        # 遭限流時 yfinance 可能回傳幾乎空白的 info，視為失敗以免覆蓋舊值
+        if all(v is None for v in fields.values()):
+            return None, time.perf_counter() - t0, "回傳資料為空"
+        return fields, time.perf_counter() - t0, None
+    except Exception as e:
+        return None, time.perf_counter() - t0, e
+
+
+def _store(cache, symbol, entry, fields, fetched_at):
+    entry = dict(entry)
+    for field, value in fields.items():
+        entry[field] = {"value": value, "fetched": fetched_at}
+    if cache is not None:
+        cache.write(symbol, entry)
+    return entry
+
+
+def _daemon_map(fn, items, max_workers):
+    """以最多 max_workers 條 daemon 執行緒執行 fn(item)，回傳 {item: Future}
+
+    不使用 ThreadPoolExecutor：其工作執行緒會在直譯器結束時被等待，卡住的 Ticker.info 請求會讓程式無法結束；
+    daemon 執行緒在主程式結束時直接捨棄，timeout 因此能限制總執行時間。
+    """
+    futures = {item: Future() for item in items}
+    todo = queue.SimpleQueue()
+    for item in items:
+        todo.put(item)
+
+    def worker():
+        while True:
+            try:
+                item = todo.get_nowait()
+            except queue.Empty:
+                return
+            future = futures[item]
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(item))
+                except BaseException as e:
+                    future.set_exception(e)
+
+    for _ in range(max(1, min(max_workers, len(items)))):
+        threading.Thread(target=worker, daemon=True).start()
+    return futures
+
+
+def _revalidate(future, cache, symbol, entry):
+    """逾時的抓取於背景完成後寫回快取"""
+    fields = future.result()[0]
+    if fields is not None and cache is not None:
+        _store(cache, symbol, entry, fields, time.time())
+
+
+def fetch_fundamentals(symbols, fetcher=None, cache=None, ttl_days=None, max_workers=8, timeout=30,
+                       offline=False, now=None):
+    """以有上限的執行緒池並行取得多檔標的基本面資料，回傳 {symbol: {欄位: 值}}
+
+    僅在快取中有欄位超過 ttl_days 設定的天數時才連網；抓取失敗、或超過 timeout 秒仍未完成時
+    沿用快取中最後一次成功的值 (stale-while-revalidate)，逾時的抓取若在程式結束前完成，仍會在背景寫回快取供下次使用。
+    fetcher 介面為 fetcher(symbol) -> Ticker.info 字典，測試時可替換為本地假資料。
+    """
+    fetcher = fetcher or yf_info_fetcher
+    ttl_days = dict(DEFAULT_TTL_DAYS, **(ttl_days or {}))
+    now = time.time() if now is None else now
+    symbols = list(dict.fromkeys(symbols))
+    entries = {s: (cache.read(s) if cache is not None else {}) for s in symbols}
+    pending = [] if offline else [s for s in symbols if stale_fields(entries[s], ttl_days, now)]
+
+    results, late = {}, []
+    if pending:
+        futures = _daemon_map(lambda s: _fetch_one(fetcher, s), pending, max_workers)
+        wait(futures.values(), timeout=timeout)
+        for symbol, future in futures.items():
+            if future.done():
+                results[symbol] = future.result()
+            else:
+                late.append(symbol)
+                # 本次報告先使用舊值
+                future.add_done_callback(lambda f, s=symbol: _revalidate(f, cache, s, entries[s]))
+
+    data, refreshed, fallback, missing = {}, 0, 0, 0
+    for symbol in symbols:
+        entry = entries[symbol]
+        fields, _, error = results.get(symbol, (None, 0.0, None))
+        if fields is not None:
+            entry = _store(cache, symbol, entry, fields, now)
+            refreshed += 1
+        elif symbol in results or symbol in late:
+            reason = f"超過 {timeout} 秒未完成" if symbol in late else error
+            if entry:
+                fallback += 1
+                print(f"[Warning] 無法更新 {symbol} 的基本面資料，沿用快取舊值: {reason}")
+            else:
+                print(f"[Warning] 無法獲取 {symbol} 的基本面資料: {reason}")
+        if not entry:
+            missing += 1
+            continue
+        data[symbol] = {field: entry[field]["value"] if field in entry else None for field in FIELD_MAP}
+    cached = len(symbols) - refreshed - fallback - missing
+    print(f"[Info] 基本面資料：{cached} 檔取自快取，{refreshed} 檔已更新，{fallback} 檔沿用舊值，{missing} 檔無資料")
+    return data
@@ -0,0 +1,448 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# --- 2-D 陣列運算 (axis 0 為K棒，axis 1 為標的) ---
+
+def _windows(a, window):
+    """在前方補上 window-1 列 NaN 後取得滑動視窗視圖 (不複製資料)，形狀為 (K棒數, 標的數, window)"""
+    pad = np.full((window - 1, a.shape[1]), np.nan)
+    return sliding_window_view(np.vstack([pad, a]), window, axis=0)
+
+
+def rolling_sum(a, window, mean=False):
+    """等同 rolling(window).sum()：視窗內有 NaN 或資料不足時為 NaN
+
+    pandas 在視窗內數值全部相同時直接回傳該值 (避免浮點誤差)，此處比照處理，
+    確保價格持平時乖離率恰為 0，趨勢判斷不會因極小誤差而改變。
+    """
+    w = _windows(a, window)
+    total = w.sum(axis=-1)
+    result = total / window if mean else total
+    flat = (np.fmin.reduce(w, axis=-1) == np.fmax.reduce(w, axis=-1)) & (total == total)
+    return np.where(flat, a if mean else a * window, result)
+
+
+def rolling_mean(a, window):
+    """等同 rolling(window).mean()"""
+    return rolling_sum(a, window, mean=True)
+
+
+def rolling_min(a, window):
+    """等同 rolling(window, min_periods=1).min()：忽略 NaN"""
+    return np.fmin.reduce(_windows(a, window), axis=-1)
+
+
+def rolling_max(a, window):
+    """等同 rolling(window, min_periods=1).max()：忽略 NaN"""
+    return np.fmax.reduce(_windows(a, window), axis=-1)
+
+
+def shift(a, periods=1):
+    """等同 Series.shift(periods)"""
+    out = np.full_like(a, np.nan)
+    out[periods:] = a[:-periods]
+    return out
+
+
+def ewm_alpha(com=None, span=None):
+    """依 pandas 相同的換算順序取得平滑係數 (span 先換算為 com，確保數值逐位元一致)"""
+    if span is not None:
+        com = (span - 1) / 2.0
+    return 1.0 / (1.0 + com)
+
+
+def ewm_mean(a, alpha):
+    """等同 ewm(adjust=False).mean()，逐列遞迴但一次處理所有標的，NaN 的處理方式與 pandas 相同"""
+    out = np.empty_like(a)
+    weighted = a[0].copy()
+    old_wt = np.ones(a.shape[1])
+    out[0] = weighted
+    for i in range(1, len(a)):
+        cur = a[i]
+        is_obs = cur == cur
+        started = weighted == weighted
+        old_wt = np.where(started, old_wt * (1.0 - alpha), old_wt)
+        update = started & is_obs
+        blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(update & (weighted != cur), blended, weighted)
+        weighted = np.where(~started & is_obs, cur, weighted)
+        old_wt = np.where(update, 1.0, old_wt)
+        out[i] = weighted
+    return out
+
+
+# --- 多標的指標面板 ---
+
+class IndicatorPanel:
+    """多標的指標面板：每個欄位為 (K棒數 x 標的數) 的 2-D 陣列
+
+    台股與美股交易日不同，因此各標的依「K棒序號」靠右對齊 (最後一列皆為最新一根)，
+    前方不足的部分補 NaN，如此滾動視窗與逐檔計算時涵蓋的K棒完全相同。
+    """
+
+    def __init__(self, symbols, indexes, columns):
+        self.symbols = list(symbols)
+        self.indexes = indexes
+        self.columns = columns
+        self.fields = {}
+        self.base_fields = []
+        self.rows = max((len(ix) for ix in indexes.values()), default=0)
+
+    @classmethod
+    def from_frames(cls, frames):
+        """由 {symbol: DataFrame} 建立面板，基本欄位堆疊為 2-D 陣列"""
+        symbols = list(frames)
+        panel = cls(symbols, {s: frames[s].index for s in symbols}, {s: list(frames[s].columns) for s in symbols})
+        panel.base_fields = list(dict.fromkeys(c for s in symbols for c in frames[s].columns))
+        for col in panel.base_fields:
+            arr = np.full((panel.rows, len(symbols)), np.nan)
+            for j, s in enumerate(symbols):
+                if col in frames[s].columns:
+                    values = frames[s][col].to_numpy(dtype="float64")
+                    arr[panel.rows - len(values):, j] = values
+            panel.fields[col] = arr
+        return panel
+
+    def valid_mask(self):
+        """標記各標的實際有資料的列 (排除前方補齊的列)"""
+        lengths = np.array([len(self.indexes[s]) for s in self.symbols])
+        return np.arange(self.rows)[:, None] >= (self.rows - lengths)[None, :]
+
+    def frame(self, symbol, fields=None):
+        """取出單一標的的 DataFrame，欄位順序與 calculate_all_indicators 相同"""
+        j = self.symbols.index(symbol)
+        index = self.indexes[symbol]
+        start = self.rows - len(index)
+        names = fields or self.columns[symbol] + [f for f in self.fields if f not in self.base_fields]
+        return pd.DataFrame({f: self.fields[f][start:, j] for f in names}, index=index)
+
+    def frames(self):
+        return {s: self.frame(s) for s in self.symbols}
+
+
+def compute_indicator_panel(frames, kd_window=9, rsi_window=14, bias_periods=(5, 20, 60), dmi_window=14,
+                            ma_periods=(5, 20, 60), vol_ma_window=20):
+    """一次計算所有標的的技術指標 (KD、RSI、MACD、BIAS、DMI/ADX、量能與均線)
+
+    結果與逐檔呼叫 calculate_all_indicators 在浮點誤差範圍內一致。
+    """
+    panel = IndicatorPanel.from_frames(frames)
+    if not panel.symbols or panel.rows == 0:
+        return panel
+    f = panel.fields
+    high, low, close, volume = f['High'], f['Low'], f['Close'], f['Volume']
+    valid = panel.valid_mask()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # KD
+        low_min = rolling_min(low, kd_window)
+        high_max = rolling_max(high, kd_window)
+        rsv = (close - low_min) / (high_max - low_min) * 100
+        f['K'] = ewm_mean(rsv, ewm_alpha(com=2))
+        f['D'] = ewm_mean(f['K'], ewm_alpha(com=2))
+
+        # RSI (首根K棒的漲跌視為 0，與 Series.where 的行為一致)
+        delta = close - shift(close)
+        gain = np.where(valid, np.where(delta > 0, delta, 0), np.nan)
+        loss = np.where(valid, -np.where(delta < 0, delta, 0), np.nan)
+        rs = rolling_mean(gain, rsi_window) / rolling_mean(loss, rsi_window)
+        f['RSI'] = 100 - (100 / (1 + rs))
+
+        # MACD
+        exp1 = ewm_mean(close, ewm_alpha(span=12))
+        exp2 = ewm_mean(close, ewm_alpha(span=26))
+        f['MACD'] = exp1 - exp2
+        f['Signal_Line'] = ewm_mean(f['MACD'], ewm_alpha(span=9))
+        f['MACD_Hist'] = f['MACD'] - f['Signal_Line']
+
+        # 乖離率 (BIAS)
+        close_ma = {p: rolling_mean(close, p) for p in dict.fromkeys(list(bias_periods) + list(ma_periods))}
+        for period in bias_periods:
+            ma = close_ma[period]
+            f[f'BIAS_{period}'] = ((close - ma) / ma) * 100
+
+        # DMI
+        prev_close = shift(close)
+        f['+DM'] = np.maximum(high - shift(high), 0)
+        f['-DM'] = -np.minimum(low - shift(low), 0)
+        tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+        f['TR'] = rolling_sum(tr, dmi_window)
+        f['+DI'] = 100 * (rolling_sum(f['+DM'], dmi_window) / f['TR'])
+        f['-DI'] = 100 * (rolling_sum(f['-DM'], dmi_window) / f['TR'])
+        dx = np.abs(f['+DI'] - f['-DI']) / (f['+DI'] + f['-DI'])
+        f['ADX'] = rolling_mean(dx * 100, dmi_window)
+
+        # 量價相關
+        f['Change %'] = (close / shift(close) - 1) * 100
+        vol_change = volume / rolling_mean(volume, vol_ma_window) * 100
+        f['Volume Change %'] = np.where(np.isnan(vol_change), 0, vol_change)
+
+        # 均線
+        for ma_period in ma_periods:
+            f[f'{ma_period}MA'] = close_ma[ma_period]
+    return panel
+
+
+# --- 趨勢狀態 ---
+
+# 狀態代碼 1~4 依序對應；0 為資料不足 (與 determine_trend 的判斷順序相同)
+TREND_STATES = ("多頭排列", "反彈", "空頭修正", "回檔整理")
+TREND_CLASSES = ("neutral", "bullish-strong", "bullish-weak", "bearish-strong", "bearish-weak")
+
+
+def classify_trend(k, d, bias_signal, threshold=0):
+    """determine_trend 的陣列版本，回傳狀態代碼陣列 (NaN 或 K=D 等無法判斷者為 0)"""
+    with np.errstate(invalid="ignore"):
+        up, down = k > d, k < d
+        above, below = bias_signal > threshold, bias_signal < threshold
+    return np.select([up & above, up & below, down & below, down & above], [1, 2, 3, 4], 0).astype(np.int8)
+
+
+# --- 逐根K棒更新的指標狀態 ---
+
+def _div(a, b):
+    """比照 NumPy 的除法語意 (除以 0 得 inf/NaN 而非例外)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float(np.float64(a) / b)
+
+
+class _EwmState:
+    """ewm(adjust=False).mean() 的遞迴狀態，與 pandas 的 NaN 處理方式相同"""
+
+    def __init__(self, alpha, weighted=np.nan, old_wt=1.0):
+        self.alpha, self.weighted, self.old_wt = alpha, weighted, old_wt
+
+    def push(self, cur):
+        if self.weighted == self.weighted:
+            self.old_wt *= 1.0 - self.alpha
+            if cur == cur:
+                if self.weighted != cur:
+                    self.weighted = (self.old_wt * self.weighted + self.alpha * cur) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif cur == cur:
+            self.weighted = cur
+        return self.weighted
+
+    def to_dict(self):
+        return {"weighted": self.weighted, "old_wt": self.old_wt}
+
+
+class _RollingState:
+    """固定視窗的滾動加總：新增與移除各為 O(1)，以補償加總抑制累積誤差
+
+    與 pandas 相同，視窗內有 NaN 或資料不足時為 NaN；連續數值全同時直接回傳該值。
+    """
+
+    def __init__(self, window, values=(), total=0.0, comp=0.0, nobs=0, same=0, prev=np.nan):
+        self.window = window
+        self.values = deque(values, maxlen=window)
+        self.total, self.comp, self.nobs, self.same, self.prev = total, comp, nobs, same, prev
+
+    def _add(self, val):
+        y = val - self.comp
+        t = self.total + y
+        self.comp = t - self.total - y
+        self.total = t
+
+    def push(self, val):
+        if len(self.values) == self.window:
+            old = self.values[0]
+            if old == old:
+                self.nobs -= 1
+                self._add(-old)
+        self.values.append(val)
+        if val == val:
+            self.nobs += 1
+            self._add(val)
+            self.same = self.same + 1 if val == self.prev else 1
+            self.prev = val
+
+    def sum(self):
+        if self.nobs < self.window:
+            return np.nan
+        return self.prev * self.nobs if self.same >= self.nobs else self.total
+
+    def mean(self):
+        if self.nobs < self.window:
+            return np.nan
+        return self.prev if self.same >= self.nobs else self.total / self.window
+
+    def to_dict(self):
+        return {"values": list(self.values), "total": self.total, "comp": self.comp,
+                "nobs": self.nobs, "same": self.same, "prev": self.prev}
+
+
+class IndicatorState:
+    """單一標的的逐根更新指標狀態
+
+    每根新K棒以固定成本更新 K、D、RSI、MACD、Signal_Line、BIAS_n、+DI/-DI/ADX 與 nMA，
+    結果與批次計算 (calculate_all_indicators) 在浮點誤差範圍內一致。
+    update(bar, replace_last=True) 可用盤中最新報價覆寫最後一根K棒；
+    to_dict()/from_dict() 可序列化後與價格資料一同存放。
+    """
+
+    def __init__(self, kd_window=9, rsi_window=14, bias_periods=(5, 20, 60), dmi_window=14,
+                 ma_periods=(5, 20, 60), vol_ma_window=20):
+        self.params = {"kd_window": kd_window, "rsi_window": rsi_window, "bias_periods": list(bias_periods),
+                       "dmi_window": dmi_window, "ma_periods": list(ma_periods), "vol_ma_window": vol_ma_window}
+        self._init_state()
+        self._prev_state = None
+        self.latest = {}
+
+    def _init_state(self):
+        p = self.params
+        self.bars = 0
+        self.prev_bar = None
+        self.kd_highs = deque(maxlen=p["kd_window"])
+        self.kd_lows = deque(maxlen=p["kd_window"])
+        self.k = _EwmState(ewm_alpha(com=2))
+        self.d = _EwmState(ewm_alpha(com=2))
+        self.exp1 = _EwmState(ewm_alpha(span=12))
+        self.exp2 = _EwmState(ewm_alpha(span=26))
+        self.signal = _EwmState(ewm_alpha(span=9))
+        self.gain = _RollingState(p["rsi_window"])
+        self.loss = _RollingState(p["rsi_window"])
+        self.close_ma = {n: _RollingState(n) for n in dict.fromkeys(p["bias_periods"] + p["ma_periods"])}
+        self.plus_dm = _RollingState(p["dmi_window"])
+        self.minus_dm = _RollingState(p["dmi_window"])
+        self.tr = _RollingState(p["dmi_window"])
+        self.dx = _RollingState(p["dmi_window"])
+        self.volume = _RollingState(p["vol_ma_window"])
+
+    @classmethod
+    def from_frame(cls, df, **params):
+        """以歷史資料初始化 (僅建立時需逐根重播一次)"""
+        state = cls(**params)
+        for bar in df[['Open', 'High', 'Low', 'Close', 'Volume']].itertuples(index=False):
+            state.update(bar._asdict())
+        return state
+
+    def update(self, bar, replace_last=False):
+        """加入一根新K棒 (或以 replace_last 覆寫最後一根)，回傳最新一根的所有指標"""
+        if replace_last and self._prev_state is not None:
+            self._load(self._prev_state)
+        else:
+            self._prev_state = self._dump()
+        self.latest = self._apply({k: float(bar[k]) for k in ('Open', 'High', 'Low', 'Close', 'Volume')})
+        return self.latest
+
+    def _apply(self, bar):
+        p = self.params
+        high, low, close, volume = bar['High'], bar['Low'], bar['Close'], bar['Volume']
+        prev = self.prev_bar or {'High': np.nan, 'Low': np.nan, 'Close': np.nan}
+        out = dict(bar)
+
+        # KD
+        self.kd_highs.append(high)
+        self.kd_lows.append(low)
+        high_max = max((v for v in self.kd_highs if v == v), default=np.nan)
+        low_min = min((v for v in self.kd_lows if v == v), default=np.nan)
+        rsv = _div(close - low_min, high_max - low_min) * 100
+        out['K'] = self.k.push(rsv)
+        out['D'] = self.d.push(out['K'])
+
+        # RSI
+        delta = close - prev['Close']
+        self.gain.push(delta if delta > 0 else 0.0)
+        self.loss.push(-delta if delta < 0 else 0.0)
+        out['RSI'] = 100 - _div(100, 1 + _div(self.gain.mean(), self.loss.mean()))
+
+        # MACD
+        out['MACD'] = self.exp1.push(close) - self.exp2.push(close)
+        out['Signal_Line'] = self.signal.push(out['MACD'])
+        out['MACD_Hist'] = out['MACD'] - out['Signal_Line']
+
+        # 乖離率 (BIAS)
+        for window in self.close_ma.values():
+            window.push(close)
+        for period in p["bias_periods"]:
+            ma = self.close_ma[period].mean()
+            out[f'BIAS_{period}'] = _div(close - ma, ma) * 100
+
+        # DMI
+        up, down = high - prev['High'], low - prev['Low']
+        out['+DM'] = up if up != up else max(up, 0.0)
+        out['-DM'] = down if down != down else -min(down, 0.0)
+        ranges = [v for v in (high - low, abs(high - prev['Close']), abs(low - prev['Close'])) if v == v]
+        self.plus_dm.push(out['+DM'])
+        self.minus_dm.push(out['-DM'])
+        self.tr.push(max(ranges) if ranges else np.nan)
+        out['TR'] = self.tr.sum()
+        out['+DI'] = 100 * _div(self.plus_dm.sum(), out['TR'])
+        out['-DI'] = 100 * _div(self.minus_dm.sum(), out['TR'])
+        self.dx.push(_div(abs(out['+DI'] - out['-DI']), out['+DI'] + out['-DI']) * 100)
+        out['ADX'] = self.dx.mean()
+
+        # 量價相關
+        out['Change %'] = (_div(close, prev['Close']) - 1) * 100
+        self.volume.push(volume)
+        vol_change = _div(volume, self.volume.mean()) * 100
+        out['Volume Change %'] = 0.0 if vol_change != vol_change else vol_change
+
+        # 均線
+        for ma_period in p["ma_periods"]:
+            out[f'{ma_period}MA'] = self.close_ma[ma_period].mean()
+
+        self.prev_bar = {'High': high, 'Low': low, 'Close': close}
+        self.bars += 1
+        return out
+
+    def _dump(self):
+        return {
+            "bars": self.bars, "prev_bar": self.prev_bar,
+            "kd_highs": list(self.kd_highs), "kd_lows": list(self.kd_lows),
+            "ewm": {name: getattr(self, name).to_dict() for name in ("k", "d", "exp1", "exp2", "signal")},
+            "rolling": {name: getattr(self, name).to_dict() for name in ("gain", "loss", "plus_dm", "minus_dm", "tr", "dx", "volume")},
+            "close_ma": {str(n): w.to_dict() for n, w in self.close_ma.items()},
+        }
+
+    def _load(self, state):
+        self._init_state()
+        self.bars, self.prev_bar = state["bars"], state["prev_bar"]
+        self.kd_highs.extend(state["kd_highs"])
+        self.kd_lows.extend(state["kd_lows"])
+        for name, values in state["ewm"].items():
+            setattr(self, name, _EwmState(getattr(self, name).alpha, **values))
+        for name, values in state["rolling"].items():
+            setattr(self, name, _RollingState(getattr(self, name).window, **values))
+        for n, values in state["close_ma"].items():
+            self.close_ma[int(n)] = _RollingState(int(n), **values)
+
+    def to_dict(self, date=None):
+        """序列化為可寫入 JSON 的字典 (含覆寫最後一根K棒所需的前一狀態)；date 為最後一根K棒的日期"""
+        data = {"params": self.params, "state": self._dump(), "prev_state": self._prev_state, "latest": self.latest}
+        if date is not None:
+            data["date"] = pd.Timestamp(date).strftime("%Y-%m-%d")
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = cls(**data["params"])
+        obj._load(data["state"])
+        obj._prev_state = data.get("prev_state")
+        obj.latest = data.get("latest", {})
+        return obj
+
+    @classmethod
+    def resume(cls, df, saved=None, **params):
+        """由保存的狀態 (to_dict(date) 的內容) 續算到 df 的最後一根，回傳 (狀態, 重播的K棒數)
+
+        保存時的最後一根可能是盤中數值，因此以 df 中同日的K棒覆寫後只重播其後的K棒；
+        參數不同、保存日期不在 df 中，或前一根收盤價不符 (歷史價格已重新調整) 時整段重播。
+        """
+        state = cls(**params)
+        prev_state = (saved or {}).get("prev_state")
+        date = pd.Timestamp(saved["date"]) if saved and saved.get("date") else None
+        if date is None or saved.get("params") != state.params or prev_state is None or date not in df.index:
+            return cls.from_frame(df, **params), len(df)
+        pos = df.index.get_loc(date)
+        if pos == 0 or not np.isclose(prev_state["prev_bar"]["Close"], df['Close'].iloc[pos - 1], rtol=1e-9, atol=0):
+            return cls.from_frame(df, **params), len(df)
+        state = cls.from_dict(saved)
+        bars = df[['Open', 'High', 'Low', 'Close', 'Volume']].iloc[pos:]
+        for i, bar in enumerate(bars.itertuples(index=False)):
+            state.update(bar._asdict(), replace_last=i == 0)
+        return state, len(bars)
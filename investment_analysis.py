@@ -1,108 +1,176 @@
-import yfinance as yf
+import os
+# 圖表於管線的繪圖執行緒與子行程中產生，需使用非互動式後端；以環境變數設定，matplotlib 延後到實際繪圖時才載入
+os.environ.setdefault("MPLBACKEND", "Agg")
 import pandas as pd
+import numpy as np
 import datetime
+import time
 import pytz
 import warnings
-import os
 import base64
 import shutil
+import zlib
+import subprocess
 from io import BytesIO
-import matplotlib.pyplot as plt
-import mplfinance as mpf
-import json
+from html import escape
 import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from jinja2 import Environment, FileSystemLoader
+from config_loader import get_loader, ConfigError, DEFAULT_CONFIG_FILE
+from data_fetcher import fetch_price_data, report_fetch_latency, YIELD_SYMBOLS
+from price_store import PriceStore, DEFAULT_STORE_DIR
+from indicators import compute_indicator_panel, classify_trend, TREND_STATES, TREND_CLASSES
+from market_panel import MarketPanel
+from yield_curve import YieldCurve, TENORS
+from providers import YahooProvider, make_provider
+from chart_renderer import render_candlestick_png, render_charts, report_render_timing, make_render_pool, RENDERER_VERSION
+from chart_cache import ChartCache, fingerprint, DEFAULT_CACHE_DIR as DEFAULT_CHART_CACHE_DIR
+from report_assets import write_chart_asset, chart_src, relocate_asset_urls, ASSET_DIR_NAME, PAGE_DIR_NAME
+from chart_payload import build_chart_payload, build_yield_payload, encode_payload, YIELD_PAYLOAD_KEY
+from technical_data import write_technical_data
+from screener import compile_rules, run_screener, rank_hits
+from pipeline import Stage, run_pipeline, report_stage_timing
+import metrics
+from metrics import timed, DEFAULT_METRICS_DIR
+from build_manifest import BuildCache, file_digest, params_digest, DEFAULT_BUILD_DIR
+from sharding import (parse_shard, paginate, assign, shard_path, ShardWriter, latest_shard_run, index_records,
+                      load_record, DEFAULT_SHARD_DIR, DEFAULT_PAGE_SIZE)
+from archive import ReportArchive, readings_from_columns, DEFAULT_ARCHIVE_PATH
+from fundamentals import FundamentalCache, fetch_fundamentals, extract_fields, DEFAULT_CACHE_DIR as DEFAULT_FUNDAMENTAL_CACHE_DIR
 
 # --- 全域設定 ---
 warnings.filterwarnings("ignore")
 TZ = pytz.timezone('Asia/Taipei')
 TEMPLATE_DIR = "templates"
 TEMPLATE_FILE = "report_template.html"
+TABLE_ROWS_TEMPLATE = "table_rows.html"
 
 # --- 讀取設定檔 ---
-CONFIG_FILE = "config.json"
-
-try:
-    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-        STOCK_GROUPS = config.get("stock_groups", [])
-        KEY_INDICATORS = config.get("key_indicators", [])
-        SYMBOL_NAME_MAP = config.get("symbol_name_map", {})
-        INVERSE_SYMBOLS = config.get("inverse_symbols", ["^VIX"])
-        PARAMS = config.get("parameters", {})
-        
-        # 提取參數並提供預設值
-        KD_WINDOW = PARAMS.get("kd_window", 9)
-        BIAS_PERIODS = PARAMS.get("bias_periods", [5, 20, 60])
-        DMI_WINDOW = PARAMS.get("dmi_window", 14)
-        RSI_WINDOW = PARAMS.get("rsi_window", 14)
-        MA_PERIODS = PARAMS.get("ma_periods", [5, 20, 60])
-        VOL_MA_WINDOW = PARAMS.get("volume_ma_window", 20)
-        HISTORY_DAYS = PARAMS.get("history_days", 250)
-        PLOT_DAYS = PARAMS.get("plot_days", 120)
-        AI_ANALYSIS_DAYS = PARAMS.get("ai_analysis_days", 60)
-        
-        TREND_PARAMS = PARAMS.get("trend_thresholds", {"bias_signal_period": 20, "bias_threshold": 0})
-        COLOR_THRESHOLDS = PARAMS.get("color_thresholds", {})
-
-except FileNotFoundError:
-    print(f"[Error] 錯誤：找不到設定檔 {CONFIG_FILE}。")
-    sys.exit(1)
-except json.JSONDecodeError:
-    print(f"[Error] 錯誤：設定檔 {CONFIG_FILE} 格式不正確。")
-    sys.exit(1)
-except Exception as e:
-    print(f"[Error] 讀取設定檔時發生未預期的錯誤: {e}")
-    sys.exit(1)
+CONFIG_FILE = DEFAULT_CONFIG_FILE
+
+def apply_config(loader=None):
+    """經由 ConfigLoader 讀取設定檔並設定模組層級參數 (缺少的項目使用預設值)；失敗時改用預設值，錯誤留待執行入口回報"""
+    global CONFIG_ERROR, STOCK_GROUPS, SCREENER, KEY_INDICATORS, SYMBOL_NAME_MAP, INVERSE_SYMBOLS, PARAMS, KD_WINDOW, \
+        BIAS_PERIODS, DMI_WINDOW, RSI_WINDOW, MA_PERIODS, MARKET_FIELDS, VOL_MA_WINDOW, HISTORY_DAYS, PLOT_DAYS, \
+        AI_ANALYSIS_DAYS, YIELD_HISTORY_DAYS, YIELD_PERCENTILE_WINDOW, DOWNLOAD_WORKERS, DOWNLOAD_RETRIES, \
+        DOWNLOAD_TIMEOUT, PRICE_STORE_DIR, RENDER_WORKERS, CHART_CACHE_DIR, CHART_CACHE_MAX_MB, CHART_OUTPUT, \
+        CHART_ASSET_FORMAT, CHART_PAYLOAD_ENCODING, TECHNICAL_DATA_ENCODING, TECHNICAL_DATA_PRECISION, \
+        FUNDAMENTAL_CACHE_DIR, FUNDAMENTAL_TTL_DAYS, FUNDAMENTAL_WORKERS, FUNDAMENTAL_TIMEOUT, METRICS_DIR, \
+        BUILD_CACHE_DIR, SHARD_DIR, REPORT_PAGE_SIZE, ARCHIVE_PATH, WATCH_INTERVAL, WATCH_WORKERS, WATCH_OUTPUT_DIR, \
+        TREND_PARAMS, COLOR_THRESHOLDS, SCREENER_RULES, SCREENER_LOOKBACK, SCREENER_TOP_N
+    try:
+        config, CONFIG_ERROR = (loader or CONFIG).load(), None
+    except ConfigError as e:
+        config, CONFIG_ERROR = {}, e
+    except Exception as e:
+        config, CONFIG_ERROR = {}, ConfigError(f"讀取設定檔時發生未預期的錯誤: {e}")
+    params = config.get("parameters", {})
+    screener = config.get("screener", {})
+    color_thresholds = params.get("color_thresholds", {})
+    STOCK_GROUPS = config.get("stock_groups", [])
+    SCREENER = screener
+    KEY_INDICATORS = config.get("key_indicators", [])
+    SYMBOL_NAME_MAP = config.get("symbol_name_map", {})
+    INVERSE_SYMBOLS = config.get("inverse_symbols", ["^VIX"])
+    PARAMS = params
+    KD_WINDOW = params.get("kd_window", 9)
+    BIAS_PERIODS = params.get("bias_periods", [5, 20, 60])
+    DMI_WINDOW = params.get("dmi_window", 14)
+    RSI_WINDOW = params.get("rsi_window", 14)
+    MA_PERIODS = params.get("ma_periods", [5, 20, 60])
+    # technical_data.json market 區塊的欄位 (Date 另由面板的日期輸出)
+    MARKET_FIELDS = (['Open', 'High', 'Low', 'Close', 'Volume', 'RSI', 'MACD', 'MACD_Hist'] +
+                     [f'{p}MA' for p in MA_PERIODS] + ['K', 'D'])
+    VOL_MA_WINDOW = params.get("volume_ma_window", 20)
+    HISTORY_DAYS = params.get("history_days", 250)
+    PLOT_DAYS = params.get("plot_days", 120)
+    AI_ANALYSIS_DAYS = params.get("ai_analysis_days", 60)
+    YIELD_HISTORY_DAYS = params.get("yield_history_days", 5*365)
+    YIELD_PERCENTILE_WINDOW = params.get("yield_percentile_window", 252)
+    DOWNLOAD_WORKERS = params.get("download_workers", 8)
+    DOWNLOAD_RETRIES = params.get("download_retries", 2)
+    DOWNLOAD_TIMEOUT = params.get("download_timeout", 20)
+    PRICE_STORE_DIR = params.get("price_store_dir", DEFAULT_STORE_DIR)
+    RENDER_WORKERS = params.get("render_workers", 0)
+    CHART_CACHE_DIR = params.get("chart_cache_dir", DEFAULT_CHART_CACHE_DIR)
+    CHART_CACHE_MAX_MB = params.get("chart_cache_max_mb", 200)
+    CHART_OUTPUT = params.get("chart_output", "inline")
+    CHART_ASSET_FORMAT = params.get("chart_asset_format", "png")
+    CHART_PAYLOAD_ENCODING = params.get("chart_payload_encoding", "json")
+    TECHNICAL_DATA_ENCODING = params.get("technical_data_encoding", "json")
+    TECHNICAL_DATA_PRECISION = params.get("technical_data_precision", 4)
+    FUNDAMENTAL_CACHE_DIR = params.get("fundamental_cache_dir", DEFAULT_FUNDAMENTAL_CACHE_DIR)
+    FUNDAMENTAL_TTL_DAYS = params.get("fundamental_ttl_days", {})
+    FUNDAMENTAL_WORKERS = params.get("fundamental_workers", 8)
+    FUNDAMENTAL_TIMEOUT = params.get("fundamental_timeout", 30)
+    METRICS_DIR = params.get("metrics_dir", DEFAULT_METRICS_DIR)
+    BUILD_CACHE_DIR = params.get("build_cache_dir", DEFAULT_BUILD_DIR)
+    SHARD_DIR = params.get("shard_dir", DEFAULT_SHARD_DIR)
+    REPORT_PAGE_SIZE = params.get("report_page_size", DEFAULT_PAGE_SIZE)
+    ARCHIVE_PATH = params.get("archive_path", DEFAULT_ARCHIVE_PATH)
+    WATCH_INTERVAL = params.get("watch_interval", 60)
+    WATCH_WORKERS = params.get("watch_workers", 4)
+    WATCH_OUTPUT_DIR = params.get("watch_output_dir", "live")
+    TREND_PARAMS = params.get("trend_thresholds", {"bias_signal_period": 20, "bias_threshold": 0})
+    COLOR_THRESHOLDS = color_thresholds
+    SCREENER_RULES = compile_rules(screener.get("rules", []), color_thresholds)
+    SCREENER_LOOKBACK = screener.get("lookback_days", 20)
+    SCREENER_TOP_N = screener.get("top_n", 10)
+
+def require_config():
+    """執行入口使用：設定檔讀取失敗時輸出錯誤並結束"""
+    if CONFIG_ERROR is not None:
+        print(f"[Error] 錯誤：{CONFIG_ERROR}")
+        sys.exit(1)
+
+CONFIG = get_loader(CONFIG_FILE)
+apply_config()
 
 # --- 資料獲取 ---
-def get_stock_data(symbols, start_date):
-    """抓取多支股票的資料"""
+def get_stock_data(symbols, start_date, fetcher=None, store=None, offline=False):
+    """並行抓取多支股票的資料
+
+    start_date 可為單一日期或 {symbol: 起始日期}；fetcher 未指定時使用 PROVIDER (命令列選擇的資料來源)。
+    store 為本地價格資料庫 (PriceStore)，僅增量下載；offline 時只讀取本地資料。
+    """
+    raw, latencies = fetch_price_data(symbols, start_date, fetcher=fetcher or PROVIDER.prices, max_workers=DOWNLOAD_WORKERS,
+                                      retries=DOWNLOAD_RETRIES if PROVIDER.remote else 0, timeout=DOWNLOAD_TIMEOUT,
+                                      store=store, offline=offline)
+    report_fetch_latency(latencies)
+    metrics.current().record("download_per_symbol", sum(latencies.values()), items=latencies)
     data = {}
     for symbol in symbols:
-        try:
-            df = yf.download(symbol, start=start_date, progress=False, auto_adjust=True)
-            if df.empty or len(df) < 2:
-                print(f"[Warning] 警告：無法獲取 {symbol} 的有效資料，將跳過。")
-                continue
-            
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.droplevel(1)
-
-            df = df[~df.index.duplicated(keep='first')]
-            data[symbol] = df
-        except Exception as e:
-            print(f"[Error] 抓取 {symbol} 資料時發生錯誤: {e}")
+        df = raw.get(symbol)
+        if df is None: continue
+        if len(df) < 2:
+            print(f"[Warning] 警告：無法獲取 {symbol} 的有效資料，將跳過。")
+            continue
+        data[symbol] = df
     return data
 
+@timed("get_fundamental_data")
 def get_fundamental_data(symbol):
     """抓取個股基本面資料"""
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        data = {
-            "symbol": symbol,
-            "name": SYMBOL_NAME_MAP.get(symbol, symbol),
-            "pe_trailing": info.get('trailingPE'),
-            "pe_forward": info.get('forwardPE'),
-            "pb_ratio": info.get('priceToBook'),
-            "peg_ratio": info.get('pegRatio'),
-            "roe": info.get('returnOnEquity'),
-            "gross_margin": info.get('grossMargins'),
-            "operating_margin": info.get('operatingMargins'),
-            "dividend_yield": info.get('dividendYield'),
-            "payout_ratio": info.get('payoutRatio'),
-            "free_cashflow": info.get('freeCashflow'),
-            "debt_to_equity": info.get('debtToEquity'),
-            "sector": info.get('sector'),
-            "industry": info.get('industry')
-        }
-        return data
+        info = PROVIDER.info(symbol)
+        return {"symbol": symbol, "name": SYMBOL_NAME_MAP.get(symbol, symbol), **extract_fields(info)}
     except Exception as e:
         print(f"[Warning] 無法獲取 {symbol} 的基本面資料: {e}")
         return None
 
+@timed("fundamentals")
+def get_fundamentals_batch(symbols, cache=None, offline=False):
+    """並行取得多檔個股基本面資料 (快取未過期者不連網)，回傳 {symbol: 基本面資料}"""
+    symbols = [s for s in symbols if not s.startswith('^')]
+    if not symbols: return {}
+    print(f"[Info] 正在取得 {len(symbols)} 檔個股基本面資料...")
+    data = fetch_fundamentals(symbols, fetcher=PROVIDER.info, cache=cache, ttl_days=FUNDAMENTAL_TTL_DAYS, max_workers=FUNDAMENTAL_WORKERS,
+                              timeout=FUNDAMENTAL_TIMEOUT, offline=offline)
+    return {s: {"symbol": s, "name": SYMBOL_NAME_MAP.get(s, s), **fields} for s, fields in data.items()}
+
 # --- 技術指標計算 ---
+@timed("calculate_all_indicators")
 def calculate_all_indicators(df):
     """計算所有需要的技術指標"""
     df = df.copy()
@@ -153,19 +221,24 @@ def calculate_all_indicators(df):
     
     return df
 
-def save_to_json(fundamental_data, yield_data, market_data, summary_items, filename="technical_data.json"):
-    """將收集到的資料儲存至 JSON 檔案"""
-    data = {
-        "fundamental": fundamental_data,
-        "yield": yield_data,
-        "market": market_data,
-        "summary": summary_items,
-        "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
+@timed("calculate_indicators")
+def calculate_indicators_batch(stock_data):
+    """以向量化面板一次計算多檔標的的技術指標，回傳 IndicatorPanel"""
+    return compute_indicator_panel(stock_data, KD_WINDOW, RSI_WINDOW, BIAS_PERIODS, DMI_WINDOW,
+                                   MA_PERIODS, VOL_MA_WINDOW)
+
+@timed("save_json")
+def save_to_json(fundamental_data, yield_data, market_data, summary_items, filename="technical_data.json", encoding=None, precision=None, screener=None, yield_curve=None):
+    """將收集到的資料以欄式 (columnar-v1) 格式儲存至 JSON 檔案；encoding="gzip" 時另存為 .gz"""
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"[Success] 資料已成功儲存至 {filename}")
+        written = write_technical_data(filename, fundamental_data, yield_data, market_data, summary_items,
+                                       datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                       encoding=encoding or TECHNICAL_DATA_ENCODING,
+                                       precision=TECHNICAL_DATA_PRECISION if precision is None else precision,
+                                       screener=screener, yield_curve=yield_curve)
+        metrics.current().add_bytes("save_json", written)
+        print(f"[Success] 資料已成功儲存至 {written} ({os.path.getsize(written) / 1024:.0f} KB)")
+        return written
     except Exception as e:
         print(f"[Error] 儲存 JSON 資料時發生錯誤: {e}")
 
@@ -201,124 +274,250 @@ def get_color_class(value, high=0, low=0, inverse=False):
         if value < low: return "text-up"
     return ""
 
-def format_data_row(symbol, latest, prev):
-    """格式化單行 HTML 表格資料"""
-    def get_scalar(data, key):
-        val = data.get(key)
-        if isinstance(val, pd.Series): val = val.iloc[0]
-        return val if pd.notna(val) else None
+def color_classes(values, high, low, inverse=False):
+    """get_color_class 的陣列版本：high/low/inverse 可為純量或與 values 等長的陣列，NaN 不上色"""
+    inverse = np.asarray(inverse, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        above, below = values > high, values < low
+    return np.select([above & ~inverse, above & inverse, below & ~inverse, below & inverse],
+                     ["text-up", "text-down", "text-down", "text-up"], "")
 
-    def fmt_num(val, fmt="{:.1f}", fallback="N/A"):
-        return fmt.format(val) if val is not None else fallback
+def _fmt_column(values, fmt):
+    return [fmt.format(v) if v == v else "N/A" for v in values.tolist()]
 
-    change_pct = get_scalar(latest, "Change %")
-    close = get_scalar(latest, "Close")
-    vol_change = get_scalar(latest, "Volume Change %")
-    k, d = get_scalar(latest, "K"), get_scalar(latest, "D")
-    
-    bias_signal_period = TREND_PARAMS.get("bias_signal_period", 20)
-    bias_signal_val = get_scalar(latest, f"BIAS_{bias_signal_period}")
-    trend_signal, trend_class = determine_trend(k, d, bias_signal_val)
-    
-    is_inverse = symbol in INVERSE_SYMBOLS or any(inv in symbol for inv in ["VIX", "Inverse", "Short"])
-    display_name = SYMBOL_NAME_MAP.get(symbol, symbol)
-    symbol_html = f"<div>{display_name}</div><div style='font-size: 11px; color: #888;'>{symbol}</div>"
+def table_row_records(symbols, latest):
+    """一次算好各標的表格列的文字與顏色
 
-    ct = COLOR_THRESHOLDS
-    def make_td(val, high, low, inv=False, fmt="{:.1f}"):
-        cls = get_color_class(val, high, low, inv)
-        return f'<td class="number-cell {cls}">{fmt_num(val, fmt)}</td>'
-
-    rows = f"""
-    <tr>
-      <td class="symbol-cell">{symbol_html}</td>
-      <td class="number-cell {get_color_class(change_pct, 0, 0, is_inverse)}"><strong>{fmt_num(close, "{:,.2f}")}</strong></td>
-      <td class="number-cell {get_color_class(change_pct, 0, 0, is_inverse)}">{fmt_num(change_pct, "{:+.2f}%")}</td>
-      <td class="trend-cell"><span class="badge {trend_class}">{trend_signal}</span></td>
-      {make_td(vol_change, ct.get("vol_high", 100), ct.get("vol_low", 50))}
-      {make_td(k, ct.get("kd_high", 80), ct.get("kd_low", 20))}
-      {make_td(d, ct.get("kd_high", 80), ct.get("kd_low", 20))}
+    latest 為 {欄位: 陣列}，各陣列為 symbols 依序的最新一根數值；顏色與趨勢皆以陣列運算判斷，
+    回傳的 records 交由 templates/table_rows.html 的巨集輸出。
     """
-    for period in BIAS_PERIODS:
-        val = get_scalar(latest, f"BIAS_{period}")
-        rows += make_td(val, ct.get(f"bias{period}_high", 0), ct.get(f"bias{period}_low", 0))
-        
-    adx, plus_di, minus_di = get_scalar(latest, "ADX"), get_scalar(latest, "+DI"), get_scalar(latest, "-DI")
-    rows += make_td(adx, ct.get("adx_high", 25), 0)
-    rows += make_td(plus_di, minus_di if minus_di is not None else 0, float("-inf"))
-    rows += make_td(minus_di, plus_di if plus_di is not None else 0, float("-inf"))
-    rows += "</tr>"
-    return rows
+    n = len(symbols)
+    def col(field): return np.asarray(latest[field], dtype="float64") if field in latest else np.full(n, np.nan)
+    ct = COLOR_THRESHOLDS
+    close, change, k, d = col("Close"), col("Change %"), col("K"), col("D")
+    plus_di, minus_di = col("+DI"), col("-DI")
+    trend = classify_trend(k, d, col(f"BIAS_{TREND_PARAMS.get('bias_signal_period', 20)}"), TREND_PARAMS.get("bias_threshold", 0))
+    inverse = [s in INVERSE_SYMBOLS or any(inv in s for inv in ["VIX", "Inverse", "Short"]) for s in symbols]
+    cells = [(col("Volume Change %"), ct.get("vol_high", 100), ct.get("vol_low", 50)),
+             (k, ct.get("kd_high", 80), ct.get("kd_low", 20)), (d, ct.get("kd_high", 80), ct.get("kd_low", 20))]
+    cells += [(col(f"BIAS_{p}"), ct.get(f"bias{p}_high", 0), ct.get(f"bias{p}_low", 0)) for p in BIAS_PERIODS]
+    cells += [(col("ADX"), ct.get("adx_high", 25), 0),
+              (plus_di, np.nan_to_num(minus_di, nan=0.0), float("-inf")), (minus_di, np.nan_to_num(plus_di, nan=0.0), float("-inf"))]
+    columns = [list(zip(_fmt_column(v, "{:.1f}"), color_classes(v, high, low).tolist())) for v, high, low in cells]
+    trend_names, trend_classes = ("資料不足",) + TREND_STATES, TREND_CLASSES
+    return [{"symbol": s, "name": SYMBOL_NAME_MAP.get(s, s), "close": close_text, "change": change_text,
+             "change_class": change_class, "trend": trend_names[t], "trend_class": trend_classes[t], "cells": row_cells}
+            for s, close_text, change_text, change_class, t, row_cells in
+            zip(symbols, _fmt_column(close, "{:,.2f}"), _fmt_column(change, "{:+.2f}%"),
+                color_classes(change, 0, 0, inverse).tolist(), trend.tolist(), zip(*columns))]
+
+_table_rows_macro = None
 
+def render_table_rows(records):
+    """以預先編譯的 Jinja 巨集輸出表格列 (樣板只載入、編譯一次)"""
+    global _table_rows_macro
+    if _table_rows_macro is None:
+        _table_rows_macro = report_environment().get_template(TABLE_ROWS_TEMPLATE).module.data_rows
+    return str(_table_rows_macro(records))
+
+def latest_values(panel, symbols):
+    """指標面板中各標的最新一根的數值 {欄位: 陣列} (依 symbols 順序)"""
+    columns = {s: j for j, s in enumerate(panel.symbols)}
+    cols = [columns[s] for s in symbols]
+    return {f: arr[-1, cols] for f, arr in panel.fields.items()}
+
+def format_table_rows(panel, symbols):
+    """由指標面板一次產生多檔標的的表格列 HTML (各欄位直接取面板最後一列)"""
+    return render_table_rows(table_row_records(symbols, latest_values(panel, symbols)))
+
+def format_data_row(symbol, latest):
+    """格式化單行 HTML 表格資料 (latest 為最新一根的 Series)"""
+    def get_scalar(key):
+        val = latest.get(key)
+        if isinstance(val, pd.Series): val = val.iloc[0]
+        return val if val is not None and pd.notna(val) else np.nan
+    return render_table_rows(table_row_records([symbol], {key: [get_scalar(key)] for key in latest.index}))
+
+@timed("create_ma_plot")
 def create_ma_plot_base64(df, symbol, title=None):
     """建立K線圖(含MA與成交量)並返回Base64字串"""
-    mc = mpf.make_marketcolors(up='#e53935', down='#43a047', edge='inherit', wick='inherit', volume='in', inherit=True)
-    s = mpf.make_mpf_style(base_mpf_style='yahoo', marketcolors=mc, gridstyle=':', gridcolor='#e0e0e0', facecolor='white')
-    buf = BytesIO()
     try:
-        mpf.plot(df, type='candle', mav=tuple(MA_PERIODS), volume=True, style=s, figsize=(10, 6), 
-                 savefig=dict(fname=buf, format='png', bbox_inches='tight', pad_inches=0.1, dpi=100),
-                 ylabel='', ylabel_lower='', xrotation=0, datetime_format='%m-%d', tight_layout=True, panel_ratios=(4,1))
-        buf.seek(0)
-        return base64.b64encode(buf.read()).decode('utf-8')
+        return base64.b64encode(render_candlestick_png(df, MA_PERIODS)).decode('utf-8')
     except Exception as e:
         print(f"[Error] 繪製 {symbol} K線圖時發生錯誤: {e}"); return None
 
-def create_yield_curve_plot_base64():
-    """建立美國公債殖利率曲線圖並返回Base64字串及最新數據"""
+def create_ma_plots_parallel(panel, symbols, cache=None, pool=None):
+    """以行程池一次繪製所有標的的K線圖 (取最近 PLOT_DAYS 根)，回傳 {symbol: Base64 字串}
+
+    cache 為 ChartCache，資料未變動的圖表 (例如假日或流動性低的債券 ETF) 直接沿用。
+    pool 為 make_render_pool 建立的共用行程池；未提供時本次呼叫自行建立。
+    """
+    jobs = [(s, panel.frame(s).tail(PLOT_DAYS)) for s in symbols if s in panel.symbols]
+    print(f"[Info] 正在並行繪製 {len(jobs)} 張K線圖...")
+    t0 = time.perf_counter()
+    plots, timings = render_charts(jobs, MA_PERIODS, max_workers=RENDER_WORKERS or None,
+                                   cache=cache, key_params={"plot_days": PLOT_DAYS}, pool=pool)
+    report_render_timing(timings, time.perf_counter() - t0)
+    metrics.current().record("render_per_chart", sum(timings.values()), items=timings)
+    return plots
+
+YIELD_LABELS = TENORS
+# 殖利率圖下方繪製的利差
+YIELD_CHART_SPREAD = "10Y-3M"
+
+@timed("yield_chart")
+def create_yield_curve_plot_base64(yield_frames=None, cache=None, curve=None):
+    """建立美國公債殖利率曲線圖 (上方為各天期殖利率，下方為 10Y-3M 利差與倒掛區間) 並返回Base64字串及最新數據
+
+    yield_frames 為預先抓取的 {symbol: DataFrame}；未提供時自本地價格資料庫增量下載。
+    cache 為 ChartCache，殖利率資料未變動時直接沿用上次的圖檔；curve 為已由 yield_frames 建立的 YieldCurve。
+    """
     print("  - 正在產生美國公債殖利率圖表...")
     yield_data = {}
     try:
-        end_date = datetime.datetime.now()
-        start_date = end_date - datetime.timedelta(days=5*365)
-        t_3m = yf.download("^IRX", start=start_date, end=end_date, progress=False, auto_adjust=True)
-        t_10y = yf.download("^TNX", start=start_date, end=end_date, progress=False, auto_adjust=True)
-        t_30y = yf.download("^TYX", start=start_date, end=end_date, progress=False, auto_adjust=True)
-        if t_3m.empty or t_10y.empty or t_30y.empty: return None, {}
-        yield_data = {'3M': float(t_3m['Close'].iloc[-1]), '10Y': float(t_10y['Close'].iloc[-1]), '30Y': float(t_30y['Close'].iloc[-1])}
-        plt.style.use('bmh'); plt.figure(figsize=(12, 6))
-        plt.plot(t_3m.index, t_3m['Close'], label='3-Month (^IRX)', color='#e53935', linewidth=1.2, alpha=0.8)
-        plt.plot(t_10y.index, t_10y['Close'], label='10-Year (^TNX)', color='#1976d2', linewidth=1.5)
-        plt.plot(t_30y.index, t_30y['Close'], label='30-Year (^TYX)', color='#8e24aa', linewidth=1.5)
-        plt.ylabel('Yield (%)'); plt.legend(loc='upper left', frameon=True, facecolor='white'); plt.grid(True, linestyle='--', alpha=0.7)
-        buf = BytesIO(); plt.savefig(buf, format='png', bbox_inches='tight', dpi=100); plt.close()
+        if yield_frames is None:
+            start_date = datetime.datetime.now() - datetime.timedelta(days=YIELD_HISTORY_DAYS)
+            yield_frames = get_stock_data(YIELD_SYMBOLS, start_date, store=price_store())
+        curve = curve or YieldCurve.from_frames(yield_frames, YIELD_LABELS)
+        yield_data = curve.latest()
+        if len(yield_data) < 2: return None, yield_data
+        if cache is not None:
+            key = fingerprint([yield_frames[s][['Close']] for s in YIELD_LABELS if s in yield_frames],
+                              {"kind": "yield", "renderer": RENDERER_VERSION, "tenors": curve.labels, "spread": YIELD_CHART_SPREAD})
+            png = cache.get(key)
+            if png is not None: return base64.b64encode(png).decode('utf-8'), yield_data
+        import matplotlib.pyplot as plt
+        names, spreads = curve.spreads()
+        plt.style.use('bmh')
+        fig, (top, bottom) = plt.subplots(2, 1, figsize=(12, 8), sharex=True, gridspec_kw={"height_ratios": [3, 1]})
+        colors = ['#e53935', '#ff9800', '#1976d2', '#8e24aa']
+        symbols = {label: s for s, label in YIELD_LABELS.items()}
+        for j, label in enumerate(curve.labels):
+            top.plot(curve.dates, curve.values[:, j], label=f'{label} ({symbols[label]})', color=colors[j % len(colors)], linewidth=1.3)
+        top.set_ylabel('Yield (%)'); top.legend(loc='upper left', frameon=True, facecolor='white'); top.grid(True, linestyle='--', alpha=0.7)
+        if YIELD_CHART_SPREAD in names:
+            spread = spreads[:, names.index(YIELD_CHART_SPREAD)]
+            bottom.plot(curve.dates, spread, color='#455a64', linewidth=1.2, label=YIELD_CHART_SPREAD)
+            bottom.fill_between(curve.dates, spread, 0, where=spread < 0, color='#e53935', alpha=0.3, label='Inverted')
+            bottom.axhline(0, color='#333', linewidth=0.8)
+            bottom.legend(loc='upper left', frameon=True, facecolor='white')
+        bottom.set_ylabel('Spread (%)'); bottom.grid(True, linestyle='--', alpha=0.7)
+        buf = BytesIO(); fig.savefig(buf, format='png', bbox_inches='tight', dpi=100); plt.close(fig)
+        if cache is not None: cache.put(key, buf.getvalue())
         return base64.b64encode(buf.getvalue()).decode('utf-8'), yield_data
     except Exception as e:
         print(f"[Error] 產生殖利率圖表時發生錯誤: {e}"); return None, {}
 
-def generate_html_report(report_data, date_str, summary_html, yield_curve_plot_b64=None, fundamental_data=None, yield_data=None, market_data=None, summary_items=None):
-    """使用 Jinja2 生成 HTML 報告"""
+@timed("externalize_charts")
+def externalize_charts(report_data, yield_curve_plot_b64, assets_dir, fmt="png"):
+    """將 Base64 圖檔改寫為共用資產目錄中的檔案，回傳改用 URL 的 (report_data, 殖利率圖)"""
+    def to_asset(b64):
+        return write_chart_asset(b64, assets_dir, fmt) if b64 else b64
+    new_report_data = [dict(g, plots={name: to_asset(b64) for name, b64 in g["plots"].items()}) for g in report_data]
+    return new_report_data, to_asset(yield_curve_plot_b64)
+
+def report_environment():
+    """報告樣板環境 (含 chart_src 過濾器)"""
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    env.filters["chart_src"] = chart_src
+    return env
+
+def generate_html_report(report_data, date_str, summary_html, yield_curve_plot_b64=None, fundamental_data=None, yield_data=None, market_data=None, summary_items=None, chart_output=None, chart_payload=None, screener=None, yield_curve=None):
+    """使用 Jinja2 生成 HTML 報告
+
+    chart_output 為 "inline" (圖檔以 Base64 內嵌)、"external" (圖檔以內容雜湊命名存於 report/assets/，
+    跨日相同的圖只存一份，HTML 僅保留 URL) 或 "client" (僅輸出 chart_payload 精簡行情資料，
+    由瀏覽器在圖表捲動進入畫面時才繪製)；未指定時使用設定檔的 chart_output。
+    screener 為 rank_hits 彙整後的篩選結果，列於摘要之後並存入 JSON。
+    yield_curve 為 YieldCurve.analysis 的利差統計，列於殖利率圖下方並存入 JSON。
+    """
+    chart_output = chart_output or CHART_OUTPUT
     # 僅保留基本框架資料於 HTML，將詳細數據存入 JSON
-    save_to_json(fundamental_data, yield_data, market_data, summary_items)
+    json_file = save_to_json(fundamental_data, yield_data, market_data, summary_items, screener=screener, yield_curve=yield_curve)
     
-    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    env = report_environment()
     try:
+        filename = f"report/invest_analysis_{date_str.replace('-', '')}.html"
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        if chart_output == "external":
+            assets_dir = os.path.join(os.path.dirname(filename), ASSET_DIR_NAME)
+            report_data, yield_curve_plot_b64 = externalize_charts(report_data, yield_curve_plot_b64, assets_dir, CHART_ASSET_FORMAT)
         template = env.get_template(TEMPLATE_FILE)
         render_vars = {
             "date_str": date_str, "summary_html": summary_html, "report_data": report_data,
+            "screener_html": build_screener_html(screener or []),
             "kd_window": KD_WINDOW, "bias_periods": BIAS_PERIODS,
-            "yield_curve_plot_b64": yield_curve_plot_b64, "yield_data": yield_data
+            "yield_curve_plot_b64": yield_curve_plot_b64, "yield_data": yield_data, "yield_curve": yield_curve,
+            "chart_output": chart_output, "chart_payload_encoding": CHART_PAYLOAD_ENCODING,
+            "chart_payload": encode_payload(chart_payload or {}, CHART_PAYLOAD_ENCODING) if chart_output == "client" else ""
         }
-        html_output = template.render(**render_vars)
-        filename = f"report/invest_analysis_{date_str.replace('-', '')}.html"
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, 'w', encoding='utf-8') as f: f.write(html_output)
-        
-        # 複製一份為 index.html 至根目錄，以便 GitHub Pages 發佈
-        root_index_filename = "index.html"
-        shutil.copy2(filename, root_index_filename)
-        
-        # 同時保留 report/index.html 
-        report_index_filename = os.path.join(os.path.dirname(filename), "index.html")
-        shutil.copy2(filename, report_index_filename)
+        with metrics.stage("template_render"): html_output = template.render(**render_vars)
+        with metrics.stage("write_report"):
+            with open(filename, 'w', encoding='utf-8') as f: f.write(html_output)
+            
+            # 複製一份為 index.html 至根目錄，以便 GitHub Pages 發佈 (資產路徑需改為 report/assets/)
+            # 以暫存檔取代，避免寫穿 update_report.py 為 index.html 建立的硬連結而改到舊報告
+            root_index_filename = "index.html"
+            with open(root_index_filename + ".tmp", 'w', encoding='utf-8') as f: f.write(relocate_asset_urls(html_output, "report/"))
+            os.replace(root_index_filename + ".tmp", root_index_filename)
+            
+            # 同時保留 report/index.html 
+            report_index_filename = os.path.join(os.path.dirname(filename), "index.html")
+            shutil.copy2(filename, report_index_filename)
+            for path in (filename, root_index_filename, report_index_filename): metrics.current().add_bytes("write_report", path)
         
         print(f"[Success] 報告已成功生成：{os.path.abspath(filename)}")
         print(f"[Info] 已同步更新最新報告至根目錄：{os.path.abspath(root_index_filename)}")
+        return [p for p in (filename, root_index_filename, report_index_filename, json_file) if p]
     except Exception as e: print(f"[Error] 生成 HTML 報告時發生錯誤: {e}")
 
-def process_stock_group(group, start_date, utc_now):
-    """處理單個股票群組"""
-    stock_data = get_stock_data(group["symbols"], start_date)
+def report_page_path(date_str, section_id, number):
+    """群組第 number 頁 (2 起) 的分頁檔，位於 report/pages/<日期>/，回傳相對於 report/ 的路徑"""
+    return f"{PAGE_DIR_NAME}/{date_str.replace('-', '')}/{section_id}-{number}.html"
+
+def page_links(date_str, section_id, pages, current):
+    """群組分頁導覽連結；current 為 1 時自完整報告連出，否則自分頁檔連出"""
+    main_href = f"../../invest_analysis_{date_str.replace('-', '')}.html"
+    links = []
+    for number in range(1, pages + 1):
+        if number == 1: href = "#" + section_id if current == 1 else f"{main_href}#{section_id}"
+        elif current == 1: href = report_page_path(date_str, section_id, number)
+        else: href = os.path.basename(report_page_path(date_str, section_id, number))
+        links.append({"number": number, "href": href, "current": number == current})
+    return links
+
+def write_report_page(group_res, date_str, number, chart_output, chart_payload=None):
+    """寫出單一群組的分頁報告 (不含摘要、總經與 AI 區塊)，回傳檔名"""
+    filename = os.path.join("report", report_page_path(date_str, group_res["section_id"], number))
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    if chart_output == "external":
+        [group_res], _ = externalize_charts([group_res], None, os.path.join("report", ASSET_DIR_NAME), CHART_ASSET_FORMAT)
+    html_output = report_environment().get_template(TEMPLATE_FILE).render(
+        date_str=date_str, summary_html="", report_data=[group_res], kd_window=KD_WINDOW, bias_periods=BIAS_PERIODS,
+        yield_curve_plot_b64=None, yield_data=None, chart_output=chart_output, chart_payload_encoding=CHART_PAYLOAD_ENCODING,
+        chart_payload=encode_payload(chart_payload or {}, CHART_PAYLOAD_ENCODING) if chart_output == "client" else "",
+        main_page_href=f"../../invest_analysis_{date_str.replace('-', '')}.html")
+    # 分頁位於 report/pages/<日期>/，資產路徑需往上兩層
+    with open(filename, 'w', encoding='utf-8') as f: f.write(relocate_asset_urls(html_output, "../../"))
+    metrics.current().add_bytes("write_report", filename)
+    return filename
+
+def group_fundamentals(symbols, fundamentals=None):
+    """群組表格中個股的基本面資料 (指數略過)；未提供 fundamentals 時逐檔抓取"""
+    data = (fundamentals.get(s) if fundamentals is not None else get_fundamental_data(s) for s in symbols if not s.startswith('^'))
+    return [f for f in data if f]
+
+def process_stock_group(group, start_date, utc_now, prefetched=None, panel=None, plots=None, fundamentals=None):
+    """處理單個股票群組
+
+    prefetched 為 main 預先批次抓取的 {symbol: DataFrame}；未提供時才個別下載。
+    panel 為 main 一次算好的指標面板；未提供時以本群組資料計算。
+    plots 為 main 並行繪製好的 {symbol: Base64 字串}；未提供時逐檔繪製。
+    """
+    if prefetched is None:
+        stock_data = get_stock_data(group["symbols"], start_date)
+    else:
+        stock_data = {s: prefetched[s] for s in group["symbols"] if s in prefetched}
     if not stock_data: return None
     
     # 獲取最後交易日 (取群組內第一個標的為準)
@@ -334,9 +533,7 @@ def process_stock_group(group, start_date, utc_now):
         # 1. 只要是週六或週日，判定為休市
         # 2. 如果是週間，原則上判定為 Market Open (交易中/開盤前/收盤後)
         # 3. 這樣可以避免因時差或數據延遲導致的「休市」紅字誤判
-        current_tw_time = utc_now.replace(tzinfo=pytz.utc).astimezone(TZ)
-        if current_tw_time.weekday() >= 5: # 5: Saturday, 6: Sunday
-            is_closed = True
+        is_closed = is_market_closed(utc_now)
 
     group_res = {
         "title": group['title'], 
@@ -349,53 +546,417 @@ def process_stock_group(group, start_date, utc_now):
     if "美股" in group['title']: group_res["section_id"] = "us-stocks"
     elif "台股" in group['title']: group_res["section_id"] = "tw-stocks"
     elif "債券" in group['title']: group_res["section_id"] = "bonds"
-    else: group_res["section_id"] = f"group-{abs(hash(group['title']))}"
-    summary_items, market_data, fundamental_data = [], {}, []
-    for symbol, df in stock_data.items():
+    else: group_res["section_id"] = f"group-{zlib.crc32(group['title'].encode('utf-8'))}"  # 各分片行程需得到相同的 id
+    if panel is None or any(s not in panel.symbols for s in stock_data):
+        panel = calculate_indicators_batch(stock_data)
+    table_symbols = []
+    for symbol in stock_data:
         print(f"  - 分析: {symbol}")
-        df_indicators = calculate_all_indicators(df)
-        if df_indicators.empty or len(df_indicators) < 2: continue
-        latest, prev = df_indicators.iloc[-1], df_indicators.iloc[-2]
-        group_res["table_rows"] += format_data_row(symbol, latest, prev)
+        if len(panel.indexes[symbol]) < 2: continue
+        table_symbols.append(symbol)
         display_name = SYMBOL_NAME_MAP.get(symbol, symbol)
-        group_res["plots"][display_name] = create_ma_plot_base64(df_indicators.tail(PLOT_DAYS), symbol, display_name)
-        if symbol in KEY_INDICATORS: summary_items.append({'symbol': display_name, 'close': latest['Close'], 'change': latest['Change %'], 'orig_symbol': symbol})
-        recent_df = df_indicators.tail(AI_ANALYSIS_DAYS).copy().reset_index()
-        recent_df['Date'] = recent_df['Date'].dt.strftime('%Y-%m-%d')
-        cols = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'RSI', 'MACD', 'MACD_Hist'] + [f'{p}MA' for p in MA_PERIODS] + ['K', 'D']
-        market_data[display_name] = recent_df[[c for c in cols if c in recent_df.columns]].to_dict(orient='records')
-        if not symbol.startswith('^'):
-            f_data = get_fundamental_data(symbol)
-            if f_data: fundamental_data.append(f_data)
+        if plots is not None: group_res["plots"][display_name] = plots.get(symbol)
+        else: group_res["plots"][display_name] = create_ma_plot_base64(panel.frame(symbol).tail(PLOT_DAYS), symbol, display_name)
+    fundamental_data = group_fundamentals(table_symbols, fundamentals)
+    latest = latest_values(panel, table_symbols)
+    names = [SYMBOL_NAME_MAP.get(s, s) for s in table_symbols]
+    group_res["table_rows"] = render_table_rows(table_row_records(table_symbols, latest))
+    group_res["readings"] = readings_from_columns(table_symbols, latest)
+    summary_items = [{'symbol': name, 'close': float(close), 'change': float(change), 'orig_symbol': s}
+                     for s, name, close, change in zip(table_symbols, names, latest['Close'], latest['Change %']) if s in KEY_INDICATORS]
+    # 提供 AI 分析的近期行情：各欄位直接自指標面板切出最近 AI_ANALYSIS_DAYS 列，不逐檔建立 DataFrame
+    market_data = MarketPanel.from_panel(panel, table_symbols, names, AI_ANALYSIS_DAYS, MARKET_FIELDS)
     return group_res, summary_items, market_data, fundamental_data
 
-def main():
-    """主執行函式"""
-    utc_now = datetime.datetime.utcnow()
+def parse_args(argv=None):
+    """解析命令列參數"""
+    parser = argparse.ArgumentParser(description="投資分析報告產生器")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--offline", action="store_true", help="不連網，僅使用本地價格資料產生報告")
+    source.add_argument("--record", metavar="DIR", help="連網抓取並將本次用到的日K、基本面與執行時間錄製至 DIR (不使用本地快取)")
+    source.add_argument("--replay", metavar="DIR", help="不連網，以 --record 錄製的資料與當時的執行時間重現報告")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH",
+                        help="以 cProfile 記錄本次執行並輸出 .prof 檔 (未指定路徑時存於 metrics 目錄)")
+    parser.add_argument("--force", action="store_true", help="忽略增量建置紀錄，重新產生所有區塊與報告")
+    parser.add_argument("--chart-output", choices=["inline", "external", "client"], default=None,
+                        help="圖表內嵌於 HTML (inline)、輸出為共用資產檔案 (external) 或由瀏覽器繪製 (client)")
+    shard = parser.add_mutually_exclusive_group()
+    shard.add_argument("--shard", type=shard_arg, metavar="I/N", help="分片執行：只處理第 I 個分片 (共 N 個，I 由 0 起算) 並寫出部分結果")
+    shard.add_argument("--shards", type=int, metavar="N", help="以 N 個行程分片執行後自動合併")
+    shard.add_argument("--merge", action="store_true", help="合併最近一次分片執行的結果為報告")
+    shard.add_argument("--watch", action="store_true", help="盤中監看模式：定期輪詢最新報價，只更新最新一根的指標並寫出即時 JSON/HTML 片段")
+    parser.add_argument("--watch-interval", type=float, default=None, metavar="SECONDS", help="監看模式的輪詢間隔秒數 (預設為設定檔的 watch_interval)")
+    parser.add_argument("--watch-cycles", type=int, default=0, metavar="N", help="監看模式執行 N 輪後結束 (預設 0 為持續執行)")
+    parser.add_argument("--watch-feed", choices=["provider", "standin"], default="provider",
+                        help="監看模式的報價來源：資料來源 (provider，依 --replay 等選項；搭配 --offline 時只讀本地價格資料庫) 或本地替代報價 (standin)")
+    return parser.parse_args(argv)
+
+def shard_arg(text):
+    try: return parse_shard(text)
+    except ValueError as e: raise argparse.ArgumentTypeError(str(e))
+
+# 納入區塊雜湊的程式與樣板：修改後快取的區塊產出即失效
+BUILD_SOURCES = [os.path.abspath(__file__)] + [os.path.join(os.path.dirname(os.path.abspath(__file__)), m) for m in
+                 ("indicators.py", "market_panel.py", "chart_renderer.py", "chart_payload.py", "report_assets.py", "technical_data.py", "screener.py", "archive.py", "yield_curve.py")]
+
+# 行情資料來源 (providers)：預設連網抓取，main 依 --record / --replay 替換
+PROVIDER = YahooProvider()
+
+def price_store():
+    """本地價格資料庫；錄製與回放時不使用，以免結果受本機快取狀態影響"""
+    return PriceStore(PRICE_STORE_DIR) if PROVIDER.use_cache else None
+
+def is_market_closed(utc_now):
+    """台灣時間週六、週日視為休市"""
+    return utc_now.replace(tzinfo=pytz.utc).astimezone(TZ).weekday() >= 5
+
+def closed_since(utc_now):
+    """休市期間中所有市場皆已收盤的起點 (UTC 週六 00:00)；非休市或美股週五盤仍可能進行時回傳 None"""
+    if not is_market_closed(utc_now) or utc_now.weekday() < 5:
+        return None
+    return datetime.datetime.combine(utc_now.date() - datetime.timedelta(days=utc_now.weekday() - 5), datetime.time())
+
+def skip_refetch(store, utc_now, symbols):
+    """休市期間且本地資料皆已於收盤後更新時不需重新下載 (價格與基本面都不會再變動)"""
+    since = closed_since(utc_now)
+    if store is None or since is None or not store.updated_since(symbols, since):
+        return False
+    print("[Info] 休市中且本地資料已於收盤後更新，本次不重新下載，直接使用本地資料")
+    return True
+
+def section_key(kind, frames, **params):
+    """區塊輸入雜湊：價格資料內容 + 設定檔 + 程式碼 + 其他參數"""
+    return fingerprint([frames[s] for s in sorted(frames)],
+                       dict(params, kind=kind, symbols=sorted(frames), config=file_digest([CONFIG_FILE]),
+                            sources=file_digest(BUILD_SOURCES), renderer=RENDERER_VERSION))
+
+def run_report_pipeline(utc_now, start_date, store, chart_cache, chart_output, offline=False, build_cache=None, items=None, sink=None):
+    """以分段管線產生各群組結果：下載 -> 指標計算 -> 繪圖 -> 彙整
+
+    每個群組 (最後是殖利率) 依序流經各階段，各階段於獨立執行緒同時進行，繪圖另使用共用行程池，
+    基本面資料則在背景並行抓取；因此下一群組下載時前一群組已在計算或繪圖。
+    提供 build_cache (BuildCache) 時，下載後依輸入雜湊檢查各區塊，輸入未變動者直接沿用上次產出。
+    items 預設為設定檔的所有群組加上殖利率 ({"group": None})；分片執行時為分到的分頁。
+    提供 sink(batch, section) 時每個區塊完成後即交給 sink 寫出、不保留於結果中。
+    各標的的價格資料與圖檔在最後一個用到的區塊完成後即釋放，記憶體用量不隨標的總數增加。
+    回傳 (依設定檔順序的群組結果, 殖利率區塊 {"plot", "data", "analysis"}, 圖表資料 (client 模式), 各區塊輸入雜湊, 篩選命中清單)。
+    """
+    prefetched, plots, yield_out, screener_hits = {}, {}, {}, []
+    chart_payload = {} if chart_output == "client" and sink is None else None
+    yield_start = utc_now - datetime.timedelta(days=YIELD_HISTORY_DAYS)
+    if items is None:
+        items = [{"group": group, "symbols": group["symbols"]} for group in STOCK_GROUPS] + [{"group": None, "symbols": YIELD_SYMBOLS}]
+    stock_symbols = list(dict.fromkeys(s for item in items if item["group"] for s in item["symbols"]))
+    pending = {}
+    for item in items:
+        for s in dict.fromkeys(item["symbols"]): pending[s] = pending.get(s, 0) + 1
+    background = ThreadPoolExecutor(max_workers=1)
+    fundamental_cache = FundamentalCache(FUNDAMENTAL_CACHE_DIR) if PROVIDER.use_cache else None
+    fundamentals = background.submit(get_fundamentals_batch, stock_symbols, fundamental_cache, offline)
+    render_pool = None
+
+    def fetch(batch):
+        new = [s for s in dict.fromkeys(batch["symbols"]) if s not in prefetched]
+        if new:
+            print(f"[Info] 正在並行下載 {len(new)} 檔標的資料...")
+            prefetched.update(get_stock_data(new, start_date if batch["group"] else yield_start, store=store, offline=offline))
+        return batch
+
+    def indicators(batch):
+        group = batch["group"]
+        frames = {s: prefetched[s] for s in batch["symbols"] if s in prefetched}
+        if group:
+            # 基本面不列入雜湊，以免等待背景抓取拖住指標計算；沿用的區塊於 serialize 階段更新基本面
+            batch["key"] = section_key("group", frames, group=group, chart_output=chart_output, plot_days=PLOT_DAYS,
+                                       closed=is_market_closed(utc_now))
+        else:
+            batch["key"] = section_key("yield", frames, chart_output=chart_output)
+        cached = build_cache.get_section(batch["key"]) if build_cache is not None else None
+        if cached and cached.get("result"): cached["result"][2] = MarketPanel.from_dict(cached["result"][2])
+        if cached is not None:
+            print(f"[Info] {group['title'] if group else '殖利率'}：輸入資料未變動，沿用上次產出")
+            batch["cached"] = cached
+        elif group:
+            batch["panel"] = calculate_indicators_batch(frames)
+        return batch
+
+    def render(batch):
+        nonlocal render_pool
+        if "cached" in batch:
+            return batch
+        if not batch["group"]:
+            yield_frames = {s: prefetched[s] for s in YIELD_SYMBOLS if s in prefetched}
+            curve = YieldCurve.from_frames(yield_frames, YIELD_LABELS)
+            with metrics.stage("yield_curve"):
+                analysis = curve.analysis(YIELD_PERCENTILE_WINDOW)
+            if chart_output == "client":
+                batch["section"] = {"plot": None, "data": curve.latest(), "analysis": analysis,
+                                    "payload": {YIELD_PAYLOAD_KEY: build_yield_payload(yield_frames, YIELD_LABELS)}}
+            else:
+                plot, data = create_yield_curve_plot_base64(yield_frames, chart_cache, curve)
+                batch["section"] = {"plot": plot, "data": data, "analysis": analysis, "payload": None}
+            return batch
+        panel = batch["panel"]
+        todo = [s for s in dict.fromkeys(batch["symbols"]) if s in panel.symbols and s not in plots]
+        if chart_output == "client":
+            # 不在伺服器端繪圖，改輸出精簡行情資料由瀏覽器繪製
+            batch["payload"] = build_chart_payload({SYMBOL_NAME_MAP.get(s, s): panel.frame(s).tail(PLOT_DAYS) for s in todo}, MA_PERIODS)
+            plots.update({s: None for s in todo})
+        elif todo:
+            # 行程池在第一次需要繪圖時才建立，全部沿用上次產出時不需啟動子行程
+            render_pool = render_pool or make_render_pool(RENDER_WORKERS or None)
+            plots.update(create_ma_plots_parallel(panel, todo, chart_cache, render_pool))
+        return batch
+
+    def serialize(batch):
+        section = batch.get("cached") or batch.get("section")
+        if section is None:
+            print(f"\n--- 正在處理群組: {batch['group']['title']} ---")
+            section = {"result": process_stock_group(batch["group"], start_date, utc_now, prefetched, batch["panel"],
+                                                     plots, fundamentals.result()),
+                       "payload": batch.get("payload")}
+            with metrics.stage("screener"):
+                section["screener"] = run_screener(batch["panel"], SCREENER_RULES, SCREENER_LOOKBACK, SYMBOL_NAME_MAP)
+        elif batch["group"] and section.get("result"):
+            section["result"][3] = group_fundamentals(section["result"][0]["readings"], fundamentals.result())
+        if build_cache is not None and "cached" not in batch:
+            result = section.get("result")
+            build_cache.put_section(batch["key"], dict(section, result=result and [*result[:2], result[2].to_dict(), result[3]]))
+        for s in dict.fromkeys(batch["symbols"]):
+            pending[s] -= 1
+            if not pending[s]: prefetched.pop(s, None); plots.pop(s, None)
+        if sink is not None:
+            sink(batch, section)
+            return None, batch["key"]
+        if chart_payload is not None and section.get("payload"):
+            chart_payload.update(section["payload"])
+        screener_hits.extend(section.get("screener") or [])
+        if not batch["group"]:
+            yield_out.update(plot=section["plot"], data=section["data"], analysis=section.get("analysis"))
+        return section.get("result"), batch["key"]
+
+    stages = [Stage("fetch", fetch), Stage("indicators", indicators), Stage("render", render), Stage("serialize", serialize)]
+    t0 = time.perf_counter()
+    try:
+        results, timings = run_pipeline(items, stages)
+    finally:
+        if render_pool is not None: render_pool.shutdown()
+        background.shutdown()
+    report_stage_timing(timings, time.perf_counter() - t0)
+    group_results = [tuple(r) for (r, _), item in zip(results, items) if r and item["group"]]
+    return group_results, yield_out, chart_payload, [k for _, k in results], screener_hits
+
+def main(argv=None):
+    """主執行函式：每次執行將各階段耗時、CPU 時間、記憶體增加量與寫出位元組數存於 metrics 目錄"""
+    global PROVIDER
+    args = parse_args(argv)
+    require_config()
+    try:
+        PROVIDER = make_provider(args.record, args.replay)
+    except FileNotFoundError as e:
+        print(f"[Error] 錯誤：{e}"); return 1
+    run = metrics.start_run("investment_analysis" + (f"_shard{args.shard[0]}of{args.shard[1]}" if args.shard else ""))
+    profile_path = args.profile
+    if profile_path == "":
+        profile_path = os.path.join(METRICS_DIR, f"investment_analysis_{datetime.datetime.fromtimestamp(run.started):%Y%m%d_%H%M%S}.prof")
+    status = None
+    with metrics.profiled(profile_path):
+        if args.shard: run_shard(args)
+        elif args.shards: run_shards(args)
+        elif args.merge: merge_shards()
+        elif args.watch:
+            from watch import run_watch  # 監看模式才載入
+            status = run_watch(args, PROVIDER)
+        else: run_report(args)
+    run.report()
+    print(f"[Info] 執行統計已儲存至 {run.write(METRICS_DIR)}")
+    return status
+
+def run_report(args):
+    """產生報告的完整流程"""
+    store = price_store()
+    chart_cache = ChartCache(CHART_CACHE_DIR, CHART_CACHE_MAX_MB * 1024 * 1024)
+    utc_now = PROVIDER.now()
     start_date = utc_now - datetime.timedelta(days=HISTORY_DAYS)
     current_date_str = utc_now.astimezone(TZ).strftime('%Y-%m-%d')
-    all_report_data, all_summary_items, all_fundamental_data, all_market_data = [], [], [], {}
+    all_report_data, all_summary_items, all_fundamental_data, all_market_data = [], [], [], []
     print(f"[Info] 開始執行分析工作... ({current_date_str})")
-    for group in STOCK_GROUPS:
-        print(f"\n--- 正在處理群組: {group['title']} ---")
-        res = process_stock_group(group, start_date, utc_now)
-        if res:
-            g_res, s_items, m_data, f_data = res
-            all_report_data.append(g_res); all_summary_items.extend(s_items)
-            all_market_data.update(m_data); all_fundamental_data.extend(f_data)
+
+    chart_output = args.chart_output or CHART_OUTPUT
+    build_cache = BuildCache(BUILD_CACHE_DIR)
+    offline = args.offline or skip_refetch(store, utc_now, [s for g in STOCK_GROUPS for s in g["symbols"]] + YIELD_SYMBOLS)
+    group_results, yield_out, chart_payload, section_keys, screener_hits = run_report_pipeline(
+        utc_now, start_date, store, chart_cache, chart_output, offline=offline,
+        build_cache=None if args.force else build_cache)
+
+    # 各區塊、基本面與樣板、巨集數據、設定皆未變動且上次的輸出檔仍在時，不重新產生報告
+    report_key = params_digest({"date": current_date_str, "sections": section_keys, "chart_output": chart_output,
+                                "fundamentals": [r[3] for r in group_results],
+                                "inputs": file_digest([CONFIG_FILE, TEMPLATE_DIR, "macro_cache.json"] + BUILD_SOURCES)})
+    if not args.force and build_cache.is_up_to_date(report_key):
+        print("[Success] 輸入資料皆未變動，沿用現有報告 (如需重新產生請加上 --force)")
+        return
+    for g_res, s_items, m_data, f_data in group_results:
+        all_report_data.append(g_res); all_summary_items.extend(s_items)
+        all_market_data.append(m_data); all_fundamental_data.extend(f_data)
+    summary_html = build_summary_html(all_summary_items)
+    chart_cache.evict()
+    chart_cache.report()
+    yield_data = yield_out.get("data", {})
+    if all_report_data: 
+        outputs = generate_html_report(all_report_data, current_date_str, summary_html, yield_out.get("plot"), 
+                                       all_fundamental_data, yield_data, all_market_data, all_summary_items,
+                                       chart_output=chart_output, chart_payload=chart_payload,
+                                       screener=rank_hits(screener_hits, SCREENER_RULES, SCREENER_TOP_N),
+                                       yield_curve=yield_out.get("analysis"))
+        if outputs:
+            build_cache.save_manifest(report_key, section_keys, outputs)
+            archive_report(current_date_str, outputs[0], [g.get("readings", {}) for g in all_report_data], all_summary_items, yield_data)
+    else: print("[Error] 沒有任何資料可生成報告。")
+
+def archive_report(date_str, report_file, readings, summary_items, yield_data):
+    """將本日報告的摘要、各標的最新讀數與殖利率記錄至歸檔索引；readings 為各群組 (或分頁) 的 {標的: {欄位: 數值}}"""
+    merged = {}
+    for part in readings: merged.update(part)
+    try:
+        with metrics.stage("archive"), ReportArchive(ARCHIVE_PATH) as archive:
+            count = archive.record_report(date_str, report_file, merged, summary_items, yield_data)
+        print(f"[Info] 已記錄 {len(merged)} 檔標的、{count} 筆讀數至歸檔索引 {ARCHIVE_PATH}")
+    except Exception as e:
+        print(f"[Warning] 記錄歸檔索引失敗: {e}")
+
+def build_summary_html(summary_items, keys=None):
+    """依 keys (預設為 KEY_INDICATORS) 順序產生摘要卡片"""
     summary_html = ""
-    for key in KEY_INDICATORS:
-        item = next((i for i in all_summary_items if i['orig_symbol'] == key), None)
+    for key in KEY_INDICATORS if keys is None else keys:
+        item = next((i for i in summary_items if i['orig_symbol'] == key), None)
         if item:
             is_inv = item['orig_symbol'] in INVERSE_SYMBOLS or any(x in item['orig_symbol'] for x in ["VIX", "Inverse", "Short"])
             cls = get_color_class(item['change'], 0, 0, inverse=is_inv)
             icon = "▲" if item['change'] > 0 else "▼" if item['change'] < 0 else "-"
             summary_html += f'<div class="summary-card"><div class="summary-title">{item["symbol"]}</div><div class="summary-price">{item["close"]:.2f}</div><div class="summary-change {cls}">{icon} {item["change"]:.2f}%</div></div>'
-    yield_plot, yield_data = create_yield_curve_plot_base64()
-    if all_report_data: 
-        generate_html_report(all_report_data, current_date_str, summary_html, yield_plot, 
-                             all_fundamental_data, yield_data, all_market_data, all_summary_items)
-    else: print("[Error] 沒有任何資料可生成報告。")
+    return summary_html
+
+def _screener_row(hit):
+    value = "N/A" if hit["value"] is None else f"{hit['value']:.2f}"
+    return (f"<tr><td class=\"symbol-cell\"><div>{escape(hit['name'])}</div><div style='font-size: 11px; color: #888;'>{escape(hit['symbol'])}</div></td>"
+            f"<td>{hit['date']}</td><td class=\"number-cell\">{hit['bars_ago']}</td><td class=\"number-cell\">{hit['hits']}</td>"
+            f"<td class=\"number-cell\">{value}</td></tr>")
+
+def build_screener_html(ranked):
+    """技術篩選結果：每條有命中的規則一張表格 (最近命中者優先)"""
+    html = ""
+    for rule in ranked:
+        if not rule["hits"]: continue
+        rows = "".join(_screener_row(h) for h in rule["hits"])
+        html += (f'<div class="card table-card"><h3 class="subsection-title">{escape(rule["label"])} (共 {rule["total"]} 檔)</h3>'
+                 f'<div class="table-responsive"><table><thead><tr><th>名稱</th><th>最近命中</th><th>距今K棒</th>'
+                 f'<th>{SCREENER_LOOKBACK}日內次數</th><th>排序值</th></tr></thead><tbody>{rows}</tbody></table></div></div>')
+    return html
+
+def run_shard(args):
+    """分片執行：只處理分到的分頁 (分片 0 另負責殖利率)，逐頁寫出至 cache/shards/<日期>/"""
+    index, count = args.shard
+    store = price_store()
+    chart_cache = ChartCache(CHART_CACHE_DIR, CHART_CACHE_MAX_MB * 1024 * 1024)
+    utc_now = PROVIDER.now()
+    start_date = utc_now - datetime.timedelta(days=HISTORY_DAYS)
+    current_date_str = utc_now.astimezone(TZ).strftime('%Y-%m-%d')
+    chart_output = args.chart_output or CHART_OUTPUT
+    units = assign(paginate(STOCK_GROUPS, REPORT_PAGE_SIZE), index, count)
+    items = [{"group": dict(STOCK_GROUPS[u["group"]], symbols=u["symbols"]), "symbols": u["symbols"], "unit": u} for u in units]
+    if index == 0: items.append({"group": None, "symbols": YIELD_SYMBOLS})
+    print(f"[Info] 分片 {index}/{count}：處理 {len(units)} 個分頁、{sum(len(u['symbols']) for u in units)} 檔標的 ({current_date_str})")
+
+    writer = ShardWriter(shard_path(SHARD_DIR, current_date_str, index, count))
+    def sink(batch, section):
+        if not batch["group"]:
+            writer.write({"kind": "yield", "chart_output": chart_output, "data": section["data"], "analysis": section.get("analysis"),
+                          "plot": section["plot"], "payload": section["payload"]})
+            return
+        if not section["result"]: return
+        group_res, summary_items, market_data, fundamental_data = section["result"]
+        group_res = dict(group_res)
+        writer.write({"kind": "group", "chart_output": chart_output, **{k: batch["unit"][k] for k in ("group", "page", "pages")},
+                      "summary": summary_items, "fundamental": fundamental_data, "screener": section.get("screener") or [],
+                      "readings": group_res.pop("readings", {}), "result": group_res, "market": market_data.to_dict(), "payload": section.get("payload")})
+    try:
+        offline = args.offline or skip_refetch(store, utc_now, [s for item in items for s in item["symbols"]])
+        run_report_pipeline(utc_now, start_date, store, chart_cache, chart_output, offline=offline,
+                            build_cache=None if args.force else BuildCache(BUILD_CACHE_DIR), items=items, sink=sink)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    chart_cache.evict()
+    print(f"[Success] 分片 {index}/{count} 完成，共 {writer.count} 筆結果：{writer.path}")
+
+def run_shards(args):
+    """以 N 個子行程同時執行各分片，全部成功後合併"""
+    count = args.shards
+    run_dir = os.path.dirname(shard_path(SHARD_DIR, PROVIDER.now().astimezone(TZ).strftime('%Y-%m-%d'), 0, count))
+    if os.path.isdir(run_dir): shutil.rmtree(run_dir)  # 清除同日其他分片數留下的結果
+    cmd = [sys.executable, os.path.abspath(__file__)] + (["--offline"] if args.offline else []) + \
+          (["--record", args.record] if args.record else []) + (["--replay", args.replay] if args.replay else []) + \
+          (["--force"] if args.force else []) + (["--chart-output", args.chart_output] if args.chart_output else [])
+    print(f"[Info] 啟動 {count} 個分片行程...")
+    procs = [subprocess.Popen(cmd + ["--shard", f"{i}/{count}"]) for i in range(count)]
+    failed = [i for i, p in enumerate(procs) if p.wait() != 0]
+    if failed:
+        print(f"[Error] 分片 {', '.join(map(str, failed))} 執行失敗，未合併報告。")
+        return
+    merge_shards()
+
+def merge_shards():
+    """合併最近一次分片執行的結果：摘要卡片、technical_data.json、完整報告 (各群組第一頁) 與其餘分頁"""
+    found = latest_shard_run(SHARD_DIR)
+    if found is None:
+        print(f"[Error] {SHARD_DIR} 中沒有分片執行結果。"); return
+    run_dir, count, missing = found
+    if missing:
+        print(f"[Error] 分片 {', '.join(map(str, missing))}/{count} 尚未完成，無法合併。"); return
+    date_key = os.path.basename(run_dir)
+    date_str = f"{date_key[:4]}-{date_key[4:6]}-{date_key[6:]}"
+    entries = index_records(run_dir, count)
+    pages = sorted((e for e in entries if e[2]["kind"] == "group"), key=lambda e: (e[2]["group"], e[2]["page"]))
+    yield_entry = next((e for e in entries if e[2]["kind"] == "yield"), None)
+    if not pages:
+        print("[Error] 沒有任何資料可生成報告。"); return
+    chart_output = pages[0][2]["chart_output"]
+    print(f"[Info] 合併 {count} 個分片、{len(pages)} 個分頁 ({date_str})...")
+
+    summary_items = [i for _, _, meta in pages for i in meta["summary"]]
+    fundamental_data = list({f["symbol"]: f for _, _, meta in pages for f in meta["fundamental"]}.values())
+    screener = rank_hits([h for _, _, meta in pages for h in meta.get("screener", [])], SCREENER_RULES, SCREENER_TOP_N)
+    yield_record = load_record(*yield_entry[:2]) if yield_entry else {}
+    chart_payload = dict(yield_record.get("payload") or {}) if chart_output == "client" else None
+    report_data, later_pages = [], []
+    for path, offset, meta in pages:
+        if meta["page"]:
+            later_pages.append((path, offset, meta))
+            continue
+        record = load_record(path, offset)
+        group_res = record["result"]
+        if meta["pages"] > 1: group_res["pages"] = page_links(date_str, group_res["section_id"], meta["pages"], 1)
+        report_data.append(group_res)
+        if chart_payload is not None: chart_payload.update(record["payload"] or {})
+
+    def market_entries():
+        # 逐頁讀回行情面板，寫出 technical_data.json 時不需一次載入全部標的 (重複的標的只寫出第一筆)
+        for path, offset, _ in pages:
+            yield MarketPanel.from_dict(load_record(path, offset)["market"])
+
+    outputs = generate_html_report(report_data, date_str, build_summary_html(summary_items), yield_record.get("plot"),
+                                   fundamental_data, yield_record.get("data") or {}, market_entries(), summary_items,
+                                   chart_output=chart_output, chart_payload=chart_payload, screener=screener,
+                                   yield_curve=yield_record.get("analysis"))
+    for path, offset, meta in later_pages:
+        record = load_record(path, offset)
+        group_res = dict(record["result"], pages=page_links(date_str, record["result"]["section_id"], meta["pages"], meta["page"] + 1))
+        write_report_page(group_res, date_str, meta["page"] + 1, chart_output, record["payload"])
+    if outputs:
+        print(f"[Success] 已合併 {len(pages)} 個分頁 (其中 {len(later_pages)} 個為獨立分頁檔)")
+        archive_report(date_str, outputs[0], [meta.get("readings", {}) for _, _, meta in pages], summary_items, yield_record.get("data") or {})
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
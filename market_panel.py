@@ -0,0 +1,90 @@
+import json
+import base64
+
+import numpy as np
+
+# 成交量常超過 float32 可精確表示的整數範圍 (2^24)，保留 float64；其餘欄位以 float32 保存
+FLOAT64_FIELDS = ("Volume",)
+# json_entries 每次轉為文字的標的數
+JSON_BLOCK = 32
+
+
+def _number_text(values, precision):
+    """數值陣列轉為 JSON 數字文字陣列，規則同 technical_data._fixed：固定小數位數、整數值輸出為整數、NaN 為 null
+
+    float32 欄位以 float32 的最短表示輸出 (例如 6632.19 而非 6632.1899)。
+    """
+    with np.errstate(invalid="ignore"):
+        r = np.round(values, precision)
+        whole = (r == np.trunc(r)) & (np.abs(r) >= 1)
+    text = r.astype(str)
+    if whole.any():
+        text[whole] = r[whole].astype(np.int64).astype(str)
+    text[~np.isfinite(r)] = "null"
+    return text
+
+
+class MarketPanel:
+    """精簡的欄式行情面板：多檔標的最近數根K棒的指定欄位
+
+    fields 為 {欄位: (K棒數 x 標的數) 陣列}，dates 為同形狀的 datetime64[D] 陣列；與 IndicatorPanel 相同靠右對齊，
+    最後一列為各標的最新一根，前方不足的部分為 NaN / NaT。names 為輸出用的標的名稱。
+    """
+
+    def __init__(self, names, dates, fields, lengths):
+        self.names = list(names)
+        self.dates = dates
+        self.fields = fields
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.rows = dates.shape[0]
+
+    @classmethod
+    def from_panel(cls, panel, symbols, names, rows, fields):
+        """由 IndicatorPanel 取出 symbols 最近 rows 根K棒的指定欄位 (不存在的欄位略過)"""
+        rows = min(rows, panel.rows)
+        columns = {s: j for j, s in enumerate(panel.symbols)}
+        cols = [columns[s] for s in symbols]
+        lengths = [min(len(panel.indexes[s]), rows) for s in symbols]
+        dates = np.full((rows, len(symbols)), np.datetime64("NaT"), dtype="datetime64[D]")
+        for j, (s, n) in enumerate(zip(symbols, lengths)):
+            if n:
+                dates[rows - n:, j] = panel.indexes[s].values[-n:]
+        data = {f: panel.fields[f][panel.rows - rows:, cols].astype(np.float64 if f in FLOAT64_FIELDS else np.float32)
+                for f in fields if f in panel.fields}
+        return cls(names, dates, data, lengths)
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(a.nbytes for a in self.fields.values())
+
+    def json_entries(self, precision=4, block=JSON_BLOCK):
+        """逐檔產生 (名稱, 欄式 JSON 文字)，格式同 technical_data 的 market 區塊
+
+        每 block 檔標的一起轉為文字陣列，不逐值建立 Python 數值物件，文字陣列的記憶體也不隨標的數成長。
+        """
+        keys = {f: json.dumps(f, ensure_ascii=False) for f in self.fields}
+        lengths = self.lengths.tolist()
+        for lo in range(0, len(self.names), block):
+            hi = min(lo + block, len(self.names))
+            dates = np.datetime_as_string(self.dates[:, lo:hi], unit="D")
+            texts = {f: _number_text(a[:, lo:hi], precision) for f, a in self.fields.items()}
+            for j in range(hi - lo):
+                start = self.rows - lengths[lo + j]
+                parts = ['"Date":["' + '","'.join(dates[start:, j].tolist()) + '"]']
+                parts += [f'{keys[f]}:[{",".join(t[start:, j].tolist())}]' for f, t in texts.items()]
+                yield self.names[lo + j], "{" + ",".join(parts) + "}"
+
+    def to_dict(self):
+        """可存入 JSON 的形式 (陣列以原始位元組的 Base64 保存)，供建置快取與分片紀錄使用"""
+        def pack(a):
+            return {"dtype": a.dtype.str, "data": base64.b64encode(np.ascontiguousarray(a).tobytes()).decode("ascii")}
+        return {"names": self.names, "lengths": self.lengths.tolist(), "rows": self.rows,
+                "dates": pack(self.dates.view(np.int64)), "fields": {f: pack(a) for f, a in self.fields.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        shape = (d["rows"], len(d["names"]))
+        def unpack(p):
+            return np.frombuffer(base64.b64decode(p["data"]), dtype=p["dtype"]).reshape(shape)
+        dates = unpack(d["dates"]).view("datetime64[D]")
+        return cls(d["names"], dates, {f: unpack(p) for f, p in d["fields"].items()}, d["lengths"])
@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import datetime
+import functools
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows 無 resource 模組，記憶體峰值記為 None
+    resource = None
+
+DEFAULT_METRICS_DIR = "metrics"
+
+
+def _maxrss_mb(who):
+    # Linux 以 KB 為單位，macOS 以 bytes 為單位
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss / unit
+
+
+def process_peak_rss_mb():
+    """本行程與已結束子行程 (繪圖行程池) 整段執行期間的記憶體峰值 (MB)"""
+    if resource is None:
+        return None
+    return {"self": round(_maxrss_mb(resource.RUSAGE_SELF), 1), "children": round(_maxrss_mb(resource.RUSAGE_CHILDREN), 1)}
+
+
+def current_rss_mb():
+    """本行程目前的常駐記憶體 (MB)；僅 Linux 可取得，其他平台回傳 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _memory_mark():
+    """階段開始時的 (目前 RSS, 行程峰值)"""
+    if resource is None:
+        return None
+    rss = current_rss_mb()
+    return None if rss is None else (rss, _maxrss_mb(resource.RUSAGE_SELF))
+
+
+def _rss_growth_mb(mark):
+    """階段期間記憶體較開始時增加的最大量 (MB)
+
+    行程峰值在階段期間創新高時以新峰值計算，否則以結束時的 RSS 計算 (此時為下限)；
+    其他執行緒同時進行的階段也會計入。
+    """
+    if mark is None:
+        return None
+    rss0, peak0 = mark
+    peak = _maxrss_mb(resource.RUSAGE_SELF)
+    high = peak if peak > peak0 else (current_rss_mb() or rss0)
+    return max(0.0, high - rss0)
+
+
+class RunMetrics:
+    """單次執行的各階段統計：實際耗時、CPU 時間、記憶體增加量與寫出位元組數
+
+    同名階段可多次進入 (例如每個群組各一次)，數值累加；可於多執行緒中使用。
+    CPU 時間為整個行程 (含其他執行緒) 在該階段期間的用量，子行程另以 record 記錄。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name):
+        return self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "bytes_written": 0})
+
+    @contextmanager
+    def stage(self, name):
+        """量測一個階段 (with metrics.stage("繪圖"): ...)"""
+        t0, cpu0, mark = time.perf_counter(), time.process_time(), _memory_mark()
+        try:
+            yield self
+        finally:
+            wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+            growth = _rss_growth_mb(mark)
+            with self._lock:
+                entry = self._entry(name)
+                entry["calls"] += 1
+                entry["wall_s"] += wall
+                entry["cpu_s"] += cpu
+                if growth is not None:
+                    entry["rss_growth_mb"] = max(entry.get("rss_growth_mb", 0.0), growth)
+
+    def record(self, name, wall, cpu=None, items=None):
+        """記錄在其他地方量測好的耗時；items 為逐項明細 (例如 {symbol: 秒數})"""
+        with self._lock:
+            entry = self._entry(name)
+            entry["calls"] += 1
+            entry["wall_s"] += wall
+            if cpu is not None:
+                entry["cpu_s"] += cpu
+            if items:
+                entry.setdefault("items", {}).update({k: round(v, 4) for k, v in items.items()})
+
+    def add_bytes(self, name, path_or_size):
+        """累計某階段寫出的位元組數 (可傳入檔案路徑或位元組數)"""
+        size = os.path.getsize(path_or_size) if isinstance(path_or_size, str) else int(path_or_size)
+        with self._lock:
+            self._entry(name)["bytes_written"] += size
+
+    def to_dict(self):
+        with self._lock:
+            stages = {name: {k: (round(v, 4) if isinstance(v, float) else v) for k, v in entry.items()}
+                      for name, entry in self.stages.items()}
+        return {
+            "run": self.name,
+            "started": datetime.datetime.fromtimestamp(self.started).strftime("%Y-%m-%d %H:%M:%S"),
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "cpu_s": round(time.process_time() - self._cpu0, 4),
+            "process_peak_rss_mb": process_peak_rss_mb(),
+            "stages": stages,
+        }
+
+    def write(self, metrics_dir=DEFAULT_METRICS_DIR):
+        """寫出本次執行的統計檔 (metrics/<名稱>_<時間>.json)，回傳路徑"""
+        os.makedirs(metrics_dir, exist_ok=True)
+        stamp = datetime.datetime.fromtimestamp(self.started).strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(metrics_dir, f"{self.name}_{stamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def report(self, top=None):
+        """列出各階段耗時 (依實際耗時排序)"""
+        data = self.to_dict()
+        print(f"[Info] 本次執行共 {data['wall_s']:.2f} 秒 (CPU {data['cpu_s']:.2f} 秒)，各階段：")
+        ranked = sorted(data["stages"].items(), key=lambda x: x[1]["wall_s"], reverse=True)
+        for name, entry in ranked[:top]:
+            written = f"，寫出 {entry['bytes_written'] / 1024:.0f} KB" if entry["bytes_written"] else ""
+            print(f"  - {name}: {entry['wall_s']:.2f} 秒 (CPU {entry['cpu_s']:.2f} 秒){written}")
+
+
+# 目前執行中的統計；模組載入時即建立，未呼叫 start_run 時量測結果僅留在記憶體
+_current = RunMetrics("run")
+
+
+def start_run(name):
+    """開始新的一次執行統計並設為目前統計"""
+    global _current
+    _current = RunMetrics(name)
+    return _current
+
+
+def current():
+    return _current
+
+
+def stage(name):
+    """於目前統計中量測一個階段"""
+    return _current.stage(name)
+
+
+def timed(name):
+    """函式裝飾器：每次呼叫記為目前統計中的一個階段"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _current.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 啟用 cProfile 時各執行緒的剖析器 (cProfile 只記錄呼叫 enable 的執行緒)
+_profilers = None
+
+
+@contextmanager
+def profiled(path=None):
+    """path 有值時以 cProfile 記錄期間內的呼叫並輸出至該檔 (可用 pstats 或 snakeviz 檢視)
+
+    管線階段的執行緒透過 thread_profile 各自記錄，結束時合併為同一份結果
+    (Python 3.12 起 cProfile 改用 sys.monitoring，單一剖析器即涵蓋所有執行緒)。
+    """
+    global _profilers
+    if not path:
+        yield
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    _profilers = []
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+        for other in _profilers:
+            stats.add(other)
+        _profilers = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        stats.dump_stats(path)
+        print(f"[Info] 效能剖析結果已儲存至 {path}")
+
+
+@contextmanager
+def thread_profile():
+    """於工作執行緒中使用：啟用 cProfile 時記錄本執行緒的呼叫"""
+    if _profilers is None:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+：主剖析器已透過 sys.monitoring 記錄所有執行緒，不能再啟用第二個
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profilers.append(profiler)
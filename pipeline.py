@@ -0,0 +1,94 @@
+import time
+import queue
+import threading
+
+import metrics
+
+_DONE = object()
+
+
+class Stage:
+    """管線中的一個階段：fn(item) -> 下一階段的輸入"""
+
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+        self.busy = 0.0
+
+
+class _Failed:
+    """前面階段發生錯誤的項目，後續階段直接略過"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _run_stage(stage, inbox, outbox):
+    with metrics.thread_profile():
+        _stage_loop(stage, inbox, outbox)
+
+
+def _stage_loop(stage, inbox, outbox):
+    while True:
+        msg = inbox.get()
+        if msg is _DONE:
+            outbox.put(_DONE)
+            return
+        idx, item = msg
+        if not isinstance(item, _Failed):
+            t0 = time.perf_counter()
+            try:
+                with metrics.stage(stage.name):
+                    item = stage.fn(item)
+            except Exception as e:
+                item = _Failed(e)
+            stage.busy += time.perf_counter() - t0
+        outbox.put((idx, item))
+
+
+def run_pipeline(items, stages, maxsize=2):
+    """將每個項目依序送經各階段
+
+    每個階段在獨立執行緒中依輸入順序處理，階段之間以有上限 (maxsize) 的佇列相連，
+    因此前一項目在繪圖時下一項目已可同時下載與計算，總耗時接近最慢的單一階段。
+    回傳 (依輸入順序排列的結果, {階段名稱: 累計處理秒數})；任一項目失敗時於全部結束後拋出第一個錯誤。
+    """
+    queues = [queue.Queue(maxsize=maxsize) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=_run_stage, args=(stage, queues[i], queues[i + 1]),
+                                name=f"pipeline-{stage.name}", daemon=True)
+               for i, stage in enumerate(stages)]
+    for t in threads:
+        t.start()
+
+    results = {}
+
+    def drain():
+        # 由另一執行緒收集結果，避免最後一個佇列塞滿而卡住送料
+        while True:
+            msg = queues[-1].get()
+            if msg is _DONE:
+                return
+            results[msg[0]] = msg[1]
+
+    collector = threading.Thread(target=drain, name="pipeline-collect", daemon=True)
+    collector.start()
+    count = 0
+    for idx, item in enumerate(items):
+        queues[0].put((idx, item))
+        count += 1
+    queues[0].put(_DONE)
+    collector.join()
+
+    ordered = [results[i] for i in range(count)]
+    failed = next((r for r in ordered if isinstance(r, _Failed)), None)
+    if failed:
+        raise failed.error
+    return ordered, {stage.name: stage.busy for stage in stages}
+
+
+def report_stage_timing(timings, wall_time):
+    """列出各階段累計耗時與整體實際耗時"""
+    if not timings:
+        return
+    parts = ", ".join(f"{name} {busy:.2f} 秒" for name, busy in timings.items())
+    print(f"[Info] 管線實際耗時 {wall_time:.2f} 秒 (各階段累計：{parts}；逐段執行約需 {sum(timings.values()):.2f} 秒)")
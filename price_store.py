@@ -0,0 +1,90 @@
+import os
+import json
+import datetime
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_DIR = os.path.join("cache", "prices")
+
+
+def merge_frames(old, new):
+    """合併本地與新下載的K棒；同一日期以新資料為準 (最後一根可能是盤中未收盤資料)"""
+    if old is None or old.empty:
+        return new
+    if new is None or new.empty:
+        return old
+    merged = pd.concat([old, new])
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index()
+
+
+class PriceStore:
+    """以標的為鍵的本地 OHLCV 欄式儲存 (每檔一個未壓縮 .npz，讀取時不需解析文字)"""
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+
+    def path(self, symbol):
+        # ^VIX、GC=F 等代號含特殊字元，以 URL 編碼確保在各作業系統皆為合法檔名
+        return os.path.join(self.root, urllib.parse.quote(symbol, safe='') + ".npz")
+
+    def read(self, symbol):
+        """讀取本地資料，回傳 (DataFrame, 已涵蓋的起始日期)；無資料時回傳 (None, None)"""
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return None, None
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                index = pd.DatetimeIndex(npz["index"], name="Date")
+                columns = [str(c) for c in npz["columns"]]
+                df = pd.DataFrame({c: npz[f"col_{i}"] for i, c in enumerate(columns)}, index=index)
+                since = pd.Timestamp(int(npz["since"]))
+            return df, since
+        except Exception as e:
+            print(f"[Warning] 讀取 {symbol} 本地價格資料失敗，將重新下載: {e}")
+            return None, None
+
+    def write(self, symbol, df, since):
+        """寫入本地資料 (先寫暫存檔再置換，避免中斷時留下損毀檔案)"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(symbol)
+        arrays = {f"col_{i}": df[c].to_numpy(dtype="float64") for i, c in enumerate(df.columns)}
+        arrays["columns"] = np.array([str(c) for c in df.columns])
+        arrays["index"] = df.index.values
+        arrays["since"] = np.int64(pd.Timestamp(since).value)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    def updated_since(self, symbols, when):
+        """symbols 的本地資料皆於 when (UTC naive datetime) 之後寫入時回傳 True"""
+        limit = when.replace(tzinfo=datetime.timezone.utc).timestamp()
+        paths = [self.path(s) for s in dict.fromkeys(symbols)]
+        return bool(paths) and all(os.path.exists(p) and os.path.getmtime(p) >= limit for p in paths)
+
+    def state_path(self, symbol):
+        return os.path.join(self.root, urllib.parse.quote(symbol, safe='') + ".state.json")
+
+    def read_state(self, symbol):
+        """讀取與價格資料一同存放的指標狀態 (IndicatorState.to_dict() 的內容)"""
+        path = self.state_path(symbol)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[Warning] 讀取 {symbol} 指標狀態失敗: {e}")
+            return None
+
+    def write_state(self, symbol, state):
+        """寫入指標狀態"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self.state_path(symbol)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
@@ -0,0 +1,129 @@
+"""行情資料來源：Yahoo Finance (連網)、錄製 (連網並將取得的資料存於本地) 與回放 (只讀取錄製的資料)
+
+每個來源提供相同介面：
+    prices(symbol, start, end=None, timeout=20) -> DataFrame   (同 data_fetcher.yf_fetcher)
+    info(symbol) -> Ticker.info 字典                          (同 fundamentals.yf_info_fetcher)
+    now() -> 本次執行的 UTC 時間 (naive datetime)
+use_cache 表示是否搭配本地價格資料庫與基本面快取；錄製與回放都不使用，
+以便錄製內容涵蓋報告用到的全部資料，回放時也不受本機快取狀態影響，可重現當日報告。
+"""
+import os
+import json
+import datetime
+import threading
+import urllib.parse
+
+import pandas as pd
+
+from price_store import PriceStore, merge_frames
+from data_fetcher import yf_fetcher, normalize_frame
+from fundamentals import yf_info_fetcher, FIELD_MAP
+
+MANIFEST_FILE = "manifest.json"
+
+
+def info_path(root, symbol):
+    return os.path.join(root, "info", urllib.parse.quote(symbol, safe='') + ".json")
+
+
+class YahooProvider:
+    """以 yfinance 連網取得資料 (預設來源)"""
+    name = "yahoo"
+    remote = True
+    use_cache = True
+
+    def prices(self, symbol, start, end=None, timeout=20):
+        return yf_fetcher(symbol, start, end, timeout=timeout)
+
+    def info(self, symbol):
+        return yf_info_fetcher(symbol)
+
+    def now(self):
+        return datetime.datetime.utcnow()
+
+
+class RecordingProvider:
+    """包裝另一個來源，將取得的日K與基本面存於 root，並記錄本次執行時間供回放使用
+
+    日K存於 root/prices (PriceStore 格式)，同一標的多次取得時合併；基本面只保留報告用到的 Ticker.info 鍵值。
+    """
+    name = "record"
+    use_cache = False
+
+    def __init__(self, root, inner=None):
+        self.root = root
+        self.inner = inner or YahooProvider()
+        self.remote = self.inner.remote
+        self.store = PriceStore(os.path.join(root, "prices"))
+        self._lock = threading.Lock()
+        self._now = None
+
+    def prices(self, symbol, start, end=None, timeout=20):
+        df = self.inner.prices(symbol, start, end, timeout=timeout)
+        if df is not None and not df.empty:
+            with self._lock:
+                old, since = self.store.read(symbol)
+                start = pd.Timestamp(start).normalize()
+                self.store.write(symbol, merge_frames(old, normalize_frame(df.copy())), min(since, start) if since is not None else start)
+        return df
+
+    def info(self, symbol):
+        info = self.inner.info(symbol)
+        path = info_path(self.root, symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({key: (info or {}).get(key) for key in FIELD_MAP.values()}, f, ensure_ascii=False, default=str)
+        return info
+
+    def now(self):
+        # 第一次呼叫時決定本次執行時間並寫入 manifest
+        if self._now is None:
+            self._now = self.inner.now()
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump({"utc_now": self._now.isoformat(), "source": self.inner.name}, f)
+        return self._now
+
+
+class ReplayProvider:
+    """只讀取 RecordingProvider 錄製的資料，不連網；執行時間沿用錄製當時的時間"""
+    name = "replay"
+    remote = False
+    use_cache = False
+
+    def __init__(self, root):
+        path = os.path.join(root, MANIFEST_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{root} 不是錄製資料目錄 (缺少 {MANIFEST_FILE})")
+        with open(path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.root = root
+        self.store = PriceStore(os.path.join(root, "prices"))
+
+    def prices(self, symbol, start, end=None, timeout=20):
+        df, _ = self.store.read(symbol)
+        if df is None:
+            raise LookupError(f"錄製資料中沒有 {symbol}")
+        df = df[df.index >= pd.Timestamp(start).normalize()]
+        return df if end is None else df[df.index < pd.Timestamp(end)]
+
+    def info(self, symbol):
+        try:
+            with open(info_path(self.root, symbol), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise LookupError(f"錄製資料中沒有 {symbol} 的基本面資料")
+
+    def now(self):
+        return datetime.datetime.fromisoformat(self.manifest["utc_now"])
+
+
+def make_provider(record=None, replay=None):
+    """依命令列選項建立資料來源：--record 目錄、--replay 目錄，皆未指定時為 Yahoo Finance"""
+    if record and replay:
+        raise ValueError("--record 與 --replay 不可同時使用")
+    if replay:
+        return ReplayProvider(replay)
+    if record:
+        return RecordingProvider(record)
+    return YahooProvider()
@@ -0,0 +1,60 @@
+import os
+import base64
+import hashlib
+from io import BytesIO
+
+ASSET_DIR_NAME = "assets"
+PAGE_DIR_NAME = "pages"
+# 報告內相對於 report/ 的路徑，複製到根目錄 (index.html) 時需加上前綴
+RELOCATABLE_PREFIXES = (f'src="{ASSET_DIR_NAME}/', f'href="{PAGE_DIR_NAME}/')
+ASSET_FORMATS = ("png", "png-optimized", "webp")
+
+
+def encode_image(png_bytes, fmt="png"):
+    """依輸出格式轉換圖檔，回傳 (位元組, 副檔名)；png 直接使用繪圖結果"""
+    if fmt not in ASSET_FORMATS:
+        raise ValueError(f"不支援的圖檔格式: {fmt} (可用: {', '.join(ASSET_FORMATS)})")
+    if fmt == "png":
+        return png_bytes, "png"
+    from PIL import Image
+    img = Image.open(BytesIO(png_bytes))
+    out = BytesIO()
+    if fmt == "webp":
+        img.save(out, format="WEBP", lossless=True, method=6)
+        return out.getvalue(), "webp"
+    img.save(out, format="PNG", optimize=True)
+    return out.getvalue(), "png"
+
+
+def write_chart_asset(b64_png, assets_dir, fmt="png"):
+    """將 Base64 圖檔寫入共用資產目錄 (以內容雜湊命名，相同圖檔只存一份)，回傳相對於報告的 URL"""
+    data, ext = encode_image(base64.b64decode(b64_png), fmt)
+    name = f"{hashlib.sha256(data).hexdigest()[:20]}.{ext}"
+    path = os.path.join(assets_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(assets_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return f"{ASSET_DIR_NAME}/{name}"
+
+
+def chart_src(value):
+    """Jinja 過濾器：資產 URL 原樣輸出，Base64 字串則轉為 data URI"""
+    if value and value.startswith(ASSET_DIR_NAME + "/"):
+        return value
+    return f"data:image/png;base64,{value}"
+
+
+def relocated(marker, prefix):
+    """RELOCATABLE_PREFIXES 中的一項加上前綴後的字串 (例如 src="assets/ -> src="report/assets/)"""
+    attr, path = marker.split('"', 1)
+    return f'{attr}"{prefix}{path}'
+
+
+def relocate_asset_urls(html, prefix):
+    """將報告內的資產與分頁相對路徑加上前綴 (例如根目錄 index.html 需改為 report/assets/...)"""
+    for marker in RELOCATABLE_PREFIXES:
+        html = html.replace(marker, relocated(marker, prefix))
+    return html
@@ -0,0 +1,116 @@
+import os
+import re
+import mmap
+import shutil
+
+from report_assets import RELOCATABLE_PREFIXES, relocated as relocated_marker
+
+ASSET_MARKERS = RELOCATABLE_PREFIXES
+
+
+def plan_injection(buf, placeholders=None, regions=None, asset_markers=ASSET_MARKERS):
+    """一次掃描找出所有插入點，回傳依位置排序的 [(起點, 終點, 取代位元組或 None)]
+
+    placeholders 為 {完整標籤: 內容}，整個標籤換成內容；
+    regions 為 {起始標籤: (錨點, 內容)}，起始標籤至錨點之前的整段換成「起始標籤 + 內容 + </div>」，
+    可重複執行；找不到錨點時僅取代空標籤「起始標籤</div>」。
+    asset_markers (資產與分頁路徑) 出現處記為 None，供寫出根目錄 index.html 時改寫路徑。
+    buf 可為 bytes 或 mmap，掃描與切片皆以位元組位置進行，不複製整份文件。
+    """
+    placeholders = {k.encode(): v.encode() for k, v in (placeholders or {}).items()}
+    regions = {k.encode(): (a.encode(), v.encode()) for k, (a, v) in (regions or {}).items()}
+    markers = list(placeholders) + list(regions) + [m.encode() for m in asset_markers or ()]
+    if not markers:
+        return []
+    pattern = re.compile(b"|".join(re.escape(m) for m in markers))
+    plan, pos = [], 0
+    while True:
+        m = pattern.search(buf, pos)
+        if not m:
+            return plan
+        key, start, pos = m.group(0), m.start(), m.end()
+        if key in placeholders:
+            plan.append((start, pos, placeholders[key]))
+        elif key in regions:
+            anchor, content = regions[key]
+            end = buf.find(anchor, pos)
+            if end == -1:
+                if buf[pos:pos + 6] != b"</div>":
+                    continue
+                end = pos + 6
+            plan.append((start, end, key + b"\n" + content + b"\n</div>"))
+            pos = end
+        else:
+            plan.append((start, pos, None))
+
+
+def _write_spliced(files, view, plan, relocated):
+    """依插入點將原文件切片與取代內容依序寫入各輸出檔；files 為 [(檔案, 是否改寫路徑)]，relocated 為 {原路徑: 改寫後}"""
+    pos = 0
+    for start, end, content in plan:
+        for f, relocate in files:
+            f.write(view[pos:start])
+            f.write(content if content is not None else (relocated[bytes(view[start:end])] if relocate else view[start:end]))
+        pos = end
+    for f, _ in files:
+        f.write(view[pos:])
+
+
+def _link_or_copy(src, dst):
+    """以硬連結建立 dst (內容與 src 完全相同時)，不支援時改為複製；皆以原子方式取代"""
+    tmp = dst + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def inject_file(path, placeholders=None, regions=None, index_path=None, asset_prefix="report/"):
+    """將內容注入報告檔並以原子方式寫回，回傳寫出的位元組數
+
+    檔案以 mmap 讀取，輸出由原文切片與注入內容串流寫入暫存檔後 rename，記憶體用量不隨報告大小增加。
+    提供 index_path 時同一次掃描一併輸出根目錄 index.html (資產與分頁路徑加上 asset_prefix)；
+    報告中沒有這些路徑時兩者內容相同，直接建立硬連結。
+    """
+    tmp = path + ".tmp"
+    index_tmp = index_path + ".tmp" if index_path else None
+    relocated = {m.encode(): relocated_marker(m, asset_prefix).encode() for m in ASSET_MARKERS}
+    with open(path, "rb") as src:
+        size = os.fstat(src.fileno()).st_size
+        buf = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            plan = plan_injection(buf, placeholders, regions)
+            separate_index = index_path and any(content is None for _, _, content in plan)
+            with memoryview(buf) as view, open(tmp, "wb") as out:
+                files = [(out, False)]
+                if separate_index:
+                    with open(index_tmp, "wb") as index_out:
+                        _write_spliced(files + [(index_out, True)], view, plan, relocated)
+                else:
+                    _write_spliced(files, view, plan, relocated)
+        finally:
+            if size:
+                buf.close()
+    os.replace(tmp, path)
+    written = os.path.getsize(path)
+    if index_path:
+        if separate_index:
+            os.replace(index_tmp, index_path)
+        else:
+            _link_or_copy(path, index_path)
+        written += os.path.getsize(index_path)
+    return written
+
+
+def inject_text(text, placeholders=None, regions=None):
+    """記憶體內版本 (測試與小型文件使用)，規則與 inject_file 相同，不改寫資產路徑"""
+    buf = text.encode("utf-8")
+    parts, pos = [], 0
+    for start, end, content in plan_injection(buf, placeholders, regions, asset_markers=None):
+        parts += [buf[pos:start], content]
+        pos = end
+    parts.append(buf[pos:])
+    return b"".join(parts).decode("utf-8")
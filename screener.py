@@ -0,0 +1,120 @@
+import numpy as np
+
+# 比較運算子；crosses_above / crosses_below 為 (這一根成立, 前一根成立) 的一組比較
+OPS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+CROSS_OPS = {"crosses_above": (np.greater, np.less_equal), "crosses_below": (np.less, np.greater_equal)}
+
+
+class Rule:
+    """一條篩選規則：所有條件同時成立的K棒即為命中，命中標的依 rank 欄位排序"""
+
+    def __init__(self, name, label, conditions, rank=None):
+        self.name = name
+        self.label = label
+        self.conditions = conditions
+        self.descending = not (rank or "").startswith("-")
+        self.rank_field = (rank or "").lstrip("-") or None
+
+
+def compile_rules(specs, thresholds=None):
+    """解析設定檔中的規則
+
+    每條規則為 {"name", "label", "when": [[左, 運算子, 右], ...], "rank": 欄位 (前綴 - 為由小到大)}；
+    左右兩側可為指標欄位名稱、數字，或 "$名稱" 引用 color_thresholds 的門檻值。
+    """
+    thresholds = thresholds or {}
+    rules = []
+    for spec in specs or []:
+        conditions = []
+        for left, op, right in spec["when"]:
+            if op not in OPS and op not in CROSS_OPS:
+                raise ValueError(f"篩選規則 {spec['name']} 使用了不支援的運算子: {op}")
+            operands = []
+            for x in (left, right):
+                if isinstance(x, str) and x.startswith("$"):
+                    if x[1:] not in thresholds:
+                        raise ValueError(f"篩選規則 {spec['name']} 引用了不存在的門檻值: {x}")
+                    x = float(thresholds[x[1:]])
+                operands.append(x)
+            conditions.append((operands[0], op, operands[1]))
+        rules.append(Rule(spec["name"], spec.get("label", spec["name"]), conditions, spec.get("rank")))
+    return rules
+
+
+def _operand(panel, x, start):
+    """欄位取最近的列 (自 start 起)，數字維持純量以便廣播"""
+    if not isinstance(x, str):
+        return float(x)
+    if x not in panel.fields:
+        raise ValueError(f"篩選規則使用了不存在的指標欄位: {x}")
+    return panel.fields[x][start:]
+
+
+def evaluate(panel, rule, lookback):
+    """回傳最近 lookback 根K棒的命中矩陣 (K棒數 x 標的數)，NaN 與補齊的列一律不命中"""
+    lookback = min(lookback, panel.rows)
+    start = panel.rows - lookback
+    mask = panel.valid_mask()[start:]
+    with np.errstate(invalid="ignore"):
+        for left, op, right in rule.conditions:
+            if op in OPS:
+                mask = mask & OPS[op](_operand(panel, left, start), _operand(panel, right, start))
+                continue
+            # 交叉需要前一根K棒：多取一列，前一根為 NaN 時不視為交叉
+            s0 = max(start - 1, 0)
+            a, b = _operand(panel, left, s0), _operand(panel, right, s0)
+            shape = (panel.rows - s0, len(panel.symbols))
+            now_op, before_op = CROSS_OPS[op]
+            now, before = np.broadcast_to(now_op(a, b), shape), np.broadcast_to(before_op(a, b), shape)
+            crossed = np.zeros(shape, dtype=bool)
+            crossed[1:] = now[1:] & before[:-1]
+            mask = mask & crossed[start - s0:]
+    return mask
+
+
+def run_screener(panel, rules, lookback=20, names=None):
+    """對面板中所有標的執行規則，回傳命中清單 [{"rule", "symbol", "name", "date", "bars_ago", "hits", "value"}]
+
+    date 與 bars_ago 為最近一次命中的日期及距最新K棒的根數，hits 為 lookback 內命中次數，
+    value 為 rank 欄位的最新值；只有命中的標的才逐一組成結果，其餘皆為陣列運算。
+    """
+    if not panel.symbols or not panel.rows:
+        return []
+    names = names or {}
+    lookback = min(lookback, panel.rows)
+    # 最近 lookback 列各標的對應的日期 (與面板一樣靠右對齊)
+    dates = np.full((lookback, len(panel.symbols)), np.datetime64("NaT"), dtype="datetime64[D]")
+    for j, symbol in enumerate(panel.symbols):
+        tail = panel.indexes[symbol].values[-lookback:]
+        dates[lookback - len(tail):, j] = tail
+    out = []
+    for rule in rules:
+        mask = evaluate(panel, rule, lookback)
+        hit_cols = np.flatnonzero(mask.any(axis=0))
+        if not len(hit_cols):
+            continue
+        last = lookback - 1 - np.argmax(mask[::-1, hit_cols], axis=0)
+        counts = mask[:, hit_cols].sum(axis=0)
+        values = panel.fields[rule.rank_field][-1, hit_cols] if rule.rank_field else np.full(len(hit_cols), np.nan)
+        values = np.where(np.isnan(values), None, np.round(values, 4).astype(object))
+        hit_dates = np.datetime_as_string(dates[last, hit_cols], unit="D")
+        for j, date, bars_ago, count, value in zip(hit_cols.tolist(), hit_dates.tolist(), (lookback - 1 - last).tolist(),
+                                                   counts.tolist(), values.tolist()):
+            symbol = panel.symbols[j]
+            out.append({"rule": rule.name, "symbol": symbol, "name": names.get(symbol, symbol), "date": date,
+                        "bars_ago": bars_ago, "hits": count, "value": value})
+    return out
+
+
+def rank_hits(hits, rules, top_n=None):
+    """依規則彙整命中清單：最近命中者優先，其次依 rank 欄位排序；回傳 [{"name", "label", "total", "hits"}]"""
+    by_rule = {}
+    for hit in hits:
+        by_rule.setdefault(hit["rule"], {})[hit["symbol"]] = hit
+    ranked = []
+    for rule in rules:
+        entries = list(by_rule.get(rule.name, {}).values())
+        sign = -1 if rule.descending else 1
+        entries.sort(key=lambda h: (h["bars_ago"], h["value"] is None, sign * (h["value"] or 0), h["symbol"]))
+        ranked.append({"name": rule.name, "label": rule.label, "total": len(entries), "hits": entries[:top_n]})
+    return ranked
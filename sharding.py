@@ -0,0 +1,104 @@
+# 分片執行：將所有群組切成固定列數的分頁，分頁依序輪流分配給各分片。
+#
+# 每個分片 (獨立行程，可同時執行多個) 只處理分到的分頁，逐頁將結果以 JSON Lines 追加寫入
+# cache/shards/<日期>/shard-<i>-of-<N>.jsonl，處理完成的資料隨即釋放，記憶體用量只與分頁大小有關。
+# 全部分片完成後由合併步驟依設定檔順序讀回各分頁，產生摘要、technical_data.json 與分頁報告。
+import os
+import json
+
+DEFAULT_SHARD_DIR = os.path.join("cache", "shards")
+DEFAULT_PAGE_SIZE = 100
+# 紀錄中體積大的欄位 (表格與圖檔、行情資料、瀏覽器繪圖資料)，建立索引時不保留
+HEAVY_FIELDS = ("result", "market", "payload", "plot")
+
+
+def parse_shard(text):
+    """解析 "i/N" (分片編號由 0 起算)，回傳 (i, N)；格式錯誤時拋出 ValueError"""
+    try:
+        index, count = (int(x) for x in text.split("/"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"分片格式應為 i/N，例如 0/4: {text}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片編號需介於 0 與 {count - 1} 之間: {text}")
+    return index, count
+
+
+def paginate(groups, page_size=DEFAULT_PAGE_SIZE):
+    """將各群組的標的依設定順序切成分頁，回傳 [{"group", "page", "pages", "symbols"}]"""
+    units = []
+    for g, group in enumerate(groups):
+        symbols = list(dict.fromkeys(group["symbols"]))
+        pages = max(1, -(-len(symbols) // page_size))
+        for p in range(pages):
+            units.append({"group": g, "page": p, "pages": pages, "symbols": symbols[p * page_size:(p + 1) * page_size]})
+    return units
+
+
+def assign(units, index, count):
+    """第 index 個分片負責的分頁 (依序輪流分配，各分片的分頁數最多相差一頁)"""
+    return units[index::count]
+
+
+def shard_path(root, date_str, index, count):
+    return os.path.join(root, date_str.replace("-", ""), f"shard-{index}-of-{count}.jsonl")
+
+
+class ShardWriter:
+    """逐筆追加分片結果；close 時才改為正式檔名，合併步驟只會讀到已完成的分片"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._f = open(self._tmp, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, record):
+        self._f.write(json.dumps(record, ensure_ascii=False, default=float) + "\n")
+        self.count += 1
+
+    def close(self):
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._f.close()
+        os.remove(self._tmp)
+
+
+def latest_shard_run(root):
+    """最近一次分片執行的日期目錄與分片數，回傳 (目錄, N, 缺少的分片編號)；沒有紀錄時回傳 None"""
+    if not os.path.isdir(root):
+        return None
+    for name in sorted(os.listdir(root), reverse=True):
+        run_dir = os.path.join(root, name)
+        files = [f for f in os.listdir(run_dir) if f.startswith("shard-") and f.endswith(".jsonl")] if os.path.isdir(run_dir) else []
+        if not files:
+            continue
+        count = max(int(f[:-len(".jsonl")].rsplit("-of-", 1)[1]) for f in files)
+        done = {int(f[len("shard-"):].split("-of-")[0]) for f in files if f.endswith(f"-of-{count}.jsonl")}
+        return run_dir, count, [i for i in range(count) if i not in done]
+    return None
+
+
+def index_records(run_dir, count):
+    """掃描各分片檔，回傳 [(檔案路徑, 位移, 紀錄摘要)]；紀錄摘要不含行情與圖檔等大型欄位"""
+    entries = []
+    for i in range(count):
+        path = os.path.join(run_dir, f"shard-{i}-of-{count}.jsonl")
+        with open(path, "rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                record = json.loads(line)
+                entries.append((path, offset, {k: v for k, v in record.items() if k not in HEAVY_FIELDS}))
+    return entries
+
+
+def load_record(path, offset):
+    """依 index_records 的位移讀回單筆完整紀錄"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
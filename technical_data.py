@@ -0,0 +1,189 @@
+"""technical_data.json 的讀寫
+
+columnar-v1 格式仍為合法 JSON，但每個區塊獨立一行 (market 區塊則每檔標的一行)，
+讀取端可逐行略過不需要的區塊而不必解析整份檔案：
+
+    {"format":"columnar-v1","last_updated":"..."
+    ,"yield":{...}
+    ,"yield_curve":{...}       (選用)
+    ,"summary":[...]
+    ,"fundamental":[...]
+    ,"screener":[...]          (選用)
+    ,"market":{
+    "標的名稱":{"Date":[...],"Close":[...],...}
+    ,"標的名稱":{...}
+    }
+    }
+"""
+import os
+import json
+import gzip
+import math
+
+FORMAT = "columnar-v1"
+_DECODER = json.JSONDecoder()
+
+
+def records_to_columns(records):
+    """列導向 [{欄位: 值}] 轉為欄導向 {欄位: [值]}"""
+    columns = {}
+    for i, row in enumerate(records):
+        for key, value in row.items():
+            columns.setdefault(key, [None] * i).append(value)
+        for key in columns:
+            if len(columns[key]) < i + 1:
+                columns[key].append(None)
+    return columns
+
+
+def columns_to_records(columns):
+    """欄導向 {欄位: [值]} 轉回列導向 [{欄位: 值}] (供舊程式使用)"""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*(columns[k] for k in keys))]
+
+
+def _fixed(values, precision):
+    """固定小數位數；NaN 轉為 None，整數值 (例如成交量) 輸出為整數"""
+    out = []
+    for v in values:
+        if isinstance(v, float):
+            if math.isnan(v) or math.isinf(v):
+                v = None
+            elif v.is_integer() and abs(v) >= 1:
+                v = int(v)
+            else:
+                v = round(v, precision)
+        out.append(v)
+    return out
+
+
+def to_columnar_market(market_data, precision=4):
+    """將每檔標的的市場資料轉為欄式並固定精度；已是欄式者直接套用精度"""
+    result = {}
+    for name, entry in (market_data or {}).items():
+        columns = records_to_columns(entry) if isinstance(entry, list) else entry
+        result[name] = {k: _fixed(list(v), precision) for k, v in columns.items()}
+    return result
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), allow_nan=False, default=_default)
+
+
+def _default(obj):
+    # numpy 純量等可轉為 float 的型別
+    value = float(obj)
+    return None if math.isnan(value) else value
+
+
+def _sanitize(value):
+    """將巢狀結構中的 NaN 轉為 None，確保輸出為標準 JSON"""
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if isinstance(value, dict):
+        return {k: _sanitize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_sanitize(v) for v in value]
+    return value
+
+
+def write_technical_data(filename, fundamental, yields, market, summary, last_updated, encoding="json", precision=4, screener=None,
+                         yield_curve=None):
+    """以 columnar-v1 格式寫入；encoding="gzip" 時寫入 gzip 壓縮檔，回傳實際寫入的檔名
+
+    market 可為 {名稱: 資料}、MarketPanel，或依序產生 (名稱, 資料) 與 MarketPanel 的迭代器 (各群組或分頁的面板)，
+    逐行寫出不組成整份字串；名稱重複時只寫出第一筆。screener (篩選結果)、yield_curve (殖利率利差統計) 有值時各另寫一個區塊。
+    """
+    plain = filename[:-3] if filename.endswith(".gz") else filename
+    target = plain + ".gz" if encoding == "gzip" else plain
+    tmp = target + ".tmp"
+    entries = market.items() if isinstance(market, dict) else [market] if hasattr(market, "json_entries") else (market or ())
+    seen = set()
+    with (gzip.open(tmp, "wt", encoding="utf-8") if encoding == "gzip" else open(tmp, "w", encoding="utf-8")) as f:
+        f.write(_dumps({"format": FORMAT, "last_updated": last_updated})[:-1] + "\n")
+        for key, value in (("yield", yields), ("summary", summary), ("fundamental", fundamental), ("screener", screener),
+                           ("yield_curve", yield_curve)):
+            if key in ("screener", "yield_curve") and value is None:
+                continue
+            f.write(f',"{key}":{_dumps(_sanitize(value))}\n')
+        f.write(',"market":{\n')
+        for item in entries:
+            # MarketPanel 直接由陣列產生 JSON 文字；其餘為 (名稱, 列式或欄式資料)
+            pairs = item.json_entries(precision) if hasattr(item, "json_entries") else \
+                ((item[0], _dumps(to_columnar_market({item[0]: item[1]}, precision)[item[0]])),)
+            for name, text in pairs:
+                if name in seen:
+                    continue
+                f.write(("," if seen else "") + _dumps(name) + ":" + text + "\n")
+                seen.add(name)
+        f.write("}\n}\n")
+    os.replace(tmp, target)
+    # 移除另一種編碼的舊檔，避免讀取端讀到過期資料
+    stale = plain if target != plain else plain + ".gz"
+    if os.path.exists(stale):
+        os.remove(stale)
+    return target
+
+
+def _open_text(filename):
+    with open(filename, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(filename, "rt", encoding="utf-8")
+    return open(filename, "r", encoding="utf-8")
+
+
+def read_technical_data(filename, sections=None, symbols=None, columnar=False):
+    """讀取 technical_data.json (新舊格式皆可，亦支援 .gz)
+
+    sections 指定只載入的區塊 (例如 ["yield"])，symbols 指定 market 區塊只載入的標的名稱；
+    columnar-v1 格式下未指定的區塊與標的僅逐行略過、不做 JSON 解析。
+    market 預設與舊版相同為列式 {名稱: [{欄位: 值}]}；columnar=True 時改為欄式 {名稱: {欄位: [值]}}，省去轉換。
+    """
+    if not os.path.exists(filename) and os.path.exists(filename + ".gz"):
+        filename += ".gz"
+    wanted = set(sections) if sections else None
+    with _open_text(filename) as f:
+        first = f.readline()
+        if not first.startswith('{"format":"columnar'):
+            # 舊版：整份解析後再轉為欄式
+            data = json.loads(first + f.read())
+            if wanted is not None:
+                data = {k: v for k, v in data.items() if k in wanted or k == "last_updated"}
+            if "market" in data:
+                market = data["market"] or {}
+                if symbols is not None:
+                    market = {k: v for k, v in market.items() if k in symbols}
+                data["market"] = to_columnar_market(market, precision=12) if columnar else market
+            return data
+
+        data = json.loads(first.rstrip("\n") + "}")
+        in_market = False
+        for line in f:
+            line = line.rstrip("\n")
+            if in_market:
+                if line == "}":
+                    in_market = False
+                    continue
+                name, end = _DECODER.raw_decode(line, 1 if line.startswith(",") else 0)
+                if symbols is None or name in symbols:
+                    data["market"][name] = json.loads(line[end + 1:])
+                continue
+            if not line.startswith(',"'):
+                continue
+            key, end = _DECODER.raw_decode(line, 1)
+            if key == "market" and line[end + 1:] == "{":
+                in_market = wanted is None or "market" in wanted
+                if in_market:
+                    data["market"] = {}
+                else:
+                    # 不需要 market 時仍須略過其內容行
+                    for skipped in f:
+                        if skipped.rstrip("\n") == "}":
+                            break
+                continue
+            if wanted is None or key in wanted:
+                data[key] = json.loads(line[end + 1:])
+        if not columnar and "market" in data:
+            data["market"] = {name: columns_to_records(columns) for name, columns in data["market"].items()}
+        return data
@@ -0,0 +1,136 @@
+import os
+import gzip
+import base64
+import time
+
+import numpy as np
+
+import investment_analysis
+import update_report
+import archive
+from archive import ReportArchive, parse_report_html, readings_from_columns, read_report
+from chart_renderer import render_candlestick_png
+from benchmarks.synthetic import make_ohlcv, make_universe
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+
+def test_series_and_snapshot_queries(tmp_path):
+    with ReportArchive(str(tmp_path / "a.sqlite")) as archive:
+        for day in range(1, 4):
+            archive.record_report(f"2026-01-0{day}", None, {"2330.TW": {"BIAS_20": day * 1.5, "K": 50.0}, "^VIX": {"K": 20.0}},
+                                  [{"symbol": "台積電", "orig_symbol": "2330.TW", "close": 100.0 + day, "change": 1.0}], {"10Y": 4.0 + day})
+        # 同一日期重新記錄時整份取代
+        archive.record_report("2026-01-03", None, {"2330.TW": {"BIAS_20": -1.0}})
+        assert archive.series("2330.TW", "BIAS_20") == [("2026-01-01", 1.5), ("2026-01-02", 3.0), ("2026-01-03", -1.0)]
+        assert archive.series("2330.TW", "BIAS_20", last=2) == [("2026-01-02", 3.0), ("2026-01-03", -1.0)]
+        assert archive.series("2330.TW", "BIAS_20", start="2026-01-02", end="2026-01-02") == [("2026-01-02", 3.0)]
+        assert archive.snapshot() == {"2330.TW": {"BIAS_20": -1.0}}
+        assert archive.snapshot("2026-01-02", fields=["K"]) == {"2330.TW": {"K": 50.0}, "^VIX": {"K": 20.0}}
+        assert archive.yield_history("10Y") == [("2026-01-01", "10Y", 5.0), ("2026-01-02", "10Y", 6.0)]
+        assert archive.summary("2026-01-01")[0]["orig_symbol"] == "2330.TW"
+
+
+def test_series_lookup_is_indexed(tmp_path):
+    """上百份報告下查詢單一標的最近 60 份報告仍在毫秒等級"""
+    fields = ["Close", "K", "D", "BIAS_5", "BIAS_20", "BIAS_60", "ADX"]
+    with ReportArchive(str(tmp_path / "a.sqlite")) as archive:
+        for day in range(120):
+            readings = {f"S{j:03d}": {f: float(day + j) for f in fields} for j in range(60)}
+            archive.record_report(str(np.datetime64("2025-01-01") + day), None, readings)
+        t0 = time.perf_counter()
+        rows = archive.series("S023", "BIAS_20", last=60)
+        assert len(rows) == 60 and rows[-1][1] == 119 + 23
+        assert time.perf_counter() - t0 < 0.05
+
+
+def test_ingest_report_html_matches_table(tmp_path, monkeypatch):
+    """由報告 HTML 補建的讀數與表格顯示的數值一致 (僅取群組表格)"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(investment_analysis, "TEMPLATE_DIR", TEMPLATE_DIR)
+    panel = investment_analysis.calculate_indicators_batch(make_universe(3, 120))
+    monkeypatch.setattr(investment_analysis, "SYMBOL_NAME_MAP", {panel.symbols[0]: "第一檔"})
+    latest = investment_analysis.latest_values(panel, panel.symbols)
+    rows = investment_analysis.render_table_rows(investment_analysis.table_row_records(panel.symbols, latest))
+    b64 = base64.b64encode(render_candlestick_png(make_ohlcv(40), [5])).decode()
+    report_data = [{"title": "測試", "section_id": "t", "table_rows": rows, "plots": {panel.symbols[0]: b64},
+                    "last_trading_date": "2026-01-02", "is_closed": False}]
+    summary_items = [{"symbol": "第一檔", "orig_symbol": panel.symbols[0], "close": 12.5, "change": -1.25}]
+    monkeypatch.setattr(investment_analysis, "KEY_INDICATORS", [panel.symbols[0]])
+    screener = [{"name": "r", "label": "規則", "total": 1, "hits": [{"symbol": panel.symbols[1], "name": "x", "date": "2026-01-02",
+                                                                 "bars_ago": 0, "hits": 1, "value": 1.0}]}]
+    for date in ("2026-01-02", "2026-03-02"):
+        investment_analysis.generate_html_report(report_data, date, investment_analysis.build_summary_html(summary_items), b64,
+                                                 [], {}, {}, summary_items, chart_output="inline", screener=screener)
+    readings, summary, _ = parse_report_html(read_report("report/invest_analysis_20260102.html"))
+    expected = readings_from_columns(panel.symbols, latest)
+    assert set(readings) == set(panel.symbols)
+    for symbol, values in readings.items():
+        assert set(values) == {"Close", "Change %", "Volume Change %", "K", "D", "BIAS_5", "BIAS_20", "BIAS_60", "ADX", "+DI", "-DI"}
+        for field, value in values.items():
+            assert abs(value - expected[symbol][field]) <= 0.05 + 1e-9
+    assert summary == [{"symbol": "第一檔", "orig_symbol": panel.symbols[0], "close": 12.5, "change": -1.25}]
+
+    # 壓縮：內嵌圖檔改為共用資產並以 gzip 移至 report/archive/，最新一份不動
+    with ReportArchive("cache/archive.sqlite") as archive:
+        stats = archive.compact("report", keep_days=30, compress=True)
+        assert stats["reports"] == 1 and stats["images"] == 2 and stats["after"] < stats["before"]
+        assert archive.series(panel.symbols[0], "K")[0][0] == "2026-01-02"
+    old = "report/archive/invest_analysis_20260102.html.gz"
+    assert not os.path.exists("report/invest_analysis_20260102.html") and os.path.exists("report/invest_analysis_20260302.html")
+    with gzip.open(old, "rt", encoding="utf-8") as f:
+        html = f.read()
+    assert "data:image/png;base64" not in html and 'src="../assets/' in html
+    assert len(os.listdir("report/assets")) == 1
+
+
+def test_ingest_cli_rejects_non_report_paths(tmp_path, capsys):
+    """檔名不符每日報告格式時印出錯誤並略過，不拋出例外"""
+    page = tmp_path / "index.html"
+    page.write_text("<html></html>", encoding="utf-8")
+    assert archive.main(["--db", str(tmp_path / "a.sqlite"), "ingest", str(page)]) == 1
+    out = capsys.readouterr().out
+    assert "[Error]" in out and "index.html" in out and "已記錄 0 份報告" in out
+
+
+def test_latest_report_uses_index_until_directory_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("report")
+    assert update_report.get_latest_report_file(archive_path="a.sqlite") is None
+    for name in ("invest_analysis_20260101.html", "invest_analysis_20260102.html", "index.html"):
+        (tmp_path / "report" / name).write_text("<html></html>", encoding="utf-8")
+    assert update_report.get_latest_report_file(archive_path="a.sqlite") == os.path.join("report", "invest_analysis_20260102.html")
+    calls = []
+    monkeypatch.setattr(os, "listdir", lambda *a: calls.append(a) or [])
+    assert update_report.get_latest_report_file(archive_path="a.sqlite") == os.path.join("report", "invest_analysis_20260102.html")
+    assert not calls
+    monkeypatch.undo()
+    monkeypatch.chdir(tmp_path)
+    time.sleep(0.01)
+    (tmp_path / "report" / "invest_analysis_20260103.html").write_text("<html></html>", encoding="utf-8")
+    assert update_report.get_latest_report_file(archive_path="a.sqlite") == os.path.join("report", "invest_analysis_20260103.html")
+
+
+def test_latest_report_defaults_to_directory_listing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("report")
+    for name in ("invest_analysis_20260101.html", "invest_analysis_20260102.html", "index.html"):
+        (tmp_path / "report" / name).write_text("<html></html>", encoding="utf-8")
+    assert update_report.get_latest_report_file() == os.path.join("report", "invest_analysis_20260102.html")
+    assert not os.path.exists(os.path.join("cache", "archive.sqlite"))
+
+
+def test_record_report_refreshes_directory_stamp(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("report")
+    (tmp_path / "report" / "invest_analysis_20260101.html").write_text("<html></html>", encoding="utf-8")
+    with ReportArchive("a.sqlite") as a:
+        a.sync_reports("report")
+        time.sleep(0.01)
+        path = os.path.join("report", "invest_analysis_20260102.html")
+        (tmp_path / "report" / "invest_analysis_20260102.html").write_text("<html></html>", encoding="utf-8")
+        a.record_report("2026-01-02", path, {"SPY": {"Close": 1.0}})
+        calls = []
+        monkeypatch.setattr(os, "listdir", lambda *a: calls.append(a) or [])
+        assert a.latest_report("report") == path
+        assert not calls
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import investment_analysis
+from backtest import TREND_STATES, classify_trend, forward_returns, forward_drawdown, run_backtest, load_panel, ALL_GROUPS
+from benchmarks.synthetic import make_universe
+from price_store import PriceStore
+
+
+def test_classify_matches_determine_trend():
+    """陣列分類與逐列呼叫 determine_trend 結果一致 (含 NaN、K=D 與乖離恰為門檻值)"""
+    rng = np.random.default_rng(3)
+    k, d, bias = rng.choice([10.0, 50.0, np.nan], 300), rng.choice([10.0, 50.0, 30.0], 300), rng.choice([-1.0, 0.0, 1.0, np.nan], 300)
+    codes = classify_trend(k, d, bias)
+    for code, args in zip(codes, zip(k, d, bias)):
+        expected, _ = investment_analysis.determine_trend(*(None if np.isnan(v) else v for v in args))
+        assert (TREND_STATES[code - 1] if code else "資料不足") == expected
+
+
+def test_forward_return_and_drawdown():
+    close = np.array([[100.0], [90.0], [120.0], [80.0], [100.0]])
+    assert np.allclose(forward_returns(close, 2)[:3, 0], [20.0, -100 / 9, -100 / 6])
+    assert np.isnan(forward_returns(close, 2)[3:]).all()
+    dd = forward_drawdown(close, 2)[:, 0]
+    assert np.allclose(dd[:3], [-10.0, -100 / 9, -100 / 3]) and np.isnan(dd[3:]).all()
+
+
+def test_backtest_from_price_store(tmp_path):
+    """自本地價格資料庫讀取並依群組彙整；各狀態樣本數合計等於可回測的K棒數"""
+    store = PriceStore(str(tmp_path))
+    frames = make_universe(4, 300, ragged=True)
+    for symbol, df in frames.items():
+        store.write(symbol, df, df.index[0])
+    panel = load_panel(list(frames) + ["MISSING"], store)
+    assert panel.symbols == list(frames)
+    result = run_backtest(panel, [{"title": "前兩檔", "symbols": list(frames)[:2]}], horizons=(5,))
+    total = result["groups"][ALL_GROUPS]["5"]
+    assert set(total) == set(TREND_STATES)
+    states = classify_trend(panel.fields["K"], panel.fields["D"], panel.fields["BIAS_20"])
+    usable = (states > 0) & ~np.isnan(forward_returns(panel.fields["Close"], 5))
+    assert sum(s["count"] for s in total.values()) == usable.sum()
+    first_two = result["groups"]["前兩檔"]["5"]
+    assert sum(s["count"] for s in first_two.values()) == usable[:, :2].sum()
+    for s in total.values():
+        assert 0 <= s["hit_rate"] <= 1 and s["worst_drawdown"] <= s["mean_drawdown"] <= 0
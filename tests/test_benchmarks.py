@@ -0,0 +1,19 @@
+from benchmarks.run_benchmarks import compare_results, bench_case
+
+
+def test_compare_flags_only_real_regressions():
+    """只標示變慢超過門檻的項目，極短的項目與基準中沒有的項目不列入"""
+    baseline = {"a[x=1]": 1.0, "b[x=1]": 1.0, "tiny[x=1]": 0.0001}
+    current = {"a[x=1]": 1.2, "b[x=1]": 1.5, "tiny[x=1]": 0.0005, "new[x=1]": 9.0}
+    assert [r[0] for r in compare_results(current, baseline, threshold=0.25)] == ["b[x=1]"]
+
+
+def test_bench_cases_run_offline(tmp_path):
+    """基準項目只使用合成資料，可在無網路環境執行"""
+    for name in ("json.save_to_json", "json.load_from_json_lazy", "inject.news_and_ai", "table.format_data_row",
+                 "json.load_gzip", "json.load_legacy_rows", "memory.market_panel_write"):
+        assert bench_case(name, 10, 1, str(tmp_path)) > 0
+
+
+def test_startup_case_measures_a_fresh_interpreter(tmp_path):
+    assert bench_case("startup.first_output", "update_report", 1, str(tmp_path)) > 0
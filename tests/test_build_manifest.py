@@ -0,0 +1,106 @@
+import os
+import json
+import shutil
+import datetime
+
+import pytest
+
+import investment_analysis as ia
+from build_manifest import BuildCache, file_digest, params_digest
+from benchmarks.synthetic import SyntheticProvider
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_file_digest_tracks_content_and_directories(tmp_path):
+    """檔案內容或目錄內任一檔案變動時雜湊值改變，不存在的檔案也能計算"""
+    (tmp_path / "tpl").mkdir()
+    (tmp_path / "tpl" / "a.html").write_text("a")
+    cfg = tmp_path / "config.json"
+    cfg.write_text("{}")
+    paths = [str(cfg), str(tmp_path / "tpl"), str(tmp_path / "missing.json")]
+    before = file_digest(paths)
+    assert file_digest(paths) == before
+    (tmp_path / "tpl" / "a.html").write_text("b")
+    assert file_digest(paths) != before
+    assert params_digest({"a": 1, "b": [1, 2]}) == params_digest({"b": [1, 2], "a": 1})
+
+
+def test_manifest_up_to_date_and_prunes_sections(tmp_path):
+    """輸入雜湊相同且輸出檔存在才視為最新；儲存紀錄時移除未被引用的區塊"""
+    cache = BuildCache(str(tmp_path / "build"))
+    out = tmp_path / "report.html"
+    out.write_text("x")
+    cache.put_section("old", {"result": None})
+    cache.put_section("g1", {"result": [{"title": "A"}, [], {}, []], "payload": None})
+    assert cache.get_section("g1")["result"][0]["title"] == "A" and cache.get_section("nope") is None
+
+    assert not cache.is_up_to_date("k1")
+    cache.save_manifest("k1", ["g1"], [str(out)])
+    assert cache.is_up_to_date("k1") and not cache.is_up_to_date("k2")
+    assert cache.get_section("old") is None and cache.get_section("g1") is not None
+    os.remove(out)
+    assert not cache.is_up_to_date("k1")
+
+
+class CountingProvider(SyntheticProvider):
+    """使用本地快取的合成資料來源，記錄連網次數；pe 可調整以模擬基本面變動"""
+    remote = True
+    use_cache = True
+
+    def __init__(self, utc_now):
+        super().__init__(utc_now, bars=400)
+        self.calls = 0
+        self.pe = 12.5
+
+    def prices(self, symbol, start, end=None, timeout=20):
+        self.calls += 1
+        return super().prices(symbol, start, end, timeout)
+
+    def info(self, symbol):
+        self.calls += 1
+        return dict(super().info(symbol), trailingPE=self.pe)
+
+
+def run_report(provider, monkeypatch, capsys):
+    monkeypatch.setattr(ia, "PROVIDER", provider)
+    provider.calls = 0
+    ia.run_report(ia.parse_args(["--chart-output", "client"]))
+    with open("technical_data.json", encoding="utf-8") as f:
+        data = json.load(f)
+    return capsys.readouterr().out, {row["pe_trailing"] for row in data["fundamental"]}
+
+
+@pytest.fixture
+def report_dir(tmp_path, monkeypatch):
+    for name in ("config.json", "macro_cache.json", "templates"):
+        src = os.path.join(ROOT, name)
+        (shutil.copytree if os.path.isdir(src) else shutil.copy)(src, str(tmp_path / name))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_weekend_rerun_skips_network(report_dir, monkeypatch, capsys):
+    """休市期間且本地資料已於收盤後更新時，重新執行不連網並沿用現有報告"""
+    provider = CountingProvider(datetime.datetime(2026, 1, 18, 3, 0))
+    out, _ = run_report(provider, monkeypatch, capsys)
+    assert provider.calls > 0 and "不重新下載" not in out
+    out, _ = run_report(provider, monkeypatch, capsys)
+    assert provider.calls == 0 and "不重新下載" in out and "沿用現有報告" in out
+    # 週五美股盤中 (台灣已是週六) 仍需下載
+    provider.utc_now = datetime.datetime(2026, 1, 16, 18, 0)
+    out, _ = run_report(provider, monkeypatch, capsys)
+    assert provider.calls > 0 and "不重新下載" not in out
+
+
+def test_fundamentals_update_reused_sections(report_dir, monkeypatch, capsys):
+    """基本面不列入群組區塊雜湊：價格未變時沿用區塊，但基本面變動仍會重新產生報告"""
+    provider = CountingProvider(datetime.datetime(2026, 1, 15, 22, 30))
+    _, pe = run_report(provider, monkeypatch, capsys)
+    assert pe == {12.5}
+    out, _ = run_report(provider, monkeypatch, capsys)
+    assert "沿用現有報告" in out
+    provider.pe = 30.0
+    shutil.rmtree(ia.FUNDAMENTAL_CACHE_DIR)
+    out, pe = run_report(provider, monkeypatch, capsys)
+    assert "沿用上次產出" in out and "沿用現有報告" not in out and pe == {30.0}
@@ -0,0 +1,34 @@
+import os
+import time
+from chart_cache import ChartCache
+from chart_renderer import render_charts, chart_key
+from benchmarks.synthetic import make_ohlcv
+
+
+def test_unchanged_charts_are_reused(tmp_path):
+    """資料與參數未變動時直接使用快取，資料或參數變動時重新繪製"""
+    cache = ChartCache(str(tmp_path))
+    df = make_ohlcv(60, seed=1)
+    first, timings = render_charts([("AAA", df)], [5, 20], max_workers=1, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1) and "AAA" in timings
+
+    second, timings = render_charts([("AAA", df)], [5, 20], max_workers=1, cache=cache)
+    assert second == first and timings == {}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    changed = df.copy()
+    changed.iloc[-1, changed.columns.get_loc("Close")] += 1
+    assert chart_key(changed, [5, 20]) != chart_key(df, [5, 20])
+    assert chart_key(df, [5, 20], plot_days=60) != chart_key(df, [5, 20], plot_days=120)
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    """超過容量上限時，從最久未使用的圖檔開始刪除"""
+    cache = ChartCache(str(tmp_path), max_bytes=250)
+    for i, key in enumerate(["old", "mid", "new"]):
+        cache.put(key, b"x" * 100)
+        t = time.time() - 100 + i
+        os.utime(cache.path(key), (t, t))
+    assert cache.get("old") is not None  # 讀取後成為最近使用
+    assert cache.evict() == 1
+    assert sorted(os.listdir(tmp_path)) == ["new.png", "old.png"]
@@ -0,0 +1,35 @@
+import json
+import gzip
+import base64
+import pandas as pd
+import investment_analysis
+from chart_payload import build_chart_payload, build_yield_payload, encode_payload
+from benchmarks.synthetic import make_ohlcv
+
+
+def test_build_chart_payload_is_columnar_and_rounded():
+    """每檔標的輸出欄式資料，日期以天數位移表示，數值約保留 6 位有效數字"""
+    df = investment_analysis.calculate_all_indicators(make_ohlcv(80, seed=1)).tail(30)
+    payload = build_chart_payload({"測試": df}, [5, 20])
+    entry = payload["測試"]
+    assert entry["b"] == df.index[0].strftime("%Y-%m-%d") and entry["t"][0] == 0
+    assert len(entry["c"]) == 30 and set(entry["ma"]) == {"5", "20"}
+    assert abs(entry["c"][-1] - df["Close"].iloc[-1]) < 1e-3
+    assert all(isinstance(v, int) for v in entry["v"])
+
+
+def test_yield_payload_aligns_tenors():
+    """不同天期殖利率對齊同一日期軸，缺值以 None 表示"""
+    idx = pd.bdate_range("2026-01-01", periods=5)
+    frames = {"^IRX": pd.DataFrame({"Close": [4.0, 4.1, 4.2, 4.3, 4.4]}, index=idx),
+              "^TNX": pd.DataFrame({"Close": [4.5, 4.6, 4.7]}, index=idx[:3])}
+    payload = build_yield_payload(frames, {"^IRX": "3M", "^TNX": "10Y"})
+    assert payload["series"]["10Y"][-1] is None and len(payload["t"]) == 5
+
+
+def test_encode_payload():
+    """JSON 輸出可安全放入 script 標籤；gzip 輸出可還原"""
+    payload = {"a": "</script>"}
+    assert "</script>" not in encode_payload(payload)
+    restored = json.loads(gzip.decompress(base64.b64decode(encode_payload(payload, "gzip"))))
+    assert restored == payload
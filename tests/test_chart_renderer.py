@@ -0,0 +1,28 @@
+import base64
+import investment_analysis
+from chart_renderer import render_charts
+from benchmarks.synthetic import make_ohlcv
+
+
+def test_parallel_render_is_byte_identical():
+    """行程池與單一行程繪製的圖檔逐位元組相同"""
+    jobs = [("AAA", make_ohlcv(80, seed=1)), ("BBB", make_ohlcv(80, seed=2))]
+    serial, _ = render_charts(jobs, [5, 20], max_workers=1)
+    parallel, timings = render_charts(jobs, [5, 20], max_workers=2)
+    assert serial == parallel
+    assert set(timings) == {"AAA", "BBB"}
+    assert base64.b64decode(parallel["AAA"]).startswith(b"\x89PNG")
+
+
+def test_create_ma_plot_base64_matches_renderer(monkeypatch):
+    """原有逐檔繪圖函式與行程池輸出一致"""
+    monkeypatch.setattr(investment_analysis, "MA_PERIODS", [5, 20])
+    df = make_ohlcv(60, seed=3)
+    plots, _ = render_charts([("AAA", df)], [5, 20], max_workers=1)
+    assert investment_analysis.create_ma_plot_base64(df, "AAA") == plots["AAA"]
+
+
+def test_render_error_is_reported():
+    """資料不足以繪圖時回傳 None 而非中斷"""
+    plots, _ = render_charts([("BAD", make_ohlcv(5).iloc[:0])], [5], max_workers=1)
+    assert plots == {"BAD": None}
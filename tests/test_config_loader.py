@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from config_loader import ConfigLoader, ConfigError, get_loader
+
+
+def test_load_is_cached_until_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"parameters": {"history_days": 250}}), encoding="utf-8")
+    loader = ConfigLoader(str(path))
+    first = loader.load()
+    calls = []
+    monkeypatch.setattr(json, "load", lambda f: calls.append(f) or {})
+    assert loader.load() is first and not calls
+    monkeypatch.undo()
+    path.write_text(json.dumps({"parameters": {"history_days": 500}}), encoding="utf-8")
+    assert loader.params() == {"history_days": 500}
+
+
+def test_errors_are_raised_as_config_error(tmp_path):
+    with pytest.raises(ConfigError, match="找不到設定檔"):
+        ConfigLoader(str(tmp_path / "missing.json")).load()
+    bad = tmp_path / "bad.json"
+    bad.write_text("{not json", encoding="utf-8")
+    with pytest.raises(ConfigError, match="格式不正確"):
+        ConfigLoader(str(bad)).load()
+
+
+def test_get_loader_shares_one_loader_per_path(tmp_path):
+    path = str(tmp_path / "config.json")
+    assert get_loader(path) is get_loader(path)
@@ -0,0 +1,70 @@
+import pytest
+import pandas as pd
+import numpy as np
+from data_fetcher import fetch_price_data, normalize_frame
+import investment_analysis
+
+
+def make_frame(n=5, start="2026-01-01"):
+    dates = pd.date_range(start=start, periods=n, name="Date")
+    return pd.DataFrame({
+        'Open': np.arange(n, dtype=float), 'High': np.arange(n, dtype=float) + 1,
+        'Low': np.arange(n, dtype=float) - 1, 'Close': np.arange(n, dtype=float),
+        'Volume': np.full(n, 1000.0)
+    }, index=dates)
+
+
+def test_fetch_price_data_with_local_fetcher():
+    """以本地假資料來源驗證並行下載、重試與耗時回報"""
+    calls = {}
+
+    def fake_fetcher(symbol, start, end=None, timeout=None):
+        calls[symbol] = calls.get(symbol, 0) + 1
+        if symbol == "FLAKY" and calls[symbol] == 1:
+            raise ConnectionError("暫時性錯誤")
+        if symbol == "BAD":
+            raise ValueError("查無資料")
+        return make_frame()
+
+    data, latencies = fetch_price_data(["AAA", "FLAKY", "BAD", "AAA"], "2026-01-01",
+                                       fetcher=fake_fetcher, retries=1, backoff=0)
+    assert set(data) == {"AAA", "FLAKY"}
+    assert calls == {"AAA": 1, "FLAKY": 2, "BAD": 2}
+    assert set(latencies) == {"AAA", "FLAKY", "BAD"}
+    assert all(v >= 0 for v in latencies.values())
+
+
+def test_fetch_price_data_per_symbol_start():
+    """不同標的可指定不同的起始日期"""
+    seen = {}
+
+    def fake_fetcher(symbol, start, end=None, timeout=None):
+        seen[symbol] = start
+        return make_frame()
+
+    fetch_price_data(["A", "B"], {"A": "2025-01-01", "B": "2021-01-01"}, fetcher=fake_fetcher)
+    assert seen == {"A": pd.Timestamp("2025-01-01"), "B": pd.Timestamp("2021-01-01")}
+
+
+def test_normalize_frame():
+    """移除多層欄位、時區與重複日期"""
+    df = make_frame(3)
+    df = pd.concat([df, df.iloc[[-1]]])
+    df.index = df.index.tz_localize("America/New_York")
+    df.columns = pd.MultiIndex.from_product([df.columns, ["AAA"]])
+    out = normalize_frame(df)
+    assert list(out.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert out.index.tz is None
+    assert out.index.is_unique and out.index.name == "Date"
+
+
+def test_process_stock_group_uses_prefetched_data(monkeypatch):
+    """process_stock_group 使用預先抓取的資料，不再個別下載"""
+    prefetched = {"^AAA": make_frame(80), "^BBB": make_frame(80)}
+    group = {"title": "測試群組", "symbols": ["^AAA", "^BBB", "^MISSING"]}
+    monkeypatch.setattr(investment_analysis, "create_ma_plot_base64", lambda *a, **k: "stub")
+    monkeypatch.setattr(investment_analysis, "get_stock_data", lambda *a, **k: pytest.fail("不應重新下載"))
+    group_res, _, market_data, _ = investment_analysis.process_stock_group(
+        group, None, pd.Timestamp("2026-01-05").to_pydatetime(), prefetched)
+    assert set(market_data.names) == {"^AAA", "^BBB"}
+    assert group_res["table_rows"].count("<tr>") == 2
@@ -32,6 +32,16 @@ def test_save_and_load_json(tmp_path):
     assert loaded_data["summary"] == summary
     assert "last_updated" in loaded_data
 
+def test_load_json_columnar(tmp_path):
+    """columnar=True 時 market 以欄式 {欄位: [值]} 回傳，可只載入指定區塊與標的"""
+    test_file = tmp_path / "test_data.json"
+    market = {"TEST": [{"Date": "2026-01-01", "Close": 100}, {"Date": "2026-01-02", "Close": 101.5}],
+              "OTHER": [{"Date": "2026-01-02", "Close": 7}]}
+    save_to_json([], {"10Y": 4.5}, market, [], filename=str(test_file))
+    loaded_data = load_from_json(str(test_file), sections=["market"], symbols=["TEST"], columnar=True)
+    assert loaded_data["market"] == {"TEST": {"Date": ["2026-01-01", "2026-01-02"], "Close": [100, 101.5]}}
+    assert "yield" not in loaded_data
+
 def test_load_non_existent_file():
     """測試讀取不存在檔案的情況"""
     data = load_from_json("non_existent_file_xyz.json")
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+from fundamentals import fetch_fundamentals, FundamentalCache, FIELD_MAP, DAY_SECONDS
+
+NOW = 1_800_000_000.0
+
+
+def make_info(pe):
+    return {"trailingPE": pe, "priceToBook": 2.0, "returnOnEquity": 0.2, "sector": "Technology"}
+
+
+def test_fresh_cache_skips_network(tmp_path):
+    """第二次執行時欄位未過期，完全不呼叫 fetcher"""
+    cache, calls = FundamentalCache(str(tmp_path)), []
+
+    def fetcher(symbol):
+        calls.append(symbol)
+        return make_info(20.0)
+
+    first = fetch_fundamentals(["AAA", "BBB"], fetcher=fetcher, cache=cache, now=NOW)
+    assert sorted(calls) == ["AAA", "BBB"] and first["AAA"]["pe_trailing"] == 20.0
+    assert set(first["AAA"]) == set(FIELD_MAP)
+    second = fetch_fundamentals(["AAA", "BBB"], fetcher=fetcher, cache=cache, now=NOW + 3600)
+    assert len(calls) == 2 and second == first
+
+
+def test_field_ttl_triggers_refresh(tmp_path):
+    """任一欄位超過設定天數即重新抓取"""
+    cache, calls = FundamentalCache(str(tmp_path)), []
+
+    def fetcher(symbol):
+        calls.append(symbol)
+        return make_info(20.0 + len(calls))
+
+    fetch_fundamentals(["AAA"], fetcher=fetcher, cache=cache, now=NOW)
+    ttl = {"default": 30, "pe_trailing": 1}
+    fetch_fundamentals(["AAA"], fetcher=fetcher, cache=cache, ttl_days={k: 30 for k in FIELD_MAP}, now=NOW + 2 * DAY_SECONDS)
+    assert len(calls) == 1
+    data = fetch_fundamentals(["AAA"], fetcher=fetcher, cache=cache, ttl_days=ttl, now=NOW + 2 * DAY_SECONDS)
+    assert len(calls) == 2 and data["AAA"]["pe_trailing"] == 22.0
+
+
+def test_failure_falls_back_to_last_good_value(tmp_path):
+    """抓取失敗或回傳空白資料時沿用快取舊值；無快取者不輸出"""
+    cache = FundamentalCache(str(tmp_path))
+    fetch_fundamentals(["AAA"], fetcher=lambda s: make_info(15.0), cache=cache, now=NOW)
+
+    def broken(symbol):
+        if symbol == "AAA":
+            return {}
+        raise ConnectionError("限流")
+
+    data = fetch_fundamentals(["AAA", "NEW"], fetcher=broken, cache=cache, now=NOW + 30 * DAY_SECONDS)
+    assert data == {"AAA": data["AAA"]} and data["AAA"]["pe_trailing"] == 15.0
+    assert cache.read("AAA")["pe_trailing"]["fetched"] == NOW
+
+
+def test_slow_fetch_serves_stale_and_revalidates(tmp_path):
+    """逾時的抓取先回傳舊值，背景完成後寫回快取"""
+    cache = FundamentalCache(str(tmp_path))
+    fetch_fundamentals(["AAA"], fetcher=lambda s: make_info(15.0), cache=cache, now=NOW)
+    release = threading.Event()
+
+    def slow(symbol):
+        release.wait(5)
+        return make_info(30.0)
+
+    data = fetch_fundamentals(["AAA"], fetcher=slow, cache=cache, timeout=0.05, now=NOW + 30 * DAY_SECONDS)
+    assert data["AAA"]["pe_trailing"] == 15.0
+    release.set()
+    for _ in range(100):
+        if cache.read("AAA")["pe_trailing"]["value"] == 30.0:
+            break
+        time.sleep(0.02)
+    assert cache.read("AAA")["pe_trailing"]["value"] == 30.0
+
+
+def test_hung_fetch_does_not_block_exit():
+    """卡住的抓取逾時後不會阻擋直譯器結束，timeout 限制了整體執行時間"""
+    script = ("import time\nfrom fundamentals import fetch_fundamentals\n"
+              "print(fetch_fundamentals(['AAA'], fetcher=lambda s: time.sleep(60), timeout=0.1))\n")
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=30,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert out.returncode == 0 and "{}" in out.stdout
+    assert time.perf_counter() - t0 < 20
+
+
+def test_offline_uses_cache_only(tmp_path):
+    """離線模式不連網，僅使用快取"""
+    cache = FundamentalCache(str(tmp_path))
+    fetch_fundamentals(["AAA"], fetcher=lambda s: make_info(15.0), cache=cache, now=NOW)
+
+    def fail(symbol):
+        raise AssertionError("離線模式不應連網")
+
+    data = fetch_fundamentals(["AAA", "BBB"], fetcher=fail, cache=cache, offline=True, now=NOW + 90 * DAY_SECONDS)
+    assert list(data) == ["AAA"]
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from investment_analysis import calculate_all_indicators, calculate_indicators_batch
+from indicators import ewm_mean, ewm_alpha, IndicatorState
+from price_store import PriceStore
+from benchmarks.synthetic import make_universe, make_ohlcv
+
+
+def test_panel_matches_per_symbol_indicators():
+    """向量化面板結果需與逐檔計算一致 (含K棒數不同、價格持平與資料過短的標的)"""
+    frames = make_universe(8, 200, ragged=True)
+    frames["FLAT"] = make_ohlcv(120, seed=42)
+    frames["FLAT"].iloc[30:70, :4] = 50.0
+    frames["SHORT"] = make_ohlcv(3, seed=7)
+    panel = calculate_indicators_batch(frames)
+    for symbol, df in frames.items():
+        expected = calculate_all_indicators(df)
+        result = panel.frame(symbol)
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-9, check_freq=False)
+    # 價格持平時乖離率需恰為 0，避免趨勢判斷受浮點誤差影響
+    assert (panel.frame("FLAT")["BIAS_20"].iloc[50:70] == 0).all()
+
+
+def test_ewm_mean_handles_nan_like_pandas():
+    """含 NaN 的輸入與 pandas ewm(adjust=False) 結果相同"""
+    values = np.array([np.nan, 1.0, 2.0, np.nan, np.nan, 5.0, 4.0, np.nan, 3.0])
+    expected = pd.Series(values).ewm(com=2, adjust=False).mean().to_numpy()
+    result = ewm_mean(values[:, None], ewm_alpha(com=2))[:, 0]
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_indicator_state_matches_batch_and_roundtrips(tmp_path):
+    """逐根更新 (含盤中覆寫最後一根與序列化還原) 的結果與批次計算一致"""
+    df = make_ohlcv(150, seed=3)
+    df.iloc[60:90, :4] = 77.0
+    expected = calculate_all_indicators(df)
+
+    state = IndicatorState.from_frame(df.iloc[:100])
+    store = PriceStore(str(tmp_path))
+    store.write_state("AAA", state.to_dict())
+    state = IndicatorState.from_dict(store.read_state("AAA"))
+
+    rows = []
+    for bar in df.iloc[100:].to_dict('records'):
+        tick = dict(bar, Close=bar['Close'] * 1.02, High=bar['High'] * 1.02)
+        state.update(tick)
+        rows.append(state.update(bar, replace_last=True))
+    result = pd.DataFrame(rows, index=df.index[100:])[expected.columns]
+    pd.testing.assert_frame_equal(result, expected.iloc[100:], check_exact=False, rtol=1e-9, check_freq=False)
@@ -60,3 +60,49 @@ def test_get_color_class():
     # None/NaN handling
     assert get_color_class(None, 80, 20) == ""
     assert get_color_class(np.nan, 80, 20) == ""
+
+def test_color_classes_matches_get_color_class():
+    values = np.array([5, -5, 0, np.nan, 85, 15, 50])
+    for high, low in ((0, 0), (80, 20)):
+        for inverse in (False, True):
+            expected = [get_color_class(None if np.isnan(v) else v, high, low, inverse) for v in values]
+            assert investment_analysis.color_classes(values, high, low, inverse).tolist() == expected
+
+def test_format_table_rows_matches_per_symbol_rows():
+    frames = {}
+    for i, symbol in enumerate(["2330.TW", "^VIX", "SPY"]):
+        dates = pd.date_range(start="2023-01-01", periods=120 - i * 30)
+        close = 100 + np.cumsum(np.sin(np.arange(len(dates)) * (0.3 + i * 0.1)))
+        frames[symbol] = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                                       "Volume": 1000 + np.arange(len(dates)) * 10.0}, index=dates)
+    panel = investment_analysis.calculate_indicators_batch(frames)
+    panel.fields["ADX"][-1, 1] = np.nan
+    html = investment_analysis.format_table_rows(panel, panel.symbols)
+    assert html.count("<tr>") == 3 and "N/A" in html
+    single = "".join(investment_analysis.format_data_row(s, panel.frame(s).iloc[-1]) for s in panel.symbols)
+    assert html.split() == single.split()
+    for symbol in panel.symbols:
+        latest = panel.frame(symbol).iloc[-1]
+        _, trend_class = determine_trend(latest["K"], latest["D"], latest["BIAS_20"])
+        assert f"badge {trend_class}" in investment_analysis.format_data_row(symbol, latest)
+
+def test_import_defers_network_and_plotting_libraries():
+    """載入模組時不載入 yfinance 與繪圖函式庫，且設定為非互動式後端"""
+    import subprocess, sys
+    code = ("import sys, os, investment_analysis; "
+            "print(sorted(m for m in ('yfinance', 'matplotlib', 'mplfinance') if m in sys.modules), os.environ['MPLBACKEND'])")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split()
+    assert out == ["[]", "Agg"]
+
+def test_missing_config_falls_back_to_defaults_until_entry_point(tmp_path, capsys):
+    from config_loader import ConfigLoader
+    before = investment_analysis.HISTORY_DAYS
+    try:
+        investment_analysis.apply_config(ConfigLoader(str(tmp_path / "missing.json")))
+        assert investment_analysis.HISTORY_DAYS == 250 and investment_analysis.STOCK_GROUPS == []
+        with pytest.raises(SystemExit):
+            investment_analysis.require_config()
+        assert "找不到設定檔" in capsys.readouterr().out
+    finally:
+        investment_analysis.apply_config()
+    assert investment_analysis.HISTORY_DAYS == before and investment_analysis.CONFIG_ERROR is None
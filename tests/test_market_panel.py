@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pytest
+
+import investment_analysis as ia
+from market_panel import MarketPanel
+from technical_data import write_technical_data
+from benchmarks.synthetic import make_universe
+
+
+@pytest.fixture(scope="module")
+def panel():
+    return ia.calculate_indicators_batch(make_universe(6, 120, ragged=True, seed=3))
+
+
+def legacy_market(panel, rows):
+    """舊版逐檔 DataFrame 轉 dict 的做法，作為比對基準"""
+    market = {}
+    for symbol in panel.symbols:
+        df = panel.frame(symbol).tail(rows).reset_index()
+        df["Date"] = df["Date"].dt.strftime("%Y-%m-%d")
+        market[symbol] = df[["Date"] + [c for c in ia.MARKET_FIELDS if c in df.columns]].to_dict(orient="list")
+    return market
+
+
+def test_json_matches_legacy_dict_path(panel, tmp_path):
+    """欄式面板寫出的 market 區塊與舊版 dict 做法的日期、欄位一致，數值差異僅在 float32 精度內"""
+    market = MarketPanel.from_panel(panel, panel.symbols, panel.symbols, 30, ia.MARKET_FIELDS)
+    new = json.load(open(write_technical_data(str(tmp_path / "new.json"), [], {}, market, [], "x"), encoding="utf-8"))["market"]
+    old = json.load(open(write_technical_data(str(tmp_path / "old.json"), [], {}, legacy_market(panel, 30), [], "x"), encoding="utf-8"))["market"]
+    assert list(new) == list(old)
+    for symbol in old:
+        assert list(new[symbol]) == list(old[symbol])
+        assert new[symbol]["Date"] == old[symbol]["Date"]
+        assert new[symbol]["Volume"] == old[symbol]["Volume"]
+        for field in old[symbol]:
+            if field == "Date":
+                continue
+            a = np.array(new[symbol][field], dtype=float)
+            b = np.array(old[symbol][field], dtype=float)
+            assert np.array_equal(np.isnan(a), np.isnan(b))
+            assert np.allclose(a, b, rtol=1e-6, atol=1e-4, equal_nan=True)
+    assert market.fields["Close"].dtype == np.float32 and market.fields["Volume"].dtype == np.float64
+
+
+def test_round_trip_and_duplicate_names(panel, tmp_path):
+    """to_dict/from_dict 還原相同陣列；多個面板中重複的名稱只寫出第一筆"""
+    market = MarketPanel.from_panel(panel, panel.symbols[:4], ["甲", "乙", "丙", "丁"], 20, ia.MARKET_FIELDS)
+    restored = MarketPanel.from_dict(json.loads(json.dumps(market.to_dict())))
+    assert restored.names == market.names and restored.lengths.tolist() == market.lengths.tolist()
+    assert np.array_equal(restored.dates, market.dates, equal_nan=True)
+    for field, values in market.fields.items():
+        assert np.array_equal(restored.fields[field], values, equal_nan=True)
+    other = MarketPanel.from_panel(panel, panel.symbols[3:], ["丁", "戊", "己"], 20, ia.MARKET_FIELDS)
+    path = write_technical_data(str(tmp_path / "t.json"), [], {}, [restored, ("庚", {"Close": [1.0]}), other], [], "x")
+    data = json.load(open(path, encoding="utf-8"))["market"]
+    assert list(data) == ["甲", "乙", "丙", "丁", "庚", "戊", "己"]
+    assert data["丁"] == json.loads(dict(market.json_entries())["丁"])
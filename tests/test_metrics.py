@@ -0,0 +1,78 @@
+import json
+import time
+import pstats
+import threading
+import metrics
+
+
+def test_stages_accumulate_and_write_json(tmp_path):
+    """同名階段累加次數與耗時，寫出的統計檔為可解析的 JSON"""
+    run = metrics.start_run("unit")
+
+    @metrics.timed("sleepy")
+    def sleepy():
+        time.sleep(0.01)
+
+    sleepy(); sleepy()
+    with metrics.stage("busy"):
+        sum(i * i for i in range(20000))
+    out = tmp_path / "out.bin"
+    out.write_bytes(b"x" * 2048)
+    run.add_bytes("busy", str(out))
+    run.record("download_per_symbol", 0.3, items={"AAA": 0.1, "BBB": 0.2})
+
+    data = json.loads(open(run.write(str(tmp_path)), encoding="utf-8").read())
+    assert data["run"] == "unit"
+    assert data["stages"]["sleepy"]["calls"] == 2 and data["stages"]["sleepy"]["wall_s"] >= 0.02
+    assert data["stages"]["busy"]["cpu_s"] > 0 and data["stages"]["busy"]["bytes_written"] == 2048
+    assert data["stages"]["download_per_symbol"]["items"] == {"AAA": 0.1, "BBB": 0.2}
+    if metrics.resource is not None:
+        assert data["process_peak_rss_mb"]["self"] > 0
+
+
+def test_stage_memory_is_growth_during_stage():
+    """各階段記錄期間內的記憶體增加量，而非整個行程的峰值"""
+    if metrics.current_rss_mb() is None:
+        return
+    run = metrics.start_run("memory")
+    with run.stage("allocate"):
+        block = bytearray(64 * 1024 * 1024)
+        block[::4096] = b"x" * len(block[::4096])
+    del block
+    with run.stage("small"):
+        sum(range(1000))
+    stages = run.to_dict()["stages"]
+    assert stages["allocate"]["rss_growth_mb"] >= 32
+    assert stages["small"]["rss_growth_mb"] < 16
+
+
+def test_profiled_merges_worker_threads(tmp_path):
+    """cProfile 結果包含以 thread_profile 記錄的工作執行緒"""
+    def marker_function_in_thread():
+        return sum(range(1000))
+
+    def worker():
+        with metrics.thread_profile():
+            marker_function_in_thread()
+
+    path = tmp_path / "run.prof"
+    with metrics.profiled(str(path)):
+        t = threading.Thread(target=worker)
+        t.start(); t.join()
+    names = {func[2] for func in pstats.Stats(str(path)).stats}
+    assert "marker_function_in_thread" in names
+
+
+def test_thread_profile_skips_when_profiler_cannot_start(tmp_path, monkeypatch):
+    """無法再啟用剖析器時 (Python 3.12+ 主剖析器已啟用) 略過執行緒剖析而不中斷執行"""
+    import cProfile
+
+    class Busy(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    with metrics.profiled(str(tmp_path / "run.prof")):
+        monkeypatch.setattr(cProfile, "Profile", Busy)
+        with metrics.thread_profile():
+            done = True
+    assert done and (tmp_path / "run.prof").exists()
@@ -0,0 +1,49 @@
+import time
+import threading
+import pytest
+from pipeline import Stage, run_pipeline
+
+
+def test_results_keep_input_order_and_stages_overlap():
+    """各階段同時進行：總耗時接近最慢階段，而非所有階段相加"""
+    def io_stage(x):
+        time.sleep(0.05)
+        return x * 2
+
+    def cpu_stage(x):
+        time.sleep(0.05)
+        return x + 1
+
+    t0 = time.perf_counter()
+    results, timings = run_pipeline(range(6), [Stage("io", io_stage), Stage("cpu", cpu_stage)])
+    wall = time.perf_counter() - t0
+    assert results == [x * 2 + 1 for x in range(6)]
+    assert set(timings) == {"io", "cpu"} and timings["io"] >= 0.25
+    assert wall < sum(timings.values()) * 0.85
+
+
+def test_each_stage_runs_in_order_on_its_own_thread():
+    """同一階段依輸入順序處理，後面的項目可讀到前面項目累積的狀態"""
+    seen, names = [], set()
+
+    def record(x):
+        seen.append(x)
+        names.add(threading.current_thread().name)
+        return x
+
+    run_pipeline(range(10), [Stage("a", lambda x: x), Stage("b", record)], maxsize=1)
+    assert seen == list(range(10)) and names == {"pipeline-b"}
+
+
+def test_error_is_raised_after_pipeline_drains():
+    """任一項目失敗時，其餘項目仍處理完畢，最後拋出該錯誤"""
+    done = []
+
+    def maybe_fail(x):
+        if x == 1:
+            raise ValueError("壞資料")
+        return x
+
+    with pytest.raises(ValueError, match="壞資料"):
+        run_pipeline(range(4), [Stage("a", maybe_fail), Stage("b", done.append)])
+    assert done == [0, 2, 3]
@@ -0,0 +1,99 @@
+import pandas as pd
+import numpy as np
+from price_store import PriceStore, merge_frames
+from data_fetcher import fetch_price_data
+
+
+def make_frame(start, n):
+    dates = pd.date_range(start=start, periods=n, name="Date")
+    close = np.arange(n, dtype=float) + 100
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': np.full(n, 1000.0)}, index=dates)
+
+
+def test_store_roundtrip(tmp_path):
+    """本地資料寫入後讀回內容一致，特殊字元代號可正常存放"""
+    store = PriceStore(str(tmp_path))
+    df = make_frame("2026-01-01", 10)
+    store.write("^VIX", df, "2025-12-01")
+    loaded, since = store.read("^VIX")
+    pd.testing.assert_frame_equal(loaded, df, check_freq=False)
+    assert since == pd.Timestamp("2025-12-01")
+    assert store.read("GC=F") == (None, None)
+
+
+def test_merge_frames_prefers_new_bars():
+    """重疊日期以新資料為準，並依日期排序"""
+    old = make_frame("2026-01-01", 5)
+    new = make_frame("2026-01-05", 3) + 50
+    merged = merge_frames(old, new)
+    assert len(merged) == 7
+    assert merged.loc["2026-01-05", "Close"] == new.loc["2026-01-05", "Close"]
+    assert merged.index.is_monotonic_increasing
+
+
+def test_incremental_fetch_and_offline(tmp_path):
+    """第二次執行僅下載倒數第二根K棒之後的資料；離線或下載失敗時改用本地資料"""
+    store = PriceStore(str(tmp_path))
+    full = make_frame("2026-01-01", 30)
+    requests = []
+
+    def fake_fetcher(symbol, start, end=None, timeout=None):
+        requests.append(pd.Timestamp(start))
+        return full[full.index >= pd.Timestamp(start)]
+
+    data, _ = fetch_price_data(["AAA"], "2026-01-01", fetcher=fake_fetcher, store=store)
+    assert len(data["AAA"]) == 30 and requests == [pd.Timestamp("2026-01-01")]
+
+    full = make_frame("2026-01-01", 32)
+    data, _ = fetch_price_data(["AAA"], "2026-01-10", fetcher=fake_fetcher, store=store)
+    assert requests[-1] == pd.Timestamp("2026-01-29")
+    assert data["AAA"].index[0] == pd.Timestamp("2026-01-10") and data["AAA"].index[-1] == pd.Timestamp("2026-02-01")
+
+    def failing_fetcher(symbol, start, end=None, timeout=None):
+        raise ConnectionError("網路中斷")
+
+    data, _ = fetch_price_data(["AAA"], "2026-01-01", fetcher=failing_fetcher, store=store, retries=0)
+    assert len(data["AAA"]) == 32
+    data, latencies = fetch_price_data(["AAA", "BBB"], "2026-01-01", fetcher=failing_fetcher, store=store, offline=True)
+    assert set(data) == {"AAA"} and latencies == {}
+
+
+def test_readjusted_history_is_refetched(tmp_path):
+    """除權息後 auto_adjust 價格整段重新調整時，重新下載完整區間並取代本地資料，不留下接縫"""
+    store = PriceStore(str(tmp_path))
+    full = make_frame("2026-01-01", 30)
+    requests = []
+
+    def fake_fetcher(symbol, start, end=None, timeout=None):
+        requests.append(pd.Timestamp(start))
+        return full[full.index >= pd.Timestamp(start)]
+
+    fetch_price_data(["AAA"], "2026-01-01", fetcher=fake_fetcher, store=store)
+    # 盤中寫入的最後一根與收盤後不同，不應觸發重新下載
+    full = make_frame("2026-01-01", 30)
+    full.loc[full.index[-1], "Close"] += 0.5
+    fetch_price_data(["AAA"], "2026-01-01", fetcher=fake_fetcher, store=store)
+    assert requests[-1] == pd.Timestamp("2026-01-29") and len(requests) == 2
+
+    # 2026-02-01 除息：之前的價格全部乘上調整因子
+    full = make_frame("2026-01-01", 32)
+    full.loc[full.index < "2026-02-01", ["Open", "High", "Low", "Close"]] *= 0.97
+    data, _ = fetch_price_data(["AAA"], "2026-01-10", fetcher=fake_fetcher, store=store)
+    assert requests[-2:] == [pd.Timestamp("2026-01-29"), pd.Timestamp("2026-01-01")]
+    pd.testing.assert_frame_equal(store.read("AAA")[0], full, check_freq=False)
+    pd.testing.assert_frame_equal(data["AAA"], full[full.index >= "2026-01-10"], check_freq=False)
+
+    # 重新下載失敗時沿用本地資料，不接上增量
+    full.loc[:, "Close"] *= 0.5
+    calls = []
+
+    def flaky_fetcher(symbol, start, end=None, timeout=None):
+        calls.append(pd.Timestamp(start))
+        if len(calls) > 1:
+            raise ConnectionError("網路中斷")
+        return full[full.index >= pd.Timestamp(start)]
+
+    before = store.read("AAA")[0]
+    data, _ = fetch_price_data(["AAA"], "2026-01-01", fetcher=flaky_fetcher, store=store, retries=0)
+    pd.testing.assert_frame_equal(data["AAA"], before)
@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import shutil
+import datetime
+
+import pandas as pd
+import pytest
+
+import investment_analysis as ia
+from providers import RecordingProvider, ReplayProvider, make_provider
+from benchmarks.synthetic import SyntheticProvider
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UTC_NOW = datetime.datetime(2026, 1, 15, 22, 30)
+
+
+def test_replay_serves_recorded_data(tmp_path):
+    """錄製的日K、基本面與執行時間可原樣回放；未錄製的標的回報錯誤"""
+    recorder = RecordingProvider(str(tmp_path), SyntheticProvider(UTC_NOW, bars=300))
+    assert recorder.now() == UTC_NOW
+    recent = recorder.prices("AAA", "2025-06-01")
+    older = recorder.prices("AAA", "2025-01-01")
+    info = recorder.info("AAA")
+
+    replay = ReplayProvider(str(tmp_path))
+    assert replay.now() == UTC_NOW
+    pd.testing.assert_frame_equal(replay.prices("AAA", "2025-06-01"), recent, check_freq=False)
+    pd.testing.assert_frame_equal(replay.prices("AAA", "2025-01-01"), older, check_freq=False)
+    assert replay.prices("AAA", "2025-01-01", "2025-02-01").index[-1] < pd.Timestamp("2025-02-01")
+    assert replay.info("AAA")["trailingPE"] == info["trailingPE"]
+    with pytest.raises(LookupError):
+        replay.prices("BBB", "2025-01-01")
+    with pytest.raises(FileNotFoundError):
+        make_provider(replay=str(tmp_path / "missing"))
+
+
+def run_main(args):
+    assert ia.main(args + ["--chart-output", "client", "--force"]) is None
+    date = UTC_NOW.astimezone(ia.TZ).strftime('%Y%m%d')
+    with open(f"report/invest_analysis_{date}.html", encoding="utf-8") as f:
+        html = f.read()
+    with open("technical_data.json", encoding="utf-8") as f:
+        data = json.load(f)
+    return html, {k: v for k, v in data.items() if k != "last_updated"}
+
+
+def test_main_record_then_replay_is_reproducible(tmp_path, monkeypatch):
+    """以 --record 錄製 (合成資料來源) 後，--replay 不連網、不使用本地快取即可重現相同的報告與技術資料"""
+    for name in ("config.json", "macro_cache.json", "templates"):
+        src = os.path.join(ROOT, name)
+        (shutil.copytree if os.path.isdir(src) else shutil.copy)(src, str(tmp_path / name))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ia, "PROVIDER", ia.PROVIDER)
+    real_make_provider = ia.make_provider
+    monkeypatch.setattr(ia, "make_provider", lambda record=None, replay=None:
+                        RecordingProvider(record, SyntheticProvider(UTC_NOW)) if record else real_make_provider(record, replay))
+
+    recorded = run_main(["--record", "recording"])
+    assert os.path.exists("recording/manifest.json") and not os.path.exists(ia.PRICE_STORE_DIR)
+    first = run_main(["--replay", "recording"])
+    second = run_main(["--replay", "recording"])
+    assert first == second == recorded
+    assert first[1]["fundamental"] and first[1]["yield_curve"]["date"] <= UTC_NOW.strftime("%Y-%m-%d")
+    assert "yfinance" not in sys.modules
@@ -0,0 +1,41 @@
+import os
+import base64
+import investment_analysis
+from report_assets import write_chart_asset, chart_src, relocate_asset_urls
+from chart_renderer import render_candlestick_png
+from benchmarks.synthetic import make_ohlcv
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+
+def test_write_chart_asset_deduplicates(tmp_path):
+    """相同圖檔以內容雜湊命名，只存一份；webp 格式可正常輸出"""
+    b64 = base64.b64encode(render_candlestick_png(make_ohlcv(40), [5])).decode()
+    url1 = write_chart_asset(b64, str(tmp_path / "assets"))
+    url2 = write_chart_asset(b64, str(tmp_path / "assets"))
+    assert url1 == url2 and url1.startswith("assets/") and url1.endswith(".png")
+    assert len(os.listdir(tmp_path / "assets")) == 1
+    assert write_chart_asset(b64, str(tmp_path / "assets"), "webp").endswith(".webp")
+
+
+def test_chart_src_and_relocation():
+    assert chart_src("assets/abc.png") == "assets/abc.png"
+    assert chart_src("iVBORw0") == "data:image/png;base64,iVBORw0"
+    assert relocate_asset_urls('<img src="assets/a.png">', "report/") == '<img src="report/assets/a.png">'
+    assert relocate_asset_urls('<a href="pages/20260101/bonds-2.html">', "report/") == '<a href="report/pages/20260101/bonds-2.html">'
+
+
+def test_external_report_mode(tmp_path, monkeypatch):
+    """external 模式下 HTML 不含 Base64 圖檔，跨日相同圖表共用同一檔案"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(investment_analysis, "TEMPLATE_DIR", TEMPLATE_DIR)
+    b64 = base64.b64encode(render_candlestick_png(make_ohlcv(40), [5])).decode()
+    report_data = [{"title": "測試", "section_id": "t", "table_rows": "", "plots": {"AAA": b64},
+                    "last_trading_date": "2026-01-02", "is_closed": False}]
+    for date in ("2026-01-02", "2026-01-03"):
+        investment_analysis.generate_html_report(report_data, date, "", b64, [], {}, {}, [], chart_output="external")
+    html = (tmp_path / "report" / "invest_analysis_20260103.html").read_text(encoding="utf-8")
+    assert "data:image/png;base64" not in html and 'src="assets/' in html
+    assert 'src="report/assets/' in (tmp_path / "index.html").read_text(encoding="utf-8")
+    assert len(os.listdir(tmp_path / "report" / "assets")) == 1
+    assert report_data[0]["plots"]["AAA"] == b64
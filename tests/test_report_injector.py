@@ -0,0 +1,60 @@
+import os
+from report_injector import inject_file, inject_text
+from update_report import build_injections
+
+REPORT = ('<nav><a href="#weekly-news-focus">財經焦點</a></nav>'
+          '<div id="us-macro-placeholder"></div><div id="tw-macro-placeholder"></div>'
+          '<img src="assets/abc.png">'
+          '<div id="weekly-news-focus"></div><!-- news-anchor -->'
+          '<div id="ai-analysis-report"></div><!-- ai-anchor --><footer>end</footer>')
+MACRO = {"US_MACRO": [{"name": "CPI", "value": "3.1%", "note": "2026-01", "trend": "up"}], "TW_MACRO": []}
+
+
+def test_inject_text_is_repeatable():
+    """首次注入取代空標籤，再次注入取代既有內容，錨點與其他內容保持不變"""
+    placeholders, regions = build_injections(MACRO, '<div id="weekly-news-focus"><p>新聞一</p></div>', "<p>分析一</p>")
+    once = inject_text(REPORT, placeholders, regions)
+    assert 'id="us-macro-table"' in once and "CPI" in once
+    assert '<div id="weekly-news-focus">\n<p>新聞一</p>\n</div><!-- news-anchor -->' in once
+    assert '<div id="ai-analysis-report">\n<p>分析一</p>\n</div><!-- ai-anchor --><footer>end</footer>' in once
+
+    _, regions = build_injections(MACRO, "<p>新聞二</p>", r"<p>C:\path 分析二</p>")
+    twice = inject_text(once, {}, regions)
+    assert "新聞一" not in twice and "<p>新聞二</p>" in twice and r"C:\path 分析二" in twice
+    assert twice.count("<!-- news-anchor -->") == 1 and twice.count('id="us-macro-table"') == 1
+
+
+def test_inject_file_writes_report_and_relocated_index(tmp_path):
+    """報告原子寫回，根目錄 index.html 的資產路徑改為 report/assets/"""
+    report, index = tmp_path / "report.html", tmp_path / "index.html"
+    report.write_text(REPORT, encoding="utf-8")
+    placeholders, regions = build_injections(MACRO, "<p>新聞</p>", "<p>分析</p>")
+    written = inject_file(str(report), placeholders, regions, index_path=str(index))
+    content, index_content = report.read_text(encoding="utf-8"), index.read_text(encoding="utf-8")
+    assert content == inject_text(REPORT, placeholders, regions)
+    assert index_content == content.replace('src="assets/', 'src="report/assets/')
+    assert written == report.stat().st_size + index.stat().st_size
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+
+
+def test_index_is_linked_when_identical(tmp_path):
+    """沒有資產路徑時 index.html 與報告內容相同，以硬連結 (或複製) 建立"""
+    report, index = tmp_path / "report.html", tmp_path / "index.html"
+    report.write_text(REPORT.replace('<img src="assets/abc.png">', ""), encoding="utf-8")
+    index.write_text("舊內容", encoding="utf-8")
+    _, regions = build_injections({}, "<p>新聞</p>", "<p>分析</p>")
+    inject_file(str(report), {}, regions, index_path=str(index))
+    assert index.read_bytes() == report.read_bytes()
+    # 再次注入時報告以新檔取代，不會透過硬連結改到 index.html 以外的檔案
+    inject_file(str(report), {}, build_injections({}, "<p>新聞二</p>", "<p>分析</p>")[1], index_path=str(index))
+    assert "新聞二" in index.read_text(encoding="utf-8")
+
+
+def test_index_relocates_page_links(tmp_path):
+    """分頁連結與資產路徑一樣於根目錄 index.html 加上 report/ 前綴"""
+    report, index = tmp_path / "report.html", tmp_path / "index.html"
+    report.write_text(REPORT.replace("<footer>", '<a href="pages/20260102/bonds-2.html">2</a><footer>'), encoding="utf-8")
+    inject_file(str(report), {}, build_injections({}, "<p>新聞</p>", "<p>分析</p>")[1], index_path=str(index))
+    index_content = index.read_text(encoding="utf-8")
+    assert 'href="report/pages/20260102/bonds-2.html"' in index_content and 'src="report/assets/abc.png"' in index_content
+    assert 'href="pages/20260102/bonds-2.html"' in report.read_text(encoding="utf-8")
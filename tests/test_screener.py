@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import IndicatorPanel
+from screener import compile_rules, evaluate, run_screener, rank_hits
+
+
+def make_panel(columns):
+    """以 {symbol: {欄位: 值序列}} 建立面板 (各標的長度可不同，靠右對齊)"""
+    frames = {s: pd.DataFrame(cols, index=pd.bdate_range("2026-01-01", periods=len(next(iter(cols.values()))), name="Date"))
+              for s, cols in columns.items()}
+    return IndicatorPanel.from_frames(frames)
+
+
+def test_compile_rules_resolves_thresholds_and_rejects_errors():
+    [rule] = compile_rules([{"name": "r", "when": [["BIAS_20", "<", "$bias20_low"]], "rank": "-BIAS_20"}], {"bias20_low": -5})
+    assert rule.conditions == [("BIAS_20", "<", -5.0)] and rule.rank_field == "BIAS_20" and not rule.descending
+    with pytest.raises(ValueError):
+        compile_rules([{"name": "r", "when": [["K", "~", "D"]]}])
+    with pytest.raises(ValueError):
+        compile_rules([{"name": "r", "when": [["K", ">", "$missing"]]}])
+
+
+def test_cross_matches_per_symbol_pandas():
+    """向量化交叉判斷與逐檔 pandas 寫法一致；前一根為 NaN 時不算交叉"""
+    rng = np.random.default_rng(1)
+    columns = {f"S{i}": {"K": rng.uniform(0, 100, 60), "D": rng.uniform(0, 100, 60)} for i in range(5)}
+    columns["S0"]["K"][:30] = np.nan
+    panel = make_panel(columns)
+    [rule] = compile_rules([{"name": "x", "when": [["K", "crosses_above", "D"]]}])
+    mask = evaluate(panel, rule, 40)
+    for j, (s, cols) in enumerate(columns.items()):
+        k, d = pd.Series(cols["K"]), pd.Series(cols["D"])
+        expected = ((k > d) & (k.shift() <= d.shift())).to_numpy()[-40:]
+        assert (mask[:, j] == expected).all(), s
+
+
+def test_hits_use_each_symbols_own_dates_and_rank():
+    """長度不同的標的各自對應日期；依最近命中、再依 rank 欄位排序並取前 top_n 名"""
+    panel = make_panel({
+        "A": {"ADX": [10, 30, 40, 20], "+DI": [1, 2, 3, 4], "-DI": [0, 0, 0, 0]},
+        "B": {"ADX": [30, 35], "+DI": [5, 5], "-DI": [1, 1]},
+        "C": {"ADX": [50, 50, 50, 50], "+DI": [0, 0, 0, 0], "-DI": [1, 1, 1, 1]},
+    })
+    rules = compile_rules([{"name": "adx", "label": "ADX", "when": [["ADX", ">", "$adx_high"], ["+DI", ">", "-DI"]], "rank": "ADX"}],
+                          {"adx_high": 25})
+    hits = {h["symbol"]: h for h in run_screener(panel, rules, lookback=3, names={"A": "甲"})}
+    assert set(hits) == {"A", "B"}
+    assert hits["A"]["name"] == "甲" and hits["A"]["bars_ago"] == 1 and hits["A"]["hits"] == 2
+    assert hits["A"]["date"] == panel.indexes["A"][2].strftime("%Y-%m-%d") and hits["A"]["value"] == 20
+    assert hits["B"]["date"] == panel.indexes["B"][1].strftime("%Y-%m-%d") and hits["B"]["bars_ago"] == 0
+    [ranked] = rank_hits(list(hits.values()), rules, top_n=1)
+    assert ranked["total"] == 2 and [h["symbol"] for h in ranked["hits"]] == ["B"]
@@ -0,0 +1,64 @@
+import os
+import pytest
+from investment_analysis import page_links
+from sharding import (parse_shard, paginate, assign, shard_path, ShardWriter, latest_shard_run, index_records,
+                      load_record)
+from technical_data import write_technical_data, read_technical_data
+
+GROUPS = [{"title": "A", "symbols": [f"A{i}" for i in range(7)]}, {"title": "B", "symbols": ["B0", "B1", "B0"]}]
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for bad in ("4/4", "x/2", "1", "-1/2"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+
+def test_pages_cover_every_symbol_once_across_shards():
+    """分頁依設定順序切割，各分片分到的分頁合起來恰好涵蓋所有標的"""
+    units = paginate(GROUPS, page_size=3)
+    assert [(u["group"], u["page"], u["pages"]) for u in units] == [(0, 0, 3), (0, 1, 3), (0, 2, 3), (1, 0, 1)]
+    assert units[1]["symbols"] == ["A3", "A4", "A5"] and units[3]["symbols"] == ["B0", "B1"]
+    shards = [assign(units, i, 3) for i in range(3)]
+    assert sorted(s for shard in shards for u in shard for s in u["symbols"]) == sorted(["B0", "B1"] + GROUPS[0]["symbols"])
+    assert [len(shard) for shard in shards] == [2, 1, 1]
+
+
+def test_shard_files_visible_only_when_complete(tmp_path):
+    """未 close 的分片不被視為完成；索引不含大型欄位，可依位移讀回完整紀錄"""
+    root = str(tmp_path)
+    first = ShardWriter(shard_path(root, "2026-01-02", 0, 2))
+    first.write({"kind": "group", "group": 0, "page": 0, "pages": 1, "summary": [], "market": {"甲": {"Close": [1.0]}}})
+    first.write({"kind": "yield", "data": {"3M": 4.0}, "plot": "iVBOR"})
+    first.close()
+    second = ShardWriter(shard_path(root, "2026-01-02", 1, 2))
+    assert latest_shard_run(root) == (os.path.join(root, "20260102"), 2, [1])
+    second.close()
+    run_dir, count, missing = latest_shard_run(root)
+    assert missing == []
+
+    entries = index_records(run_dir, count)
+    assert [meta for _, _, meta in entries] == [{"kind": "group", "group": 0, "page": 0, "pages": 1, "summary": []},
+                                                {"kind": "yield", "data": {"3M": 4.0}}]
+    assert load_record(*entries[1][:2])["plot"] == "iVBOR"
+    assert not [f for f in os.listdir(run_dir) if f.endswith(".tmp")]
+
+
+def test_market_written_from_iterator(tmp_path):
+    """market 可逐檔以迭代器提供，結果與字典相同"""
+    market = {"甲": {"Close": [1.23456, float("nan")]}, "乙": {"Close": [2.0, 3.0]}}
+    a, b = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    write_technical_data(a, [], {}, market, [], "t")
+    write_technical_data(b, [], {}, iter(market.items()), [], "t")
+    assert open(a, encoding="utf-8").read() == open(b, encoding="utf-8").read()
+    assert read_technical_data(b, columnar=True)["market"]["甲"] == {"Close": [1.2346, None]}
+
+
+def test_page_links():
+    """第一頁為完整報告中的群組區塊，其餘為 report/pages/<日期>/ 下的分頁檔"""
+    from_main = page_links("2026-01-02", "bonds", 3, 1)
+    assert [l["href"] for l in from_main] == ["#bonds", "pages/20260102/bonds-2.html", "pages/20260102/bonds-3.html"]
+    assert [l["current"] for l in from_main] == [True, False, False]
+    from_page = page_links("2026-01-02", "bonds", 3, 2)
+    assert [l["href"] for l in from_page] == ["../../invest_analysis_20260102.html#bonds", "bonds-2.html", "bonds-3.html"]
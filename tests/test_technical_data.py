@@ -0,0 +1,65 @@
+import json
+import math
+from technical_data import write_technical_data, read_technical_data, records_to_columns, columns_to_records
+from update_report import latest_market_value
+
+FUNDAMENTAL = [{"symbol": "AAA", "pe": 15.123456}]
+YIELDS = {"3M": 4.1, "10Y": 4.5}
+SUMMARY = [{"symbol": "標普 500", "close": 5000.0, "change": 0.5}]
+MARKET = {
+    "恐慌指數": [{"Date": "2026-01-01", "Close": 18.123456789, "Volume": 0.0},
+                 {"Date": "2026-01-02", "Close": 21.5, "Volume": 0.0}],
+    "標普 500": {"Date": ["2026-01-01", "2026-01-02"], "Close": [5000.0, float("nan")], "Volume": [1.5e9, 1.6e9]},
+}
+
+
+def test_columnar_file_is_valid_json_and_rounded(tmp_path):
+    """新格式整份仍為合法 JSON，數值固定精度、NaN 轉為 null、整數不帶小數點"""
+    path = write_technical_data(str(tmp_path / "t.json"), FUNDAMENTAL, YIELDS, MARKET, SUMMARY, "2026-01-02 08:00:00")
+    data = json.load(open(path, encoding="utf-8"))
+    assert data["format"] == "columnar-v1" and data["yield"] == YIELDS
+    assert data["market"]["恐慌指數"]["Close"] == [18.1235, 21.5]
+    assert data["market"]["標普 500"]["Close"] == [5000, None]
+    assert data["market"]["標普 500"]["Volume"] == [1500000000, 1600000000]
+
+
+def test_lazy_sections_and_symbols(tmp_path):
+    """只讀取指定區塊與標的"""
+    path = write_technical_data(str(tmp_path / "t.json"), FUNDAMENTAL, YIELDS, MARKET, SUMMARY, "x")
+    data = read_technical_data(path, sections=["yield", "market"], symbols=["恐慌指數"])
+    assert set(data) == {"format", "last_updated", "yield", "market"}
+    assert list(data["market"]) == ["恐慌指數"]
+    assert data["market"]["恐慌指數"] == [{"Date": "2026-01-01", "Close": 18.1235, "Volume": 0},
+                                        {"Date": "2026-01-02", "Close": 21.5, "Volume": 0}]
+    assert latest_market_value(data, "恐慌指數", "Close") == 21.5
+    only_summary = read_technical_data(path, sections=["summary"])
+    assert only_summary["summary"] == SUMMARY and "market" not in only_summary
+
+
+def test_gzip_encoding_replaces_plain_file(tmp_path):
+    """gzip 編碼寫入 .gz 並移除舊的未壓縮檔，以原檔名即可讀取"""
+    base = str(tmp_path / "t.json")
+    write_technical_data(base, FUNDAMENTAL, YIELDS, MARKET, SUMMARY, "x")
+    written = write_technical_data(base, FUNDAMENTAL, YIELDS, MARKET, SUMMARY, "x", encoding="gzip")
+    assert written == base + ".gz" and not (tmp_path / "t.json").exists()
+    assert read_technical_data(base)["fundamental"] == [{"symbol": "AAA", "pe": 15.123456}]
+
+
+def test_reads_legacy_row_format(tmp_path):
+    """舊版 indent=2 列式檔案仍可讀取，預設原樣回傳列式，columnar=True 時轉為欄式"""
+    path = tmp_path / "old.json"
+    legacy = {"fundamental": FUNDAMENTAL, "yield": YIELDS, "market": {"恐慌指數": MARKET["恐慌指數"]},
+              "summary": SUMMARY, "last_updated": "x"}
+    path.write_text(json.dumps(legacy, ensure_ascii=False, indent=2), encoding="utf-8")
+    assert read_technical_data(str(path))["market"] == legacy["market"]
+    data = read_technical_data(str(path), sections=["yield", "market"], columnar=True)
+    assert "summary" not in data and data["yield"] == YIELDS
+    assert columns_to_records(data["market"]["恐慌指數"]) == MARKET["恐慌指數"]
+    assert latest_market_value({"market": legacy["market"]}, "恐慌指數", "Close") == 21.5
+
+
+def test_records_columns_roundtrip_with_missing_keys():
+    """列式欄位不一致時以 None 補齊"""
+    cols = records_to_columns([{"a": 1}, {"a": 2, "b": 3}, {"b": 4}])
+    assert cols == {"a": [1, 2, None], "b": [None, 3, 4]}
+    assert all(not (isinstance(v, float) and math.isnan(v)) for v in cols["a"])
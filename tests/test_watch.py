@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import shutil
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+import investment_analysis as ia
+from watch import Watcher, StandInFeed, last_bar, run_watch, LIVE_JSON, LIVE_HTML
+from price_store import PriceStore
+from providers import RecordingProvider, YahooProvider
+from benchmarks.synthetic import make_ohlcv, SyntheticProvider
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIELDS = ["K", "D", "RSI", "MACD", "BIAS_20", "ADX", "5MA", "Change %"]
+
+
+class ScriptedFeed:
+    """依序回傳預先指定的報價，並記錄同時進行的最大請求數"""
+
+    def __init__(self, quotes, delay=0.0):
+        self.quotes = quotes
+        self.delay = delay
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def quote(self, symbol):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if symbol not in self.quotes:
+            raise ConnectionError("逾時")
+        return dict(self.quotes[symbol])
+
+
+def expected(df, bar):
+    """以批次計算驗證：將報價覆寫 (或新增) 為最後一根後重新計算全部歷史"""
+    date = pd.Timestamp(bar["Date"])
+    df = df.copy()
+    df.loc[date, list(bar)[1:]] = [bar[k] for k in list(bar)[1:]]
+    return ia.calculate_all_indicators(df.sort_index()).iloc[-1]
+
+
+def test_quotes_update_only_changed_symbols(tmp_path):
+    """同日報價覆寫最後一根、較新日期的報價新增一根，指標與批次計算一致；未變動的標的不重算"""
+    frames = {s: make_ohlcv(120, seed=i) for i, s in enumerate(["AAA", "BBB", "CCC"])}
+    same_day = dict(last_bar(frames["AAA"]), Close=frames["AAA"]["Close"].iloc[-1] * 1.03, High=frames["AAA"]["High"].iloc[-1] * 1.05)
+    next_day = {"Date": (frames["BBB"].index[-1] + pd.offsets.BDay()).strftime("%Y-%m-%d"),
+                "Open": 100.0, "High": 103.0, "Low": 99.0, "Close": 102.0, "Volume": 5000.0}
+    feed = ScriptedFeed({"AAA": same_day, "BBB": next_day, "CCC": last_bar(frames["CCC"])})
+    watcher = Watcher(frames, feed, max_workers=2, key_symbols=["BBB", "ZZZ"])
+    before = dict(watcher.records)
+
+    stats = watcher.run_cycle(str(tmp_path))
+    assert stats["polled"] == 3 and stats["changed"] == 2 and not stats["errors"]
+    assert watcher.records["CCC"] is before["CCC"] and watcher.records["AAA"] is not before["AAA"]
+    for symbol, bar in (("AAA", same_day), ("BBB", next_day)):
+        want = expected(frames[symbol], bar)
+        got = watcher.states[symbol].latest
+        assert np.allclose([got[f] for f in FIELDS], want[FIELDS].astype(float), rtol=1e-9, equal_nan=True)
+
+    # 同一報價再次輪詢時不重算；之後覆寫同一根仍與批次計算一致
+    assert watcher.run_cycle(str(tmp_path))["changed"] == 0
+    feed.quotes["BBB"] = dict(next_day, Close=98.5, Low=98.0)
+    assert watcher.run_cycle(str(tmp_path))["changed"] == 1
+    want = expected(frames["BBB"], feed.quotes["BBB"])
+    assert np.allclose([watcher.states["BBB"].latest[f] for f in FIELDS], want[FIELDS].astype(float), rtol=1e-9, equal_nan=True)
+
+    data = json.load(open(tmp_path / LIVE_JSON, encoding="utf-8"))
+    assert data["cycle"] == 3 and [i["orig_symbol"] for i in data["summary"]] == ["BBB"]
+    assert data["symbols"]["BBB"]["date"] == next_day["Date"] and data["symbols"]["BBB"]["Close"] == 98.5
+    html = open(tmp_path / LIVE_HTML, encoding="utf-8").read()
+    assert html.count("<tr>") == 4 and "summary-card" in html and "<img" not in html
+
+
+def test_polling_is_bounded_and_failures_are_reported(tmp_path):
+    """同時進行的報價請求不超過 max_workers；失敗的標的保留上次數值並列入錯誤"""
+    frames = {f"S{i}": make_ohlcv(60, seed=i) for i in range(8)}
+    quotes = {s: last_bar(df) for s, df in list(frames.items())[:6]}
+    feed = ScriptedFeed(quotes, delay=0.02)
+    watcher = Watcher(frames, feed, max_workers=3)
+    stats = watcher.run_cycle(str(tmp_path))
+    assert feed.peak == 3 and set(stats["errors"]) == {"S6", "S7"} and stats["changed"] == 0
+    assert stats["poll_cost_s"] >= 8 * 0.02 and stats["poll_s"] < stats["poll_cost_s"]
+
+
+def test_standin_feed_is_deterministic():
+    bars = {"AAA": last_bar(make_ohlcv(30))}
+    a, b = StandInFeed(bars, seed=1, move_prob=1.0), StandInFeed(bars, seed=1, move_prob=1.0)
+    first = [a.quote("AAA") for _ in range(3)]
+    assert first == [b.quote("AAA") for _ in range(3)] and first[0]["Close"] != bars["AAA"]["Close"]
+
+
+def test_main_watch_with_replay(tmp_path, monkeypatch):
+    """--watch 搭配 --replay 錄製資料，執行指定輪數後結束並寫出即時片段"""
+    for name in ("config.json", "macro_cache.json", "templates"):
+        src = os.path.join(ROOT, name)
+        (shutil.copytree if os.path.isdir(src) else shutil.copy)(src, str(tmp_path / name))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ia, "PROVIDER", ia.PROVIDER)
+    recorder = RecordingProvider("recording", SyntheticProvider(datetime.datetime(2026, 1, 15, 22, 30), bars=400))
+    recorder.now()
+    for symbol in dict.fromkeys(s for g in ia.STOCK_GROUPS for s in g["symbols"]):
+        recorder.prices(symbol, "2024-01-01")
+
+    assert ia.main(["--replay", "recording", "--watch", "--watch-cycles", "2", "--watch-interval", "0"]) == 0
+    data = json.load(open(os.path.join(ia.WATCH_OUTPUT_DIR, LIVE_JSON), encoding="utf-8"))
+    assert data["cycle"] == 2 and len(data["symbols"]) == len({s for g in ia.STOCK_GROUPS for s in g["symbols"]})
+    assert [i["orig_symbol"] for i in data["summary"]] == [s for s in ia.KEY_INDICATORS if s in data["symbols"]]
+    assert all(v["date"] == "2026-01-15" for v in data["symbols"].values())
+
+
+def test_watch_offline_reads_store_only(tmp_path, monkeypatch):
+    """--offline --watch 的歷史與每輪報價都只讀本地價格資料庫，不連網；資料庫更新後下一輪即反映"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ia, "KEY_INDICATORS", [])
+    monkeypatch.setattr(ia, "STOCK_GROUPS", [{"symbols": ["AAA", "BBB"]}])
+    monkeypatch.setattr(ia, "TEMPLATE_DIR", os.path.join(ROOT, "templates"))
+    monkeypatch.setattr(ia, "PRICE_STORE_DIR", str(tmp_path / "prices"))
+    provider = YahooProvider()
+    def no_network(*args, **kwargs):
+        raise AssertionError("offline 模式不應連網")
+    monkeypatch.setattr(provider, "prices", no_network)
+    store = PriceStore(ia.PRICE_STORE_DIR)
+    start = (provider.now() - datetime.timedelta(days=200)).strftime("%Y-%m-%d")
+    for seed, symbol in enumerate(("AAA", "BBB")):
+        df = make_ohlcv(120, seed=seed, start=start)
+        store.write(symbol, df, df.index[0])
+
+    def update_store(_):
+        df, since = store.read("AAA")
+        df.iloc[-1, df.columns.get_loc("Close")] *= 1.05
+        store.write("AAA", df, since)
+
+    args = ia.parse_args(["--offline", "--watch", "--watch-cycles", "2", "--watch-interval", "0"])
+    assert run_watch(args, provider, sleep=update_store) == 0
+    data = json.load(open(os.path.join(ia.WATCH_OUTPUT_DIR, LIVE_JSON), encoding="utf-8"))
+    df, _ = store.read("AAA")
+    assert data["cycle"] == 2 and data["symbols"]["AAA"]["Close"] == round(float(df["Close"].iloc[-1]), 4)
+
+
+def test_watcher_resumes_saved_indicator_state(tmp_path):
+    """指標狀態與價格資料一同保存：下次啟動只重播保存日期 (含，盤中數值以收盤覆寫) 之後的K棒；歷史重新調整時整段重播"""
+    store = PriceStore(str(tmp_path))
+    full = make_ohlcv(200, seed=4)
+    intraday = full.iloc[:180].copy()
+    intraday.iloc[-1, intraday.columns.get_loc("Close")] *= 1.03
+    first = Watcher({"AAA": intraday}, StandInFeed({}), store=store)
+    assert first.replayed == 180 and store.read_state("AAA")["date"] == f"{full.index[179]:%Y-%m-%d}"
+
+    second = Watcher({"AAA": full}, StandInFeed({}), store=store)
+    assert second.replayed == 21
+    batch = ia.calculate_all_indicators(full).iloc[-1]
+    for field in FIELDS:
+        assert np.isclose(second.states["AAA"].latest[field], batch[field], rtol=1e-9, equal_nan=True)
+    assert Watcher({"AAA": full}, StandInFeed({}), store=store).replayed == 1
+
+    adjusted = full.copy()
+    adjusted.iloc[:, :4] *= 0.97
+    assert Watcher({"AAA": adjusted}, StandInFeed({}), store=store).replayed == 200
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from yield_curve import YieldCurve, run_lengths, rolling_percentile
+from update_report import yield_spread_comments
+
+
+def make_frames():
+    """3M 在第 3~5 與第 8~9 根K棒高於 10Y (倒掛兩次，最近一次持續到最後)，30Y 缺少第 2 根"""
+    idx = pd.bdate_range("2026-01-01", periods=9, name="Date")
+    short = [4.0, 4.0, 4.6, 4.7, 4.8, 4.2, 4.1, 4.6, 4.7]
+    return {
+        "^IRX": pd.DataFrame({"Close": short}, index=idx),
+        "^TNX": pd.DataFrame({"Close": [4.5] * 9}, index=idx),
+        "^TYX": pd.DataFrame({"Close": [5.0] * 9}, index=idx).drop(idx[1]),
+    }
+
+
+def test_run_lengths_and_percentile():
+    mask = np.array([[0, 1], [1, 1], [1, 0], [0, 1]], dtype=bool)
+    assert run_lengths(mask).tolist() == [[0, 1], [1, 2], [2, 0], [0, 1]]
+    values = np.array([[1.0], [3.0], [2.0], [np.nan], [4.0]])
+    pct = rolling_percentile(values, 3)
+    assert np.isnan(pct[:2]).all() and abs(pct[2, 0] - 200 / 3) < 1e-9 and np.isnan(pct[3, 0]) and pct[4, 0] == 100
+
+
+def test_analysis_spreads_and_inversions():
+    """各天期組合的利差、連續與最長倒掛、倒掛次數；缺值的天期以前一日補齊，缺少的天期略過"""
+    curve = YieldCurve.from_frames(make_frames())
+    assert curve.labels == ["3M", "10Y", "30Y"] and curve.latest() == {"3M": 4.7, "10Y": 4.5, "30Y": 5.0}
+    result = curve.analysis(window=5)
+    assert list(result["spreads"]) == ["10Y-3M", "30Y-3M", "30Y-10Y"]
+    s = result["spreads"]["10Y-3M"]
+    assert s["status"] == "倒掛" and s["value"] == -0.2
+    assert s["inverted_bars"] == 2 and s["inverted_since"] == "2026-01-12"
+    assert s["longest_inversion"] == 3 and s["inversions"] == 2 and s["last_inverted"] == "2026-01-13"
+    assert s["percentile"] == 40.0
+    assert result["spreads"]["30Y-10Y"] == dict(result["spreads"]["30Y-10Y"], status="正常", inverted_bars=0,
+                                                inverted_since=None, inversions=0, last_inverted=None)
+
+
+def test_ai_comments_use_history_with_fallback():
+    """AI 分析文字使用倒掛期間與百分位；舊版資料僅有最新殖利率時仍以三組利差判斷"""
+    curve = YieldCurve.from_frames(make_frames()).analysis(window=5)
+    comments = yield_spread_comments({"yield_curve": curve})
+    assert len(comments) == 1 and "已連續倒掛 2 個交易日，自 2026-01-12 起" in comments[0] and "40% 分位" in comments[0]
+    assert yield_spread_comments({"yield": {"3M": 4.7, "10Y": 4.5, "30Y": 5.0}}) == [
+        "10Y-3M 利差僅 -0.20% (倒掛)"]
+    assert yield_spread_comments({"yield": {"3M": 4.7}}) is None
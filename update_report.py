@@ -2,9 +2,15 @@ import os
 import datetime
 import json
 import re
+import argparse
+import metrics
+from report_injector import inject_file
+from technical_data import read_technical_data
+from archive import ReportArchive, configured_path
 
 # --- Cache Management ---
 CACHE_FILE = "macro_cache.json"
+VIX_NAME = "恐慌指數"
 
 def load_cache():
     if os.path.exists(CACHE_FILE):
@@ -16,10 +22,14 @@ def save_cache(cache_data):
     with open(CACHE_FILE, "w", encoding="utf-8") as f:
         json.dump(cache_data, f, ensure_ascii=False, indent=4)
 
-def get_latest_report_file():
-    reports = [f for f in os.listdir("report") if f.startswith("invest_analysis_") and f.endswith(".html")]
-    if not reports: return None
-    return os.path.join("report", sorted(reports)[-1])
+def get_latest_report_file(report_dir="report", archive_path=None):
+    """最新一份報告：預設直接列出報告目錄；指定 archive_path 時改由歸檔索引查詢 (目錄有變動時才重新掃描並更新索引)"""
+    if not os.path.isdir(report_dir): return None
+    if archive_path is None:
+        reports = [f for f in os.listdir(report_dir) if f.startswith("invest_analysis_") and f.endswith(".html")]
+        return os.path.join(report_dir, sorted(reports)[-1]) if reports else None
+    with ReportArchive(archive_path) as archive:
+        return archive.latest_report(report_dir) or archive.sync_reports(report_dir)
 
 def extract_data_from_html(html_content):
     data = {}
@@ -35,39 +45,63 @@ def extract_data_from_html(html_content):
             except: data[key] = {}
     return data
 
-def load_from_json(filename="technical_data.json"):
-    """從 JSON 檔案載入分析所需數據"""
-    if os.path.exists(filename):
+def load_from_json(filename="technical_data.json", sections=None, symbols=None, columnar=False):
+    """從 JSON 檔案載入分析所需數據 (可只載入指定區塊與標的；新舊格式與 .gz 皆可讀取)
+
+    market 預設為列式 {名稱: [{欄位: 值}]}；columnar=True 時為欄式 {名稱: {欄位: [值]}}。
+    """
+    if os.path.exists(filename) or os.path.exists(filename + ".gz"):
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return read_technical_data(filename, sections=sections, symbols=symbols, columnar=columnar)
         except Exception as e:
             print(f"[Warning] 讀取 {filename} 失敗: {e}")
     return None
 
+def latest_market_value(market_info, name, field, default=None):
+    """取得某標的最新一筆欄位值 (相容欄式與舊版列式資料)"""
+    entry = (market_info.get("market") or {}).get(name)
+    if not entry: return default
+    values = entry.get(field) if isinstance(entry, dict) else [row.get(field) for row in entry]
+    values = [v for v in (values or []) if v is not None]
+    return values[-1] if values else default
+
+def describe_spread(pair, s):
+    """單一利差的說明文字：數值、狀態，以及倒掛持續期間與歷史百分位 (有統計資料時)"""
+    text = f"{pair} 利差僅 {s['value']:.2f}% ({s['status']}"
+    if s.get("inverted_bars"):
+        text += f"，已連續倒掛 {s['inverted_bars']} 個交易日，自 {s['inverted_since']} 起"
+    if s.get("percentile") is not None:
+        text += f"，位於近 {s['window']} 日的 {s['percentile']:.0f}% 分位"
+    return text + ")"
+
+def yield_spread_comments(market_info):
+    """殖利率曲線警訊：倒掛或趨平的利差說明清單
+
+    有 yield_curve 區塊 (各天期利差的倒掛期間與百分位) 時使用之，否則由最新殖利率計算 10Y-3M、30Y-10Y、30Y-3M。
+    """
+    curve = market_info.get("yield_curve")
+    if curve and curve.get("spreads"):
+        spreads = curve["spreads"]
+    else:
+        yields = market_info.get("yield") or {}
+        y3m, y10y, y30y = yields.get("3M"), yields.get("10Y"), yields.get("30Y")
+        if not (y3m and y10y and y30y): return None
+        spreads = {pair: {"value": val, "status": "倒掛" if val < 0 else "趨平" if abs(val) < 0.25 else "正常"}
+                   for pair, val in {"10Y-3M": y10y - y3m, "30Y-10Y": y30y - y10y, "30Y-3M": y30y - y3m}.items()}
+    window = (curve or {}).get("window")
+    return [describe_spread(pair, dict(s, window=window)) for pair, s in spreads.items() if s["status"] != "正常"]
+
 def generate_dynamic_ai_analysis(market_info, macro_data):
-    yields = market_info.get("yield", {})
-    y3m, y10y, y30y = yields.get("3M"), yields.get("10Y"), yields.get("30Y")
-    
     atlas_text = "目前全球市場關注聯準會對通膨數據的反應。"
-    if y3m and y10y and y30y:
-        spreads = {"10Y-3M": y10y - y3m, "30Y-10Y": y30y - y10y, "30Y-3M": y30y - y3m}
-        yield_comments = []
-        trigger = False
-        for pair, val in spreads.items():
-            if val < 0 or abs(val) < 0.25:
-                trigger = True
-                status = "倒掛" if val < 0 else "趨平"
-                yield_comments.append(f"{pair} 利差僅 {val:.2f}% ({status})")
-        if trigger:
+    yield_comments = yield_spread_comments(market_info)
+    if yield_comments is not None:
+        if yield_comments:
             atlas_text += f" 值得注意的是，殖利率曲線出現警訊：{', '.join(yield_comments)}，顯示市場對長線成長與流動性有所顧慮。"
         else:
             dxy = next((x for x in macro_data.get("US_MACRO", []) if "DXY" in x['name']), None)
             if dxy: atlas_text += f" 目前美元指數 (DXY) 報 {dxy['value']}，整體流動性環境仍是宏觀調控的核心。"
 
-    vix_val = 20
-    vix_data = market_info.get("market", {}).get("恐慌指數", [])
-    if vix_data: vix_val = vix_data[-1].get("Close", 20)
+    vix_val = latest_market_value(market_info, VIX_NAME, "Close", 20)
     sentiment_status = "市場情緒偏向謹慎" if vix_val > 20 else "市場情緒相對穩定"
     
     return f"""
@@ -99,8 +133,42 @@ def generate_macro_table(data, region_id):
     html += '</tbody></table>'
     return html
 
-def main():
-    report_file = get_latest_report_file()
+NEWS_ID, NEWS_ANCHOR = 'weekly-news-focus', '<!-- news-anchor -->'
+AI_ID, AI_ANCHOR = 'ai-analysis-report', '<!-- ai-anchor -->'
+
+def clean_news_content(news_content):
+    """整理新聞焦點內容：移除重複的 id 與外層容器"""
+    # 移除 news_content 中重複的 id 屬性，避免多層卡片樣式疊加
+    news_content = news_content.replace(f'id="{NEWS_ID}"', '')
+    
+    # 僅當內容被外層容器包裹時才移除 (向下相容)
+    if f'<div >' in news_content: # 如果 id 已經被移除了，這裡會變成 <div >
+        news_content = re.sub(r'^<div >', '', news_content)
+        news_content = re.sub(r'</div>$', '', news_content).strip()
+    return news_content
+
+def clean_ai_content(ai_content):
+    """整理 AI 分析內容：移除外層容器"""
+    # 僅當內容被外層容器包裹時才移除
+    if f'<div id="{AI_ID}"' in ai_content:
+        ai_content = re.sub(rf'^<div id="{AI_ID}">', '', ai_content)
+        ai_content = re.sub(r'</div>$', '', ai_content).strip()
+    return ai_content
+
+def build_injections(macro_cache, news_content, ai_content):
+    """回傳 (placeholders, regions)：巨集表格取代空標籤，新聞與 AI 分析以錨點定位整段取代 (可重複執行)"""
+    placeholders = {
+        '<div id="us-macro-placeholder"></div>': generate_macro_table(macro_cache.get("US_MACRO", []), "us-macro-table"),
+        '<div id="tw-macro-placeholder"></div>': generate_macro_table(macro_cache.get("TW_MACRO", []), "tw-macro-table"),
+    }
+    regions = {
+        f'<div id="{NEWS_ID}">': (NEWS_ANCHOR, clean_news_content(news_content)),
+        f'<div id="{AI_ID}">': (AI_ANCHOR, clean_ai_content(ai_content)),
+    }
+    return placeholders, regions
+
+def run_update(use_archive=False):
+    report_file = get_latest_report_file(archive_path=configured_path() if use_archive else None)
     if not report_file: 
         print("[Error] No report file found in report/ directory.")
         return
@@ -125,61 +193,36 @@ def main():
             return
 
     # 優先從 JSON 讀取
-    market_info = load_from_json()
-    if not market_info:
-        # 如果 JSON 不存在, 才從 HTML 抓 (保持向下相容)
-        with open(report_file, "r", encoding="utf-8") as f: content = f.read()
-        market_info = extract_data_from_html(content)
-    
-    with open(report_file, "r", encoding="utf-8") as f: content = f.read()
-    macro_cache = load_cache()
-    
-    content = content.replace('<div id="us-macro-placeholder"></div>', generate_macro_table(macro_cache.get("US_MACRO", []), "us-macro-table"))
-    content = content.replace('<div id="tw-macro-placeholder"></div>', generate_macro_table(macro_cache.get("TW_MACRO", []), "tw-macro-table"))
-    
-    # --- Inject AI News ---
-    with open("news.html", "r", encoding="utf-8") as f: news_content = f.read().strip()
-    news_id = 'weekly-news-focus'
-    
-    # 移除 news_content 中重複的 id 屬性，避免多層卡片樣式疊加
-    news_content = news_content.replace(f'id="{news_id}"', '')
-    
-    # 僅當內容被外層容器包裹時才移除 (向下相容)
-    if f'<div >' in news_content: # 如果 id 已經被移除了，這裡會變成 <div >
-        news_content = re.sub(r'^<div >', '', news_content)
-        news_content = re.sub(r'</div>$', '', news_content).strip()
-    
-    # 使用更穩健的替換邏輯：匹配 div 並利用 anchor 標籤定位
-    if f'id="{news_id}"' in content:
-        # 使用錨點 <!-- news-anchor --> 作為精準匹配終點
-        pattern_news = rf'(<div id="{news_id}">).*?(?=<!-- news-anchor -->)'
-        if re.search(pattern_news, content, re.DOTALL):
-            content = re.sub(pattern_news, f'\\1\n{news_content}\n</div>', content, flags=re.DOTALL)
-        else:
-            # 如果是初次生成的空標籤
-            content = content.replace(f'<div id="{news_id}"></div>', f'<div id="{news_id}">\n{news_content}\n</div>')
+    with metrics.stage("load_data"):
+        market_info = load_from_json(sections=["yield", "yield_curve", "market"], symbols=[VIX_NAME], columnar=True)
+        if not market_info:
+            # 如果 JSON 不存在, 才從 HTML 抓 (保持向下相容)
+            with open(report_file, "r", encoding="utf-8") as f: market_info = extract_data_from_html(f.read())
+        macro_cache = load_cache()
+        with open("news.html", "r", encoding="utf-8") as f: news_content = f.read().strip()
+        with open("ai.html", "r", encoding="utf-8") as f: ai_content = f.read().strip()
 
-    # --- Inject AI Analysis ---
-    with open("ai.html", "r", encoding="utf-8") as f: ai_content = f.read().strip()
-    ai_id = 'ai-analysis-report'
-    
-    # 僅當內容被外層容器包裹時才移除
-    if f'<div id="{ai_id}"' in ai_content:
-        ai_content = re.sub(rf'^<div id="{ai_id}">', '', ai_content)
-        ai_content = re.sub(r'</div>$', '', ai_content).strip()
-    
-    if f'id="{ai_id}"' in content:
-        # 使用錨點 <!-- ai-anchor --> 作為精準匹配終點
-        pattern_ai = rf'(<div id="{ai_id}">).*?(?=<!-- ai-anchor -->)'
-        if re.search(pattern_ai, content, re.DOTALL):
-            content = re.sub(pattern_ai, f'\\1\n{ai_content}\n</div>', content, flags=re.DOTALL)
-        else:
-            content = content.replace(f'<div id="{ai_id}"></div>', f'<div id="{ai_id}">\n{ai_content}\n</div>')
-
-    with open(report_file, "w", encoding="utf-8") as f: f.write(content)
-    import shutil
-    shutil.copy2(report_file, "index.html")
+    # 一次掃描報告中的所有插入點，串流寫回報告並同步根目錄 index.html (資產路徑改為 report/assets/)
+    with metrics.stage("inject"):
+        placeholders, regions = build_injections(macro_cache, news_content, ai_content)
+        written = inject_file(report_file, placeholders, regions, index_path="index.html", asset_prefix="report/")
+    metrics.current().add_bytes("inject", written)
     print(f"[Success] Done.")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="將巨集數據、新聞與 AI 分析注入最新報告")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH",
+                        help="以 cProfile 記錄本次執行並輸出 .prof 檔 (未指定路徑時存於 metrics 目錄)")
+    parser.add_argument("--archive", action="store_true",
+                        help="由歸檔索引查詢最新報告 (報告目錄檔案很多時較快)")
+    args = parser.parse_args(argv)
+    run = metrics.start_run("update_report")
+    profile_path = args.profile
+    if profile_path == "":
+        profile_path = os.path.join(metrics.DEFAULT_METRICS_DIR, f"update_report_{datetime.datetime.fromtimestamp(run.started):%Y%m%d_%H%M%S}.prof")
+    with metrics.profiled(profile_path):
+        run_update(args.archive)
+    print(f"[Info] 執行統計已儲存至 {run.write()}")
+
 if __name__ == "__main__":
     main()
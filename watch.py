@@ -0,0 +1,246 @@
+"""盤中監看模式：定期只輪詢各標的最新報價，覆寫記憶體中的最後一根K棒並逐根更新指標，寫出輕量的即時 JSON/HTML 片段
+
+不重新下載歷史、不重繪K線圖，也不重新產生完整報告；只有報價變動的標的會更新指標與表格列，
+摘要卡片 (key_indicators) 每輪依最新數值重建。每輪回報輪詢成本 (各標的耗時) 與刷新延遲 (自開始輪詢到寫出檔案)。
+由 investment_analysis.py --watch 啟動；--watch-feed standin 改用本地替代報價，不需連網；
+搭配 --offline 時只讀取本地價格資料庫的最後一根K棒 (由其他程序更新)，同樣不連網。
+"""
+import os
+import json
+import time
+import zlib
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+import investment_analysis as ia
+from data_fetcher import normalize_frame
+from indicators import IndicatorState
+from price_store import PriceStore
+
+BAR_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+LIVE_JSON = "live.json"
+LIVE_HTML = "live.html"
+LIVE_TEMPLATE = "live_fragment.html"
+# 輪詢最新報價時向資料來源要求的天數 (涵蓋週末與連假)
+QUOTE_DAYS = 7
+
+
+class ProviderFeed:
+    """由資料來源 (providers) 取得最近數日日K，最後一根即為最新報價 (盤中為當日累計的開高低收量)"""
+
+    def __init__(self, provider, days=QUOTE_DAYS, timeout=20):
+        self.provider = provider
+        self.days = days
+        self.timeout = timeout
+
+    def quote(self, symbol):
+        start = self.provider.now() - datetime.timedelta(days=self.days)
+        df = self.provider.prices(symbol, start, timeout=self.timeout)
+        if df is None or df.empty:
+            raise ValueError("回傳資料為空")
+        df = normalize_frame(df)
+        return {"Date": df.index[-1].strftime("%Y-%m-%d"), **{k: float(df[k].iloc[-1]) for k in BAR_FIELDS}}
+
+
+class StoreFeed:
+    """只讀取本地價格資料庫 (--offline)：每輪回傳資料庫中最後一根K棒，資料庫由其他程序 (例如排程的報告) 更新"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def quote(self, symbol):
+        df, _ = self.store.read(symbol)
+        if df is None or df.empty:
+            raise LookupError("本地資料庫中沒有資料")
+        return last_bar(df)
+
+
+class StandInFeed:
+    """本地替代報價來源 (測試與離線展示用)：以各標的最後一根K棒為起點隨機漫步
+
+    每次輪詢有 move_prob 的機率更新收盤價 (同時調整高低點與累計成交量)，否則回傳與上次相同的報價；
+    各標的使用獨立且固定種子的亂數，結果不受並行順序影響。delay 為模擬的連網延遲秒數。
+    """
+
+    def __init__(self, last_bars, seed=0, volatility=0.002, move_prob=0.5, delay=0.0):
+        self.bars = {s: dict(b) for s, b in last_bars.items()}
+        self.rngs = {s: np.random.default_rng([seed, zlib.crc32(s.encode("utf-8"))]) for s in last_bars}
+        self.volatility = volatility
+        self.move_prob = move_prob
+        self.delay = delay
+
+    def quote(self, symbol):
+        if self.delay:
+            time.sleep(self.delay)
+        bar, rng = self.bars[symbol], self.rngs[symbol]
+        if rng.random() < self.move_prob:
+            close = bar["Close"] * (1 + rng.normal(0, self.volatility))
+            bar.update(Close=close, High=max(bar["High"], close), Low=min(bar["Low"], close),
+                       Volume=bar["Volume"] + float(rng.integers(0, 10_000)))
+        return dict(bar)
+
+
+def last_bar(df):
+    return {"Date": df.index[-1].strftime("%Y-%m-%d"), **{k: float(df[k].iloc[-1]) for k in BAR_FIELDS}}
+
+
+class Watcher:
+    """保存各標的的逐根指標狀態與最新報價，每輪只更新報價有變動的標的
+
+    frames 為 {symbol: 歷史日K}，只在建立時逐根重播一次以建立 IndicatorState；
+    提供 store (PriceStore) 時沿用與價格資料一同保存的指標狀態，只重播其後的K棒，並寫回更新後的狀態。
+    key_symbols 為摘要卡片的標的 (KEY_INDICATORS)。
+    """
+
+    def __init__(self, frames, feed, max_workers=4, key_symbols=(), params=None, store=None):
+        self.feed = feed
+        self.max_workers = max_workers
+        self.key_symbols = list(key_symbols)
+        self.symbols = list(frames)
+        self.states, self.replayed = {}, 0
+        for symbol, df in frames.items():
+            state, replayed = IndicatorState.resume(df, store.read_state(symbol) if store else None, **(params or {}))
+            self.states[symbol] = state
+            self.replayed += replayed
+            if store and replayed:
+                store.write_state(symbol, state.to_dict(df.index[-1]))
+        self.quotes = {s: last_bar(df) for s, df in frames.items()}
+        self.records = {}
+        self.cycle = 0
+        self._refresh_rows(self.symbols)
+
+    def _refresh_rows(self, symbols):
+        if not symbols:
+            return
+        fields = self.states[symbols[0]].latest
+        latest = {f: [self.states[s].latest.get(f, np.nan) for s in symbols] for f in fields}
+        self.records.update(zip(symbols, ia.table_row_records(symbols, latest)))
+
+    def poll(self):
+        """以有上限的執行緒池取得所有標的最新報價，回傳 ({symbol: 報價}, {symbol: 耗時秒數}, {symbol: 錯誤})"""
+        def fetch(symbol):
+            t0 = time.perf_counter()
+            try:
+                return symbol, self.feed.quote(symbol), time.perf_counter() - t0, None
+            except Exception as e:
+                return symbol, None, time.perf_counter() - t0, e
+        quotes, latencies, errors = {}, {}, {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(self.symbols)))) as pool:
+            for symbol, quote, elapsed, error in pool.map(fetch, self.symbols):
+                latencies[symbol] = elapsed
+                if error is not None:
+                    errors[symbol] = error
+                else:
+                    quotes[symbol] = quote
+        return quotes, latencies, errors
+
+    def apply(self, quotes):
+        """將報價寫入最後一根K棒 (日期相同時覆寫，較新時新增一根)，只重算有變動的標的，回傳其清單"""
+        changed = []
+        for symbol, bar in quotes.items():
+            prev = self.quotes[symbol]
+            if bar == prev or bar["Date"] < prev["Date"]:
+                continue
+            self.states[symbol].update(bar, replace_last=bar["Date"] == prev["Date"])
+            self.quotes[symbol] = bar
+            changed.append(symbol)
+        self._refresh_rows(changed)
+        return changed
+
+    def summary_items(self):
+        """摘要卡片 (格式同報告的 summary_items)，依 key_symbols 順序"""
+        return [{"symbol": ia.SYMBOL_NAME_MAP.get(s, s), "orig_symbol": s,
+                 "close": round(float(self.states[s].latest["Close"]), 4),
+                 "change": round(float(np.nan_to_num(self.states[s].latest["Change %"])), 4)}
+                for s in self.key_symbols if s in self.states]
+
+    def snapshot(self, updated):
+        """即時 JSON 的內容：各標的最新一根的報價與指標 (NaN 為 null)"""
+        def clean(v):
+            return None if v != v else round(v, 4)
+        return {"updated": updated, "cycle": self.cycle,
+                "summary": self.summary_items(),
+                "symbols": {s: {"date": self.quotes[s]["Date"], **{k: clean(float(v)) for k, v in self.states[s].latest.items()}}
+                            for s in self.symbols}}
+
+    def write(self, out_dir, updated):
+        """寫出 live.json 與 live.html (先寫暫存檔再置換)，回傳寫出的位元組數"""
+        os.makedirs(out_dir, exist_ok=True)
+        html = ia.report_environment().get_template(LIVE_TEMPLATE).render(
+            summary_html=ia.build_summary_html(self.summary_items(), self.key_symbols), rows=[self.records[s] for s in self.symbols],
+            updated=updated, cycle=self.cycle, kd_window=ia.KD_WINDOW, bias_periods=ia.BIAS_PERIODS)
+        text = json.dumps(self.snapshot(updated), ensure_ascii=False, separators=(",", ":"))
+        written = 0
+        for name, content in ((LIVE_JSON, text), (LIVE_HTML, html)):
+            path = os.path.join(out_dir, name)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+            written += os.path.getsize(path)
+        return written
+
+    def run_cycle(self, out_dir):
+        """執行一輪：輪詢、更新、寫出，回傳本輪統計"""
+        self.cycle += 1
+        t0 = time.perf_counter()
+        quotes, latencies, errors = self.poll()
+        t1 = time.perf_counter()
+        changed = self.apply(quotes)
+        written = self.write(out_dir, datetime.datetime.now(ia.TZ).strftime("%Y-%m-%d %H:%M:%S"))
+        t2 = time.perf_counter()
+        run = metrics.current()
+        run.record("watch_poll", t1 - t0, items=latencies)
+        run.record("watch_refresh", t2 - t1)
+        run.add_bytes("watch_write", written)
+        return {"cycle": self.cycle, "polled": len(latencies), "changed": len(changed), "errors": errors,
+                "poll_s": t1 - t0, "poll_cost_s": sum(latencies.values()), "max_latency_s": max(latencies.values(), default=0.0),
+                "refresh_s": t2 - t1, "latency_s": t2 - t0, "bytes": written}
+
+
+def report_cycle(stats):
+    print(f"[Info] 第 {stats['cycle']} 輪：輪詢 {stats['polled']} 檔 ({stats['changed']} 檔有變動、{len(stats['errors'])} 檔失敗)，"
+          f"輪詢 {stats['poll_s']:.2f} 秒 (累計 {stats['poll_cost_s']:.2f} 秒，單檔最長 {stats['max_latency_s']:.2f} 秒)，"
+          f"更新與寫出 {stats['refresh_s'] * 1000:.0f} 毫秒，刷新延遲 {stats['latency_s']:.2f} 秒")
+    for symbol, error in list(stats["errors"].items())[:5]:
+        print(f"[Warning] 取得 {symbol} 報價失敗: {error}")
+
+
+def run_watch(args, provider, sleep=time.sleep):
+    """investment_analysis.py --watch 的進入點：載入歷史 (本地資料庫增量)、建立指標狀態後依間隔輪詢
+
+    provider 為命令列選擇的資料來源 (providers)；--watch-cycles 為 0 時持續執行直到中斷 (Ctrl+C)。
+    """
+    symbols = list(dict.fromkeys(s for g in ia.STOCK_GROUPS for s in g["symbols"]))
+    start_date = provider.now() - datetime.timedelta(days=ia.HISTORY_DAYS)
+    store = PriceStore(ia.PRICE_STORE_DIR) if provider.use_cache else None
+    frames = ia.get_stock_data(symbols, start_date, fetcher=provider.prices, store=store, offline=args.offline)
+    if not frames:
+        print("[Error] 沒有任何標的的歷史資料，無法啟動監看模式。")
+        return 1
+    if args.watch_feed == "standin":
+        feed = StandInFeed({s: last_bar(df) for s, df in frames.items()})
+    elif args.offline:
+        feed = StoreFeed(store)
+    else:
+        feed = ProviderFeed(provider, timeout=ia.DOWNLOAD_TIMEOUT)
+    params = {"kd_window": ia.KD_WINDOW, "rsi_window": ia.RSI_WINDOW, "bias_periods": ia.BIAS_PERIODS,
+              "dmi_window": ia.DMI_WINDOW, "ma_periods": ia.MA_PERIODS, "vol_ma_window": ia.VOL_MA_WINDOW}
+    with metrics.stage("watch_init"):
+        watcher = Watcher(frames, feed, ia.WATCH_WORKERS, ia.KEY_INDICATORS, params, store)
+    interval = ia.WATCH_INTERVAL if args.watch_interval is None else args.watch_interval
+    print(f"[Info] 已建立指標狀態 (重播 {watcher.replayed} 根K棒)")
+    print(f"[Info] 監看模式：{len(watcher.symbols)} 檔標的，每 {interval} 秒輪詢一次 (最多同時 {ia.WATCH_WORKERS} 檔)，"
+          f"輸出至 {os.path.join(ia.WATCH_OUTPUT_DIR, LIVE_HTML)}")
+    try:
+        while True:
+            t0 = time.perf_counter()
+            report_cycle(watcher.run_cycle(ia.WATCH_OUTPUT_DIR))
+            if args.watch_cycles and watcher.cycle >= args.watch_cycles:
+                break
+            sleep(max(0.0, interval - (time.perf_counter() - t0)))
+    except KeyboardInterrupt:
+        print("\n[Info] 已停止監看模式。")
+    return 0
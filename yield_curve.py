@@ -0,0 +1,106 @@
+"""美國公債殖利率曲線：各天期歷史對齊、利差序列、倒掛持續期間與滾動百分位
+
+歷史資料由本地價格資料庫 (PriceStore) 保存，每次執行只需下載最後一根K棒之後的新資料；
+本模組只負責把各天期收盤殖利率對齊為 (日期數 x 天期數) 陣列，所有利差的統計都以整段歷史一次向量化計算。
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+# Yahoo Finance 可取得的公債殖利率天期 (由短至長)
+TENORS = {"^IRX": "3M", "^FVX": "5Y", "^TNX": "10Y", "^TYX": "30Y"}
+# 利差絕對值低於此值 (百分點) 視為趨平
+FLAT_THRESHOLD = 0.25
+DEFAULT_PERCENTILE_WINDOW = 252
+
+
+def run_lengths(mask):
+    """各欄連續為 True 的長度 (到該列為止)；mask 為 (列數 x 欄數) 布林陣列"""
+    idx = np.arange(mask.shape[0])[:, None]
+    last_false = np.maximum.accumulate(np.where(mask, -1, idx), axis=0)
+    return idx - last_false
+
+
+def rolling_percentile(values, window):
+    """各列數值在之前 window 列 (含本列) 中的百分位 (0~100)；有效值不足一半時為 NaN"""
+    out = np.full(values.shape, np.nan)
+    if values.shape[0] < window:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+    current = values[window - 1:, :, None]
+    valid = ~np.isnan(windows)
+    counts = valid.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rank = (windows <= current).sum(axis=-1) / counts * 100
+    rank[(counts < window / 2) | np.isnan(values[window - 1:])] = np.nan
+    out[window - 1:] = rank
+    return out
+
+
+class YieldCurve:
+    """各天期收盤殖利率對齊後的歷史：dates 為日期索引，values 為 (日期數 x 天期數) 陣列，labels 由短至長"""
+
+    def __init__(self, dates, labels, values):
+        self.dates = dates
+        self.labels = list(labels)
+        self.values = values
+
+    @classmethod
+    def from_frames(cls, frames, tenors=TENORS):
+        """由 {代號: DataFrame} 建立；缺少資料的天期略過，各天期的休市日以前一日數值補齊"""
+        closes = pd.DataFrame({label: frames[s]['Close'] for s, label in tenors.items()
+                               if frames.get(s) is not None and not frames[s].empty})
+        closes = closes.sort_index().ffill()
+        return cls(closes.index, closes.columns, closes.to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def latest(self):
+        """各天期最新殖利率 {天期: 數值}"""
+        if not len(self):
+            return {}
+        return {label: float(v) for label, v in zip(self.labels, self.values[-1]) if not np.isnan(v)}
+
+    def spreads(self):
+        """所有天期組合的利差 (長天期 - 短天期)，回傳 (名稱清單, (日期數 x 組合數) 陣列)"""
+        pairs = list(combinations(range(len(self.labels)), 2))
+        names = [f"{self.labels[j]}-{self.labels[i]}" for i, j in pairs]
+        if not pairs:
+            return names, np.empty((len(self), 0))
+        short, long = (np.array(p) for p in zip(*pairs))
+        return names, self.values[:, long] - self.values[:, short]
+
+    def analysis(self, window=DEFAULT_PERCENTILE_WINDOW, flat=FLAT_THRESHOLD):
+        """整段歷史的利差統計，回傳可存入 JSON 的字典；資料不足兩個天期時回傳 None
+
+        每個利差包含最新值、狀態 (倒掛/趨平/正常)、在最近 window 根K棒中的百分位、目前連續倒掛的K棒數與起始日、
+        整段歷史最長的倒掛K棒數、倒掛次數，以及最近一次倒掛的最後一天。
+        """
+        names, spreads = self.spreads()
+        if not names or not len(self):
+            return None
+        inverted = spreads < 0
+        runs = run_lengths(inverted)
+        starts = inverted & ~np.vstack([np.zeros((1, len(names)), dtype=bool), inverted[:-1]])
+        percentiles = rolling_percentile(spreads, window)
+        rows = np.arange(len(self))[:, None]
+        last_inverted = np.where(inverted, rows, -1).max(axis=0)
+        dates = self.dates.strftime("%Y-%m-%d")
+        result = {}
+        for k, name in enumerate(names):
+            value, run = spreads[-1, k], int(runs[-1, k])
+            if np.isnan(value):
+                continue
+            result[name] = {
+                "value": round(float(value), 4),
+                "status": "倒掛" if value < 0 else "趨平" if abs(value) < flat else "正常",
+                "percentile": None if np.isnan(percentiles[-1, k]) else round(float(percentiles[-1, k]), 1),
+                "inverted_bars": run,
+                "inverted_since": dates[len(self) - run] if run else None,
+                "longest_inversion": int(runs[:, k].max()),
+                "inversions": int(starts[:, k].sum()),
+                "last_inverted": dates[last_inverted[k]] if last_inverted[k] >= 0 else None,
+            }
+        return {"date": dates[-1], "start": dates[0], "window": window, "tenors": self.latest(), "spreads": result}